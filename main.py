@@ -8,6 +8,31 @@ import json
 import csv
 import re
 
+# Padrões e tabelas de limpeza compilados uma única vez
+UNWANTED_CHARS = re.compile(r'[^\w\s./,-]')
+DATE_PARTS = re.compile(r'(\d{2})/(\d{2})/(\d{2,4})')
+DATE_FORMAT = re.compile(r'\d{2}/\d{2}/(\d{2}|\d{4})')
+DATE_SHORT = re.compile(r'\d{2}/\d{2}/\d{2}')
+CURRENCY_FORMAT = re.compile(r'\d+,\d{2}')
+
+
+class KeepChars(dict):
+    """Tabela para str.translate que mantém apenas os caracteres informados"""
+
+    def __init__(self, chars):
+        super().__init__()
+        self.keep = frozenset(map(ord, chars))
+
+    def __missing__(self, code):
+        value = code if code in self.keep else None
+        self[code] = value
+        return value
+
+
+DIGITS_ONLY = KeepChars('0123456789')
+NUMBER_CHARS = KeepChars('0123456789.')
+CURRENCY_CHARS = KeepChars('0123456789,.')
+
 def manage_templates():
     template_manager = TemplateManager()
     extractor = DocumentROIExtractor(template_manager)
@@ -239,7 +264,7 @@ class DocumentROIExtractor:
         elif expected_type == "date":
             # Escolher o que mais se parece com uma data
             for result in valid_results:
-                if re.search(r'\d{2}/\d{2}/\d{2,4}', result):
+                if DATE_PARTS.search(result):
                     return result
             return valid_results[0]
             
@@ -260,18 +285,18 @@ class DocumentROIExtractor:
             return ""
             
         # Remover caracteres indesejados
-        text = re.sub(r'[^\w\s./,-]', '', text)
+        text = UNWANTED_CHARS.sub('', text)
         
         if expected_type == "cpf":
             # Manter apenas números e formatação de CPF
-            nums = ''.join(filter(str.isdigit, text))
+            nums = text.translate(DIGITS_ONLY)
             if len(nums) == 11:
                 return f"{nums[:3]}.{nums[3:6]}.{nums[6:9]}-{nums[9:]}"
             return nums
             
         elif expected_type == "date":
             # Tentar formatar como data
-            match = re.search(r'(\d{2})/(\d{2})/(\d{2,4})', text)
+            match = DATE_PARTS.search(text)
             if match:
                 day, month, year = match.groups()
                 if len(year) == 2:
@@ -281,14 +306,14 @@ class DocumentROIExtractor:
             
         elif expected_type == "currency":
             # Formatar valor monetário
-            nums = ''.join(filter(lambda x: x.isdigit() or x in ',.', text))
+            nums = text.translate(CURRENCY_CHARS)
             if ',' not in nums:
                 nums = nums[:-2] + ',' + nums[-2:]
             return nums
             
         elif expected_type == "number":
             # Manter apenas números e pontos
-            return ''.join(filter(lambda x: x.isdigit() or x == '.', text))
+            return text.translate(NUMBER_CHARS)
             
         # Para texto normal, apenas limpar espaços extras
         return ' '.join(text.split())
@@ -301,20 +326,16 @@ class DocumentROIExtractor:
             
         if expected_type == "cpf":
             # Valida CPF/CNPJ - deve ter 11 ou 14 dígitos
-            nums = ''.join(filter(str.isdigit, text))
+            nums = text.translate(DIGITS_ONLY)
             return len(nums) in [11, 14]
             
         elif expected_type == "date":
             # Valida data - deve ter formato DD/MM/YY ou DD/MM/YYYY
-            import re
-            pattern = r'\d{2}/\d{2}/(\d{2}|\d{4})'
-            return bool(re.search(pattern, text))
+            return bool(DATE_FORMAT.search(text))
             
         elif expected_type == "currency":
             # Valida moeda - deve ter números e vírgula
-            import re
-            pattern = r'\d+,\d{2}'
-            return bool(re.search(pattern, text))
+            return bool(CURRENCY_FORMAT.search(text))
             
         elif expected_type == "number":
             # Valida número - deve ter pelo menos um dígito
@@ -620,21 +641,17 @@ class DocumentROIExtractor:
             
         if expected_type == "cpf":
             # Remover caracteres não numéricos
-            nums = ''.join(filter(str.isdigit, text))
+            nums = text.translate(DIGITS_ONLY)
             return len(nums) in [11, 14], nums  # 11 para CPF, 14 para CNPJ
             
         elif expected_type == "date":
             # Verificar se tem formato de data
-            import re
-            pattern = r'\d{2}/\d{2}/\d{2}'
-            match = re.search(pattern, text)
+            match = DATE_SHORT.search(text)
             return bool(match), match.group(0) if match else text
             
         elif expected_type == "currency":
             # Verificar se tem formato de valor monetário
-            import re
-            pattern = r'\d+,\d{2}'
-            match = re.search(pattern, text)
+            match = CURRENCY_FORMAT.search(text)
             return bool(match), match.group(0) if match else text
             
         elif expected_type == "number":
@@ -646,7 +663,13 @@ class DocumentROIExtractor:
             
  
     def interactive_roi_adjustment(self, image):
-        """Permite ajuste interativo das ROIs com alternância entre mover e redimensionar"""
+        """
+        Permite ajuste interativo das ROIs com alternância entre mover e redimensionar
+
+        A página com a grade é reduzida ao tamanho da janela e composta uma
+        única vez; a tela só é redesenhada quando um evento altera alguma ROI,
+        e apenas nas áreas das ROIs alteradas.
+        """
         window_name = "ROI Adjustment"
         current_roi = None
         editing_roi = None  # ROI em modo de edição (com alças para redimensionamento)
@@ -654,9 +677,22 @@ class DocumentROIExtractor:
         last_click_time = 0  # Para detectar duplo clique
         last_click_roi = None  # Para identificar em qual ROI foi o duplo clique
 
+        # Camada estática (página + grade) na escala da janela, quadro exibido
+        # e áreas da tela a redesenhar
+        view = {"scale": 1.0, "size": None, "base": None, "frame": None}
+        dirty = []
+        handle_size = 5
+        font_scale = 0.5
+
+        def to_page(x, y):
+            """Converte coordenadas da janela para coordenadas da página"""
+            return int(x / view["scale"]), int(y / view["scale"])
+
         def handle_double_click(x, y, clicked_roi):
             """Gerencia o duplo clique em uma ROI"""
             nonlocal editing_roi
+            mark_dirty(editing_roi)
+            mark_dirty(clicked_roi)
             if editing_roi == clicked_roi:
                 editing_roi = None
                 print(f"Modo de movimentação ativado para todas as ROIs")
@@ -666,9 +702,10 @@ class DocumentROIExtractor:
 
         def find_clicked_roi(x, y):
             """Encontra qual ROI foi clicada"""
+            # Tolerância de 5 pixels na tela, independente da escala
+            margin = 5 / view["scale"]
             for name, region in self.regions.items():
                 x1, y1, x2, y2 = region["coords"]
-                margin = 5
                 if (x1-margin) <= x <= (x2+margin) and (y1-margin) <= y <= (y2+margin):
                     return name
             return None
@@ -677,6 +714,8 @@ class DocumentROIExtractor:
             """Callback de mouse para interação com a janela"""
             nonlocal current_roi, drag_start, last_click_time, last_click_roi, editing_roi
 
+            x, y = to_page(x, y)
+
             if event == cv2.EVENT_LBUTTONDOWN:
                 clicked_roi = find_clicked_roi(x, y)
                 
@@ -692,7 +731,7 @@ class DocumentROIExtractor:
                         current_roi = clicked_roi
                         if editing_roi == clicked_roi:
                             x1, y1, x2, y2 = self.regions[clicked_roi]["coords"]
-                            edge_size = 10
+                            edge_size = 10 / view["scale"]
                             if (abs(x - x1) < edge_size and abs(y - y1) < edge_size):
                                 drag_start = "topleft"
                             elif (abs(x - x2) < edge_size and abs(y - y1) < edge_size):
@@ -752,32 +791,103 @@ class DocumentROIExtractor:
                     x2 = max(0, min(x2, self.target_width))
                     y2 = max(0, min(y2, self.target_height))
                     
-                    self.regions[current_roi]["coords"] = (int(x1), int(y1), int(x2), int(y2))
+                    coords = (int(x1), int(y1), int(x2), int(y2))
+                    if coords != tuple(self.regions[current_roi]["coords"]):
+                        mark_dirty(current_roi)
+                        self.regions[current_roi]["coords"] = coords
+                        mark_dirty(current_roi)
 
             elif event == cv2.EVENT_LBUTTONUP:
                 current_roi = None
                 drag_start = None
 
-        def draw_regions(img):
-            """Desenha as ROIs e alças de redimensionamento quando apropriado"""
-            for name, region in self.regions.items():
-                x1, y1, x2, y2 = region["coords"]
-                color = region["color"]
-                
-                cv2.rectangle(img, (x1, y1), (x2, y2), color, 2)
-                cv2.putText(img, f"{name}", (x1, y1-5), 
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2)
-                
-                if name == editing_roi:
-                    handle_size = 5
-                    cv2.rectangle(img, (x1-handle_size, y1-handle_size), 
-                                (x1+handle_size, y1+handle_size), color, -1)
-                    cv2.rectangle(img, (x2-handle_size, y1-handle_size),
-                                (x2+handle_size, y1+handle_size), color, -1)
-                    cv2.rectangle(img, (x1-handle_size, y2-handle_size),
-                                (x1+handle_size, y2+handle_size), color, -1)
-                    cv2.rectangle(img, (x2-handle_size, y2-handle_size),
-                                (x2+handle_size, y2+handle_size), color, -1)
+        def build_view(width, height):
+            """Compõe a página com a grade na escala da janela"""
+            scale = min(width / self.target_width, height / self.target_height)
+            size = (max(1, round(self.target_width * scale)),
+                    max(1, round(self.target_height * scale)))
+            base = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+            # Grade de referência desenhada já na escala exibida
+            grid_color = (128, 128, 128)
+            for x in range(0, self.target_width, 100):
+                cv2.line(base, (round(x * scale), 0), (round(x * scale), size[1]), grid_color, 1)
+                if x % 500 == 0:
+                    cv2.putText(base, str(x), (round(x * scale), 15),
+                            cv2.FONT_HERSHEY_SIMPLEX, font_scale, grid_color, 1)
+
+            for y in range(0, self.target_height, 100):
+                cv2.line(base, (0, round(y * scale)), (size[0], round(y * scale)), grid_color, 1)
+                if y % 500 == 0:
+                    cv2.putText(base, str(y), (5, round(y * scale)),
+                            cv2.FONT_HERSHEY_SIMPLEX, font_scale, grid_color, 1)
+
+            view["scale"] = scale
+            view["size"] = (width, height)
+            view["base"] = base
+            view["frame"] = base.copy()
+            dirty.clear()
+            dirty.append((0, 0, size[0], size[1]))
+
+        def screen_rect(name):
+            """Área da tela ocupada por uma ROI, incluindo rótulo e alças"""
+            scale = view["scale"]
+            x1, y1, x2, y2 = self.regions[name]["coords"]
+            (text_w, text_h), _ = cv2.getTextSize(name, cv2.FONT_HERSHEY_SIMPLEX, font_scale, 1)
+            pad = handle_size + 2
+            return (int(x1 * scale) - pad, int(y1 * scale) - text_h - pad - 5,
+                    max(int(x2 * scale), int(x1 * scale) + text_w) + pad,
+                    int(y2 * scale) + pad)
+
+        def mark_dirty(name):
+            """Agenda o redesenho da área atual de uma ROI"""
+            if name in self.regions and view["base"] is not None:
+                dirty.append(screen_rect(name))
+
+        def draw_region(img, name, offset):
+            """Desenha uma ROI (e as alças, se em edição) deslocada por offset"""
+            scale = view["scale"]
+            ox, oy = offset
+            x1, y1, x2, y2 = (int(c * scale) for c in self.regions[name]["coords"])
+            x1, x2 = x1 - ox, x2 - ox
+            y1, y2 = y1 - oy, y2 - oy
+            color = self.regions[name]["color"]
+
+            cv2.rectangle(img, (x1, y1), (x2, y2), color, 2)
+            cv2.putText(img, f"{name}", (x1, y1-5),
+                    cv2.FONT_HERSHEY_SIMPLEX, font_scale, color, 1)
+
+            if name == editing_roi:
+                for hx, hy in ((x1, y1), (x2, y1), (x1, y2), (x2, y2)):
+                    cv2.rectangle(img, (hx-handle_size, hy-handle_size),
+                                (hx+handle_size, hy+handle_size), color, -1)
+
+        def redraw():
+            """Restaura a camada estática nas áreas alteradas e redesenha as ROIs"""
+            base, frame = view["base"], view["frame"]
+            height, width = base.shape[:2]
+            for rx1, ry1, rx2, ry2 in dirty:
+                rx1, ry1 = max(0, rx1), max(0, ry1)
+                rx2, ry2 = min(width, rx2), min(height, ry2)
+                if rx1 >= rx2 or ry1 >= ry2:
+                    continue
+                frame[ry1:ry2, rx1:rx2] = base[ry1:ry2, rx1:rx2]
+                area = frame[ry1:ry2, rx1:rx2]
+                for name in self.regions:
+                    x1, y1, x2, y2 = screen_rect(name)
+                    if x1 < rx2 and rx1 < x2 and y1 < ry2 and ry1 < y2:
+                        draw_region(area, name, (rx1, ry1))
+            dirty.clear()
+
+        def window_size():
+            """Tamanho atual da área de imagem da janela"""
+            try:
+                _, _, width, height = cv2.getWindowImageRect(window_name)
+                if width > 0 and height > 0:
+                    return width, height
+            except cv2.error:
+                pass
+            return view["size"] or (1200, 800)
 
         def add_new_roi():
             """Adiciona uma nova ROI"""
@@ -836,6 +946,7 @@ class DocumentROIExtractor:
                 "expected_type": expected_type
             }
             
+            mark_dirty(name)
             print(f"\nROI '{name}' adicionada! Use o mouse para ajustar sua posição.")
 
         def save_template():
@@ -857,9 +968,10 @@ class DocumentROIExtractor:
                 print(f"Erro ao salvar template: {e}")
 
         # Configuração da janela
-        cv2.namedWindow(window_name, cv2.WINDOW_NORMAL | cv2.WINDOW_FREERATIO)
+        cv2.namedWindow(window_name, cv2.WINDOW_NORMAL | cv2.WINDOW_KEEPRATIO)
         cv2.resizeWindow(window_name, 1200, 800)
         cv2.setMouseCallback(window_name, mouse_callback)
+        build_view(1200, 800)
 
         print("\nInstruções:")
         print("- Clique e arraste os retângulos para movê-los")
@@ -871,25 +983,17 @@ class DocumentROIExtractor:
         print("- Pressione 'q' quando terminar o ajuste")
 
         while True:
-            debug_img = image.copy()
-            # Adicionar grid de referência
-            grid_color = (128, 128, 128)
-            for x in range(0, self.target_width, 100):
-                cv2.line(debug_img, (x, 0), (x, self.target_height), grid_color, 1)
-                if x % 500 == 0:
-                    cv2.putText(debug_img, str(x), (x, 30), 
-                            cv2.FONT_HERSHEY_SIMPLEX, 1, grid_color, 2)
-            
-            for y in range(0, self.target_height, 100):
-                cv2.line(debug_img, (0, y), (self.target_width, y), grid_color, 1)
-                if y % 500 == 0:
-                    cv2.putText(debug_img, str(y), (10, y), 
-                            cv2.FONT_HERSHEY_SIMPLEX, 1, grid_color, 2)
+            # Janela redimensionada: recompor a camada estática na nova escala
+            width, height = window_size()
+            if abs(width - view["size"][0]) > 2 or abs(height - view["size"][1]) > 2:
+                build_view(width, height)
 
-            draw_regions(debug_img)
-            cv2.imshow(window_name, debug_img)
+            if dirty:
+                redraw()
+                cv2.imshow(window_name, view["frame"])
 
-            key = cv2.waitKey(1) & 0xFF
+            # Sem eventos, o loop apenas aguarda teclas
+            key = cv2.waitKey(30) & 0xFF
             if key == ord('q'):
                 print("\nCoordenadas finais salvas:")
                 for name, region in self.regions.items():
@@ -0,0 +1,178 @@
+"""
+OCR em lote de várias ROIs com uma única chamada ao Tesseract.
+
+As ROIs (já pré-processadas) do mesmo tipo são empilhadas verticalmente em
+uma imagem composta, com espaçamento em branco entre elas e deslocamentos
+conhecidos. O Tesseract é executado uma vez com image_to_data e cada palavra
+reconhecida é devolvida ao campo cuja faixa contém o centro da sua caixa.
+"""
+
+import re
+
+import numpy as np
+import pytesseract
+
+# Campos empilhados exigem segmentação por bloco (psm 6) em vez de linha única
+PSM_PATTERN = re.compile(r'--psm\s+\d+')
+
+
+class CompositeStrip:
+    """
+    Imagem composta formada por ROIs empilhadas verticalmente
+    """
+
+    def __init__(self, padding=40, background=255):
+        """
+        Inicializa a faixa composta
+
+        Args:
+            padding: Espaço em branco (pixels) ao redor de cada ROI
+            background: Valor de cinza usado no preenchimento
+        """
+        self.padding = padding
+        self.background = background
+        self.items = []
+        self.slots = []
+
+    def add(self, key, image):
+        """
+        Adiciona uma ROI pré-processada (escala de cinza) à faixa
+
+        Args:
+            key: Identificador devolvido no mapeamento (ex: (página, campo))
+            image: ROI pré-processada
+        """
+        self.items.append((key, image))
+
+    def __len__(self):
+        return len(self.items)
+
+    def build(self):
+        """
+        Monta a imagem composta e registra os deslocamentos de cada ROI
+
+        Returns:
+            Imagem composta (numpy uint8)
+        """
+        width = max(img.shape[1] for _, img in self.items) + 2 * self.padding
+        height = sum(img.shape[0] + self.padding for _, img in self.items) + self.padding
+
+        composite = np.full((height, width), self.background, dtype=np.uint8)
+        self.slots = []
+
+        y = self.padding
+        for key, img in self.items:
+            h, w = img.shape[:2]
+            composite[y:y + h, self.padding:self.padding + w] = img
+            # A faixa do campo inclui metade do espaçamento acima e abaixo
+            band_top = y - self.padding // 2
+            band_bottom = y + h + self.padding // 2
+            self.slots.append((key, band_top, band_bottom))
+            y += h + self.padding
+
+        return composite
+
+    def assign_words(self, data):
+        """
+        Distribui as palavras do image_to_data entre as ROIs da faixa
+
+        Args:
+            data: Saída de pytesseract.image_to_data (Output.DICT)
+
+        Returns:
+            Dicionário {chave: lista de palavras (dicts com text/conf/box)}
+        """
+        words = {key: [] for key, _, _ in self.slots}
+
+        for word in data_to_words(data):
+            center_y = word["top"] + word["height"] / 2
+            for key, band_top, band_bottom in self.slots:
+                if band_top <= center_y < band_bottom:
+                    words[key].append(word)
+                    break
+
+        return words
+
+
+def data_to_words(data):
+    """
+    Converte a saída do image_to_data em uma lista de palavras
+
+    Args:
+        data: Saída de pytesseract.image_to_data (Output.DICT)
+
+    Returns:
+        Lista de dicts com text, conf, left, top, height e line
+    """
+    words = []
+    for i, text in enumerate(data["text"]):
+        text = str(text).strip()
+        if not text:
+            continue
+
+        words.append({
+            "text": text,
+            "conf": float(data["conf"][i]),
+            "left": data["left"][i],
+            "top": data["top"][i],
+            "height": data["height"][i],
+            "line": (data["block_num"][i], data["par_num"][i],
+                     data["line_num"][i]),
+        })
+    return words
+
+
+def words_confidence(words):
+    """
+    Calcula as confianças média e mínima de um conjunto de palavras
+
+    Returns:
+        Tupla (média, mínima); (-1.0, -1.0) quando não há palavras com
+        confiança válida
+    """
+    confs = [w["conf"] for w in words if w["conf"] >= 0]
+    if not confs:
+        return -1.0, -1.0
+    return sum(confs) / len(confs), min(confs)
+
+
+def words_to_text(words):
+    """Reconstrói o texto de uma ROI a partir de suas palavras"""
+    lines = {}
+    for word in sorted(words, key=lambda w: (w["top"], w["left"])):
+        lines.setdefault(word["line"], []).append(word)
+
+    ordered = sorted(lines.values(), key=lambda ws: min(w["top"] for w in ws))
+    return "\n".join(
+        " ".join(w["text"] for w in sorted(ws, key=lambda w: w["left"]))
+        for ws in ordered
+    )
+
+
+def block_config(config):
+    """Adapta a configuração do Tesseract para a imagem composta"""
+    if PSM_PATTERN.search(config):
+        return PSM_PATTERN.sub('--psm 6', config)
+    return f"--psm 6 {config}"
+
+
+def recognize_strip(strip, config, lang='por'):
+    """
+    Executa uma única chamada de OCR sobre a faixa composta
+
+    Args:
+        strip: CompositeStrip com as ROIs do mesmo tipo
+        config: Configuração do Tesseract para o tipo das ROIs
+        lang: Idioma do Tesseract
+
+    Returns:
+        Dicionário {chave: lista de palavras}
+    """
+    composite = strip.build()
+    data = pytesseract.image_to_data(
+        composite,
+        lang=lang,
+        config=block_config(config),
+        output_type=pytesseract.Output.DICT
+    )
+    return strip.assign_words(data)
@@ -0,0 +1,620 @@
+import csv
+import itertools
+import json
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from field_types import post_process_column, validate_column
+from job_queue import write_json_atomic
+from tracing import document, span
+
+
+class RateLimiter:
+    """
+    Limita a frequência de uma notificação (ex: sinais Qt emitidos por
+    threads de processamento), descartando chamadas muito próximas
+    """
+
+    def __init__(self, min_interval=0.1):
+        """
+        Args:
+            min_interval: Intervalo mínimo em segundos entre notificações
+        """
+        self.min_interval = min_interval
+        self.last = None
+        self.lock = threading.Lock()
+
+    def ready(self, force=False):
+        """Retorna True se a notificação pode ser feita agora"""
+        now = time.perf_counter()
+        with self.lock:
+            if (force or self.last is None or
+                    now - self.last >= self.min_interval):
+                self.last = now
+                return True
+            return False
+
+
+class ProgressMeter:
+    """
+    Acompanha o andamento de um lote: vazão, tempo restante e limitação da
+    frequência das notificações de progresso
+    """
+
+    def __init__(self, total, min_interval=0.1):
+        """
+        Args:
+            total: Quantidade total de imagens
+            min_interval: Intervalo mínimo em segundos entre notificações
+        """
+        self.total = total
+        self.done = 0
+        self.start = time.perf_counter()
+        self.limiter = RateLimiter(min_interval)
+
+    def update(self, done):
+        """
+        Registra o andamento
+
+        Returns:
+            True se a notificação deve ser emitida (sempre na última imagem)
+        """
+        self.done = done
+        return self.limiter.ready(force=done >= self.total)
+
+    def percent(self):
+        return int(self.done * 100 / self.total) if self.total else 100
+
+    def rate(self):
+        """Imagens processadas por minuto"""
+        elapsed = time.perf_counter() - self.start
+        return 60 * self.done / elapsed if elapsed > 0 else 0.0
+
+    def eta(self):
+        """Segundos estimados até o fim ou None se ainda não há dados"""
+        rate = self.rate()
+        if not rate:
+            return None
+        return 60 * (self.total - self.done) / rate
+
+    def summary(self):
+        """Texto com andamento, vazão e tempo restante"""
+        text = f"Processadas {self.done}/{self.total} | {self.rate():.1f} imagens/min"
+        eta = self.eta()
+        if eta is not None and self.done < self.total:
+            minutes, seconds = divmod(int(eta), 60)
+            text += f" | restante ~{minutes:02d}:{seconds:02d}"
+        return text
+
+
+class BatchProcessor:
+    """
+    Processamento em lote de imagens de documentos, independente da interface.
+    Usado pelo ProcessingWorker da GUI e pelos modos de linha de comando.
+    """
+
+    IMAGE_PATTERNS = ("*.png", "*.jpg")
+    CONSOLIDATED_FILE = "resultados_consolidados.csv"
+    METADATA_FILE = "_metadata.json"
+
+    def __init__(self, extractor, template, workers=1):
+        """
+        Inicializa o processador
+
+        Args:
+            extractor: Instância do ROIExtractor
+            template: Dicionário do template (com a chave "regions")
+            workers: Número de imagens processadas em paralelo
+        """
+        self.extractor = extractor
+        self.template = template
+        self.workers = max(1, int(workers))
+        self.running = True
+        # Callback opcional on_image(caminho, página) com a página já
+        # decodificada e padronizada pelo pipeline (ex: preview na interface)
+        self.on_image = None
+        # Subconjunto opcional de campos extraídos (reextração parcial)
+        self.fields = None
+        # Filtro opcional de páginas em branco e duplicadas (PageFilter) e a
+        # classificação das páginas que não são novas {caminho: verificação}
+        self.page_filter = None
+        self.page_status = {}
+        # Resultados das páginas originais, reaproveitados pelas duplicatas
+        self.originals = {}
+        # Orçamento opcional de memória (MemoryBudget): novas páginas só
+        # entram em processamento quando cabem no limite
+        self.memory_budget = None
+        # Profiler estatístico opcional (SamplingProfiler), avisado a cada
+        # página concluída para respeitar o limite de páginas amostradas
+        self.profiler = None
+        # Páginas reunidas em cada OCR em faixa composta quando o extrator
+        # usa o OCR em lote (extractor.batch_ocr); 1 processa página a página
+        self.batch_pages = 1
+        self.logger = logging.getLogger(__name__)
+
+    def record(self, kind, name, help_text, value=1):
+        """
+        Atualiza uma métrica do lote no registro do extrator, se ativo
+
+        Args:
+            kind: "counter" (soma value) ou "gauge" (soma value, podendo ser
+                  negativo)
+            name: Nome da métrica
+            help_text: Descrição da métrica
+            value: Incremento
+        """
+        metrics = self.extractor.metrics
+        if metrics is None:
+            return
+        metric = getattr(metrics, kind)(name, help_text, ("doc_type", "template"))
+        metric.inc(value, **self.extractor.metric_labels)
+
+    def record_cache(self):
+        """Atualiza as métricas do cache de páginas, se ativos"""
+        cache = self.extractor.page_cache
+        metrics = self.extractor.metrics
+        if cache is None or metrics is None:
+            return
+        hits, misses = cache.hits, cache.misses
+        metrics.gauge("bbox_page_cache_hits", "Acertos do cache de páginas").set(hits)
+        metrics.gauge("bbox_page_cache_misses", "Falhas do cache de páginas").set(misses)
+        if hits + misses:
+            metrics.gauge("bbox_page_cache_hit_ratio",
+                          "Fração de páginas lidas do cache").set(hits / (hits + misses))
+
+    @classmethod
+    def list_images(cls, input_dir, recursive=False):
+        """
+        Lista as imagens de um diretório em ordem alfabética
+
+        Args:
+            input_dir: Diretório de entrada
+            recursive: Se True, inclui subdiretórios
+
+        Returns:
+            Lista de Paths
+        """
+        input_path = Path(input_dir)
+        image_files = []
+        for pattern in cls.IMAGE_PATTERNS:
+            if recursive:
+                image_files.extend(input_path.rglob(pattern))
+            else:
+                image_files.extend(input_path.glob(pattern))
+        return sorted(image_files)
+
+    @classmethod
+    def sample_images(cls, input_dir, count, recursive=False):
+        """
+        Retorna até count imagens de um diretório sem listá-lo inteiro (ex:
+        páginas de amostra de uma entrada grande ou compartilhada)
+
+        Args:
+            input_dir: Diretório de entrada
+            count: Quantidade máxima de imagens
+            recursive: Se True, inclui subdiretórios
+
+        Returns:
+            Lista de Paths em ordem alfabética
+        """
+        input_path = Path(input_dir)
+        search = input_path.rglob if recursive else input_path.glob
+        found = itertools.chain.from_iterable(
+            search(pattern) for pattern in cls.IMAGE_PATTERNS)
+        return sorted(itertools.islice(found, max(0, count)))
+
+    def field_order(self):
+        """Retorna a ordem dos campos do template"""
+        return list(self.template.get("regions", {}).keys())
+
+    def process_file(self, image_path):
+        """
+        Processa uma única imagem
+
+        Returns:
+            Dicionário com os resultados ou None em caso de erro
+        """
+        if self.on_image is None and self.page_filter is None:
+            return self.extractor.process_image(
+                str(image_path), self.template, fields=self.fields)
+
+        page = self.extractor.load_page(image_path)
+        if page is None:
+            self.logger.error(f"Não foi possível ler a imagem: {image_path}")
+            return None
+        try:
+            if self.on_image is not None:
+                self.on_image(image_path, page)
+            if self.page_filter is not None:
+                return self.process_filtered_page(image_path, page)
+            return self.extractor.process_page(
+                page, self.template, fields=self.fields)
+        except Exception as e:
+            self.logger.error(f"Erro ao processar {image_path}: {e}")
+            return None
+
+    def filter_page(self, image_path, page):
+        """
+        Classifica uma página pelo filtro de páginas, registrando as páginas
+        em branco e as duplicatas
+
+        Returns:
+            Verificação do PageFilter (ver PageFilter.check)
+        """
+        with span(self.extractor.tracer, "filter"):
+            check = self.page_filter.check(image_path, page)
+        status = check["status"]
+        if status != "new":
+            self.page_status[image_path] = check
+
+        if status == "blank":
+            self.logger.info(f"Página em branco ignorada: {image_path}")
+            self.record("counter", "bbox_batch_pages_blank_total",
+                        "Páginas em branco ignoradas")
+        elif status == "duplicate":
+            self.logger.info(f"{image_path} é duplicata de {check['of']}")
+            self.record("counter", "bbox_batch_pages_duplicate_total",
+                        "Páginas duplicadas (resultados reaproveitados ou ignorados)")
+        elif status == "near_duplicate":
+            self.logger.info(f"{image_path} é quase duplicata de {check['of']} "
+                             f"(distância {check['distance']})")
+        return check
+
+    def original_future(self, image_path):
+        """Future com os resultados de uma página original, aguardado pelas duplicatas"""
+        key = str(Path(image_path).resolve())
+        future = self.originals.setdefault(key, Future())
+        if future.done():
+            # Mesma imagem processada novamente pelo processador
+            future = self.originals[key] = Future()
+        return future
+
+    def duplicate_results(self, check):
+        """Resultados da original de uma duplicata, ou None se é de execução anterior"""
+        if check["previous"]:
+            return None
+        # A original pode ainda estar em processamento em outra thread
+        original = self.originals.setdefault(check["of"], Future()).result()
+        return dict(original) if original else original
+
+    def process_filtered_page(self, image_path, page):
+        """
+        Processa uma página passando antes pelo filtro de páginas: páginas em
+        branco não são processadas e duplicatas exatas reaproveitam os
+        resultados da original (ou são ignoradas se a original é de uma
+        execução anterior). Quase duplicatas são apenas sinalizadas.
+
+        Returns:
+            Dicionário com os resultados ou None se a página foi ignorada
+        """
+        check = self.filter_page(image_path, page)
+        if check["status"] == "blank":
+            return None
+        if check["status"] == "duplicate":
+            return self.duplicate_results(check)
+
+        future = self.original_future(image_path)
+        results = None
+        try:
+            results = self.extractor.process_page(
+                page, self.template, fields=self.fields)
+            return results
+        finally:
+            future.set_result(results)
+
+    def process_group(self, image_paths):
+        """
+        Processa um grupo de imagens com o OCR em faixa composta entre
+        páginas: cada página é lida, filtrada e recortada por vez (as ROIs
+        são copiadas e a página liberada) e as ROIs de todas as páginas
+        seguem juntas para o OCR
+
+        Returns:
+            Dicionário {caminho: resultados}, com None para imagens com erro
+            ou ignoradas pelo filtro
+        """
+        tracer = self.extractor.tracer
+        start = time.perf_counter()
+        results = {image_path: None for image_path in image_paths}
+        pages = {}
+        items = []
+        futures = {}
+        duplicates = {}
+
+        for image_path in image_paths:
+            with document(tracer, image_path):
+                token = None
+                if self.memory_budget is not None:
+                    with span(tracer, "memory_wait"):
+                        token = self.memory_budget.acquire(image_path,
+                                                           lambda: self.running)
+                try:
+                    page = self.extractor.load_page(image_path)
+                    if page is None:
+                        self.logger.error(f"Não foi possível ler a imagem: {image_path}")
+                        continue
+                    if self.on_image is not None:
+                        self.on_image(image_path, page)
+                    if self.page_filter is not None:
+                        check = self.filter_page(image_path, page)
+                        if check["status"] == "blank":
+                            continue
+                        if check["status"] == "duplicate":
+                            duplicates[image_path] = check
+                            continue
+                        futures[image_path] = self.original_future(image_path)
+                    pages[image_path], page_items = self.extractor.page_rois(
+                        page, self.template, self.fields, image_path)
+                    items.extend(page_items)
+                except Exception as e:
+                    self.logger.error(f"Erro ao processar {image_path}: {e}")
+                    pages.pop(image_path, None)
+                finally:
+                    if token is not None:
+                        self.memory_budget.release(token)
+
+        try:
+            if pages:
+                with span(tracer, "ocr_group", pages=len(pages)):
+                    self.extractor.extract_pages_batched(
+                        pages, [item for item in items if item[0][0] in pages],
+                        time.perf_counter() - start)
+                results.update(pages)
+        except Exception as e:
+            self.logger.error(f"Erro no OCR em lote de {len(pages)} páginas: {e}")
+        finally:
+            for image_path, future in futures.items():
+                future.set_result(results[image_path])
+
+        # Duplicatas só depois das originais do próprio grupo
+        for image_path, check in duplicates.items():
+            results[image_path] = self.duplicate_results(check)
+        return results
+
+    def process_files(self, image_paths, on_result=None):
+        """
+        Processa uma lista de imagens, em paralelo se workers > 1. Com o OCR
+        em lote do extrator as imagens seguem em grupos de batch_pages páginas
+        (ver process_group)
+
+        Args:
+            image_paths: Lista de caminhos
+            on_result: Callback opcional chamado como on_result(caminho, resultados)
+                      após cada imagem, na ordem em que terminam
+
+        Returns:
+            Dicionário {caminho: resultados} na ordem de entrada
+        """
+        results = {}
+        started = []
+        self.record("gauge", "bbox_batch_pages_pending",
+                    "Páginas aguardando processamento", len(image_paths))
+
+        def process(image_path):
+            self.record("gauge", "bbox_batch_pages_in_flight",
+                        "Páginas em processamento")
+            try:
+                if self.memory_budget is None:
+                    return self.process_file(image_path)
+                with span(self.extractor.tracer, "memory_wait"):
+                    token = self.memory_budget.acquire(image_path, lambda: self.running)
+                try:
+                    return self.process_file(image_path)
+                finally:
+                    self.memory_budget.release(token)
+            finally:
+                self.record("gauge", "bbox_batch_pages_in_flight",
+                            "Páginas em processamento", -1)
+
+        def finish(image_path, result):
+            if self.profiler is not None:
+                self.profiler.page_done()
+            self.record("counter", "bbox_batch_pages_done_total",
+                        "Páginas concluídas no lote")
+            if result is None and image_path not in self.page_status:
+                self.record("counter", "bbox_batch_page_errors_total",
+                            "Páginas sem resultado por erro de leitura ou processamento")
+            self.record_cache()
+
+        def handle(group):
+            started.extend(group)
+            self.record("gauge", "bbox_batch_pages_pending",
+                        "Páginas aguardando processamento", -len(group))
+            if not self.running:
+                return [(image_path, None) for image_path in group]
+            if len(group) == 1:
+                with document(self.extractor.tracer, group[0]):
+                    group_results = {group[0]: process(group[0])}
+            else:
+                self.record("gauge", "bbox_batch_pages_in_flight",
+                            "Páginas em processamento", len(group))
+                try:
+                    group_results = self.process_group(group)
+                finally:
+                    self.record("gauge", "bbox_batch_pages_in_flight",
+                                "Páginas em processamento", -len(group))
+            for image_path in group:
+                finish(image_path, group_results[image_path])
+            return [(image_path, group_results[image_path]) for image_path in group]
+
+        size = max(1, self.batch_pages) if self.extractor.batch_ocr else 1
+        groups = [image_paths[i:i + size] for i in range(0, len(image_paths), size)]
+
+        def collect(completed):
+            for image_path, result in itertools.chain.from_iterable(completed):
+                if not self.running:
+                    break
+                results[image_path] = result
+                if on_result:
+                    on_result(image_path, result)
+
+        if self.workers == 1:
+            collect(map(handle, groups))
+        else:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                collect(pool.map(handle, groups))
+
+        if self.extractor.page_cache is not None:
+            self.extractor.page_cache.save()
+        if self.page_filter is not None:
+            self.page_filter.save()
+        # Páginas não iniciadas por interrupção deixam de estar pendentes
+        self.record("gauge", "bbox_batch_pages_pending",
+                    "Páginas aguardando processamento",
+                    -(len(image_paths) - len(started)))
+
+        return {p: results[p] for p in image_paths if p in results}
+
+    @staticmethod
+    def results_name(image_path):
+        """Nome do arquivo JSON de resultados de uma imagem"""
+        return f"{Path(image_path).stem}_results.json"
+
+    def write_results(self, output_dir, image_path, results):
+        """Salva os resultados de uma imagem em JSON"""
+        output_file = Path(output_dir) / self.results_name(image_path)
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=4, ensure_ascii=False)
+        return output_file
+
+    def validate_columns(self, rows):
+        """
+        Normaliza e valida cada campo como uma coluna (todos os CPFs, todas as
+        datas...) usando a API em lote de field_types
+
+        Args:
+            rows: Lista de dicionários de resultados
+
+        Returns:
+            Tupla (colunas {campo: valores}, inválidos {campo: [bool]})
+        """
+        regions = self.template.get("regions", {})
+        columns = {}
+        invalid = {}
+        for field in self.field_order():
+            expected_type = regions[field].get("expected_type", "text")
+            values = post_process_column(
+                [results.get(field, '') for results in rows], expected_type)
+            columns[field] = values
+            invalid[field] = [not ok for ok in validate_column(values, expected_type)]
+        return columns, invalid
+
+    def write_consolidated(self, output_dir, all_results):
+        """
+        Salva todos os resultados em um único CSV, com a coluna
+        "campos_invalidos" listando os campos que não passaram na validação
+        do seu tipo
+
+        Args:
+            output_dir: Diretório de saída
+            all_results: Dicionário {caminho: resultados}
+        """
+        csv_path = Path(output_dir) / self.CONSOLIDATED_FILE
+        field_order = self.field_order()
+
+        labels = []
+        rows = []
+        for image_path, results in all_results.items():
+            if results is None:
+                continue
+            # Caminhos relativos (jobs distribuídos) mantêm os subdiretórios
+            label = Path(image_path)
+            labels.append(label.name if label.is_absolute() else label.as_posix())
+            rows.append(results)
+
+        columns, invalid = self.validate_columns(rows)
+
+        with open(csv_path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f, delimiter=';')
+            writer.writerow(["arquivo"] + field_order + ["campos_invalidos"])
+            for i, label in enumerate(labels):
+                writer.writerow(
+                    [label] +
+                    [columns[field][i] for field in field_order] +
+                    [','.join(field for field in field_order if invalid[field][i])]
+                )
+        return csv_path
+
+    def write_metadata(self, output_dir, input_dir, files, pages=None):
+        """
+        Salva os metadados da execução: template usado, diretório de entrada e
+        o arquivo de resultados de cada imagem. Permite reextrair apenas os
+        campos alterados quando o template muda (ver reextract.py).
+
+        Args:
+            output_dir: Diretório de saída
+            input_dir: Diretório de entrada
+            files: Dicionário {imagem relativa à entrada: JSON relativo à
+                   saída ou None se a imagem falhou ou foi ignorada}
+            pages: Dicionário opcional {imagem relativa: verificação do
+                   filtro de páginas} das páginas em branco ou duplicadas
+        """
+        metadata_path = Path(output_dir) / self.METADATA_FILE
+        metadata = {
+            "input_dir": str(Path(input_dir).resolve()),
+            "template": self.template,
+            "updated": datetime.now().isoformat(),
+            "files": files
+        }
+        if pages:
+            metadata["pages"] = pages
+        write_json_atomic(metadata_path, metadata)
+        return metadata_path
+
+    def run(self, input_dir, output_dir, consolidate=False, on_progress=None):
+        """
+        Processa todas as imagens de um diretório
+
+        Args:
+            input_dir: Diretório com as imagens
+            output_dir: Diretório para os resultados
+            consolidate: Se True, gera também o CSV consolidado
+            on_progress: Callback opcional on_progress(concluídas, total, caminho)
+
+        Returns:
+            Dicionário {caminho: resultados}
+        """
+        image_files = self.list_images(input_dir)
+        if not image_files:
+            raise ValueError("Nenhuma imagem encontrada")
+
+        output_path = Path(output_dir)
+        output_path.mkdir(parents=True, exist_ok=True)
+
+        total = len(image_files)
+        done = 0
+
+        def on_result(image_path, results):
+            nonlocal done
+            done += 1
+            if results:
+                with span(self.extractor.tracer, "write", document=str(image_path)):
+                    self.write_results(output_path, image_path, results)
+            if on_progress:
+                on_progress(done, total, image_path)
+
+        all_results = self.process_files(image_files, on_result)
+
+        if consolidate:
+            with span(self.extractor.tracer, "write_consolidated"):
+                self.write_consolidated(output_path, all_results)
+
+        self.write_metadata(output_path, input_dir, {
+            Path(image_path).name: (self.results_name(image_path)
+                                    if results else None)
+            for image_path, results in all_results.items()
+        }, {
+            Path(image_path).name: {key: value for key, value in check.items()
+                                    if key != "digest"}
+            for image_path, check in self.page_status.items()
+        })
+
+        return all_results
+
+    def stop(self):
+        """Interrompe o processamento após as imagens em andamento"""
+        self.running = False
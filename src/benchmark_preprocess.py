@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Benchmark dos perfis de pré-processamento.
+
+Para cada perfil e cada tipo de campo do template, mede o tempo de
+pré-processamento, o tempo de OCR e (quando há gabarito) a taxa de acerto.
+
+Uso:
+    python benchmark_preprocess.py amostras/ --doc-type NE --template padrao \
+        --ground-truth gabarito.json
+
+O gabarito é um JSON no formato {"arquivo.png": {"CAMPO": "valor", ...}}.
+"""
+
+import argparse
+import json
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import pytesseract
+
+# Adicionar o diretório src ao PYTHONPATH
+src_dir = Path(__file__).resolve().parent
+sys.path.append(str(src_dir))
+
+from page_cache import PageCache
+from preprocessing import PREPROCESS_PROFILES
+from roi_extractor import ROIExtractor
+from gui.template_manager import TemplateManager
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Compara perfis de pré-processamento por tipo de campo"
+    )
+    parser.add_argument("input_dir", help="Diretório com as imagens de amostra")
+    parser.add_argument("--doc-type", required=True, help="Tipo de documento")
+    parser.add_argument("--template", required=True, help="Nome do template")
+    parser.add_argument("--ground-truth", help="JSON com os valores esperados")
+    parser.add_argument("--profiles", nargs="+",
+                        default=sorted(PREPROCESS_PROFILES),
+                        help="Perfis a comparar (padrão: todos)")
+    parser.add_argument("--no-ocr", action="store_true",
+                        help="Mede apenas o pré-processamento")
+    parser.add_argument("--page-cache",
+                        help="Diretório do cache de páginas padronizadas")
+    parser.add_argument("--page-cache-mb", type=int, default=2048,
+                        help="Tamanho máximo do cache de páginas (MB)")
+    return parser.parse_args()
+
+
+def run_benchmark(extractor, images, regions, profiles, ground_truth, use_ocr):
+    """
+    Executa o benchmark
+
+    Returns:
+        Dicionário {(perfil, tipo): estatísticas}
+    """
+    stats = defaultdict(lambda: {"n": 0, "pre": 0.0, "ocr": 0.0, "hits": 0, "checked": 0})
+
+    for img_path in images:
+        standardized = extractor.load_page(img_path)
+        if standardized is None:
+            print(f"Ignorando {img_path.name}: não foi possível ler a imagem")
+            continue
+        expected = ground_truth.get(img_path.name, {})
+
+        for name, region in regions.items():
+            expected_type = region["expected_type"]
+            roi = extractor.extract_roi(standardized, region["coords"])
+
+            for profile in profiles:
+                entry = stats[(profile, expected_type)]
+
+                start = time.perf_counter()
+                processed = extractor.preprocess_roi(roi, expected_type, profile)
+                entry["pre"] += time.perf_counter() - start
+                entry["n"] += 1
+
+                if not use_ocr:
+                    continue
+
+                start = time.perf_counter()
+                raw = pytesseract.image_to_string(
+                    processed,
+                    lang='por',
+                    config=extractor.tesseract_config[expected_type]
+                ).strip()
+                entry["ocr"] += time.perf_counter() - start
+
+                if name in expected:
+                    text = extractor.post_process_text(raw, expected_type)
+                    entry["checked"] += 1
+                    entry["hits"] += int(text == expected[name])
+
+    return stats
+
+
+def print_report(stats):
+    """Imprime a tabela de resultados"""
+    header = f"{'tipo':<10}{'perfil':<15}{'n':>5}{'pre (ms)':>11}{'ocr (ms)':>11}{'acerto':>9}"
+    print(header)
+    print("-" * len(header))
+    for (profile, expected_type), entry in sorted(stats.items(),
+                                                  key=lambda kv: (kv[0][1], kv[0][0])):
+        n = entry["n"] or 1
+        accuracy = (f"{100 * entry['hits'] / entry['checked']:.1f}%"
+                    if entry["checked"] else "-")
+        print(f"{expected_type:<10}{profile:<15}{entry['n']:>5}"
+              f"{1000 * entry['pre'] / n:>11.2f}{1000 * entry['ocr'] / n:>11.2f}"
+              f"{accuracy:>9}")
+
+
+def main():
+    args = parse_args()
+
+    unknown = [p for p in args.profiles if p not in PREPROCESS_PROFILES]
+    if unknown:
+        print(f"Perfis desconhecidos: {', '.join(unknown)}")
+        return 1
+
+    template_manager = TemplateManager()
+    template = template_manager.get_template(args.doc_type, args.template)
+    if not template:
+        print("Template não encontrado!")
+        return 1
+
+    input_path = Path(args.input_dir)
+    images = sorted(list(input_path.glob("*.png")) + list(input_path.glob("*.jpg")))
+    if not images:
+        print(f"Nenhuma imagem encontrada em {input_path}")
+        return 1
+
+    ground_truth = {}
+    if args.ground_truth:
+        with open(args.ground_truth, 'r', encoding='utf-8') as f:
+            ground_truth = json.load(f)
+
+    extractor = ROIExtractor(template_manager)
+    if args.page_cache:
+        extractor.page_cache = PageCache(args.page_cache,
+                                         args.page_cache_mb * 1024 * 1024)
+    stats = run_benchmark(
+        extractor,
+        images,
+        template["regions"],
+        args.profiles,
+        ground_truth,
+        not args.no_ocr
+    )
+    if extractor.page_cache is not None:
+        extractor.page_cache.save()
+    print_report(stats)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,537 @@
+#!/usr/bin/env python3
+"""
+Interface de linha de comando para processamento em lote (sem GUI).
+
+Comandos:
+    batch   Processa um diretório localmente
+    shard   Cria um job distribuído dividindo as imagens em shards
+    work    Executa um worker que reivindica e processa shards do job
+    status  Mostra o andamento de um job
+    merge   Consolida os resultados parciais de um job
+    serve   Inicia o serviço HTTP local de extração
+    reextract  Reextrai apenas os campos alterados de um template
+
+Exemplo com vários workers locais:
+    python cli.py shard --input imagens/ --job-dir job/ --doc-type NE --template padrao
+    python cli.py work --job-dir job/ &
+    python cli.py work --job-dir job/ &
+    python cli.py merge --job-dir job/ --output resultados/
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+
+# Adicionar o diretório src ao PYTHONPATH
+src_dir = Path(__file__).resolve().parent
+sys.path.append(str(src_dir))
+
+from batch_processor import BatchProcessor
+from cpu_budget import CPUBudget
+from job_queue import Heartbeat, JobQueue, default_worker_id, write_json_atomic
+from logging_setup import configure_logging
+from memory_budget import MemoryBudget, roi_peak_bytes
+from metrics import MetricsRegistry, MetricsServer, MetricsSnapshotter
+from page_cache import PageCache
+from page_filter import PageFilter
+from profiler import SamplingProfiler
+from reextract import Reextractor
+from roi_extractor import ROIExtractor
+from service import ExtractionService
+from tracing import Tracer
+from gui.template_manager import TemplateManager
+
+
+def load_template(doc_type, template_name):
+    """Carrega um template do TemplateManager ou encerra com erro"""
+    template = TemplateManager().get_template(doc_type, template_name)
+    if not template:
+        sys.exit(f"Template não encontrado: {doc_type}/{template_name}")
+    return template
+
+
+def cpu_budget_arg(value):
+    """Valida --cpu-budget: 'auto' ou quantidade de núcleos"""
+    if value == "auto":
+        return value
+    try:
+        cores = int(value)
+    except ValueError:
+        cores = 0
+    if cores < 1:
+        raise argparse.ArgumentTypeError("use 'auto' ou um número de núcleos")
+    return cores
+
+
+def apply_cpu_budget(args, processor, input_dir, recursive=False):
+    """
+    Ajusta workers e threads do Tesseract/OpenCV conforme --cpu-budget
+
+    Args:
+        args: Argumentos da linha de comando
+        processor: BatchProcessor do lote
+        input_dir: Diretório de onde saem as páginas de amostra do modo
+                  automático (listado apenas nesse modo, até --cpu-sample)
+        recursive: Se True, as amostras podem vir de subdiretórios
+    """
+    if not args.cpu_budget:
+        return
+    if args.cpu_budget == "auto":
+        budget = CPUBudget()
+        print(f"Calibrando o uso de CPU ({budget.cores} núcleos)...")
+        config = budget.autotune(
+            processor,
+            BatchProcessor.sample_images(input_dir, args.cpu_sample, recursive),
+            on_config=lambda config, rate: print(
+                f"  {config['workers']} workers x {config['omp_threads']} threads: "
+                f"{rate:.2f} páginas/s")
+        )
+    else:
+        budget = CPUBudget(args.cpu_budget)
+        config = budget.default()
+        budget.apply(config, processor)
+    print(f"Usando {config['workers']} workers com {config['omp_threads']} thread(s) cada")
+
+
+def apply_batch_ocr(args, processor):
+    """Ativa o OCR em faixa composta entre páginas (--batch-ocr)"""
+    if args.batch_ocr:
+        processor.extractor.batch_ocr = True
+        processor.batch_pages = args.batch_pages
+
+
+def apply_memory_budget(args, processor):
+    """Limita as páginas em processamento conforme --memory-budget-mb"""
+    if not args.memory_budget_mb:
+        return
+    extractor = processor.extractor
+    processor.memory_budget = MemoryBudget(
+        args.memory_budget_mb * 1024 * 1024,
+        (extractor.target_width, extractor.target_height),
+        roi_peak_bytes(processor.template.get("regions", {}))
+    )
+
+
+def start_metrics(args, extractor, labels):
+    """
+    Ativa as métricas conforme --metrics-port e --metrics-file
+
+    Returns:
+        Lista de exportadores a encerrar com stop_metrics
+    """
+    if not args.metrics_port and not args.metrics_file:
+        return []
+    extractor.metrics = MetricsRegistry()
+    extractor.metric_labels = labels
+    exporters = []
+    if args.metrics_port:
+        server = MetricsServer(extractor.metrics, port=args.metrics_port).start()
+        print(f"Métricas em {server.address}")
+        exporters.append(server)
+    if args.metrics_file:
+        exporters.append(MetricsSnapshotter(
+            extractor.metrics, args.metrics_file, args.metrics_interval).start())
+    return exporters
+
+
+def stop_metrics(exporters):
+    """Grava o último instantâneo e encerra o endpoint de métricas"""
+    for exporter in exporters:
+        exporter.stop()
+
+
+def start_tracing(args, extractor, process_name):
+    """Ativa o rastreamento das etapas conforme --trace"""
+    if not args.trace:
+        return None
+    extractor.tracer = Tracer(args.trace, process_name)
+    print(f"Rastreamento em {args.trace} (abrir em https://ui.perfetto.dev)")
+    return extractor.tracer
+
+
+def stop_tracing(tracer):
+    if tracer is not None:
+        tracer.close()
+
+
+def cmd_batch(args):
+    """Processa um diretório localmente"""
+    template = load_template(args.doc_type, args.template)
+    extractor = ROIExtractor()
+    if args.page_cache:
+        extractor.page_cache = PageCache(args.page_cache,
+                                         args.page_cache_mb * 1024 * 1024)
+    processor = BatchProcessor(extractor, template, workers=args.workers)
+    if args.filter_pages or args.page_index:
+        processor.page_filter = PageFilter(index_path=args.page_index)
+    apply_batch_ocr(args, processor)
+    apply_cpu_budget(args, processor, args.input)
+    apply_memory_budget(args, processor)
+    # Depois da calibração de CPU, cujas páginas de amostra não entram nas métricas
+    exporters = start_metrics(args, extractor, {"doc_type": args.doc_type,
+                                                "template": args.template})
+    tracer = start_tracing(args, extractor, "bbox batch")
+    if args.profile:
+        processor.profiler = SamplingProfiler(args.profile_interval / 1000,
+                                              args.profile_pages).start()
+
+    def on_progress(done, total, image_path):
+        print(f"[{done}/{total}] {Path(image_path).name}")
+
+    try:
+        processor.run(args.input, args.output,
+                      consolidate=args.consolidate, on_progress=on_progress)
+    finally:
+        stop_tracing(tracer)
+        stop_metrics(exporters)
+        if processor.profiler is not None:
+            _, report_path = processor.profiler.write(args.output)
+            print(f"Perfil gravado em {report_path}")
+
+    if processor.memory_budget is not None:
+        stats = processor.memory_budget.stats()
+        print(f"Memória: pico {stats['peak_rss'] / 2**20:.0f} MB, até "
+              f"{stats['peak_in_flight']} páginas simultâneas, "
+              f"{stats['waits']} espera(s) por memória")
+
+    for image_path, check in processor.page_status.items():
+        if check["status"] == "blank":
+            print(f"Em branco: {Path(image_path).name}")
+        else:
+            print(f"{Path(image_path).name}: {check['status']} de {Path(check['of']).name}")
+    return 0
+
+
+def cmd_shard(args):
+    """Cria o job distribuído (coordenador)"""
+    template = load_template(args.doc_type, args.template)
+    image_files = BatchProcessor.list_images(args.input, recursive=args.recursive)
+    if not image_files:
+        sys.exit(f"Nenhuma imagem encontrada em {args.input}")
+
+    queue = JobQueue(args.job_dir)
+    shard_count = queue.create(args.input, image_files, template, args.shard_size)
+    print(f"{len(image_files)} imagens divididas em {shard_count} shards em {args.job_dir}")
+    return 0
+
+
+def cmd_work(args):
+    """Reivindica e processa shards até a fila esvaziar"""
+    queue = JobQueue(args.job_dir, lease_timeout=args.lease_timeout)
+    job = queue.load_job()
+    input_dir = Path(args.input_dir or job["input_dir"])
+    worker_id = args.worker_id or default_worker_id()
+
+    processor = BatchProcessor(ROIExtractor(), job["template"], workers=args.workers)
+    apply_batch_ocr(args, processor)
+    apply_cpu_budget(args, processor, input_dir, recursive=True)
+    apply_memory_budget(args, processor)
+    exporters = start_metrics(args, processor.extractor,
+                              {"template": job["template"].get("name", "")})
+    tracer = start_tracing(args, processor.extractor, f"bbox work {worker_id}")
+    try:
+        processed = work_shards(args, queue, processor, input_dir, worker_id)
+    finally:
+        stop_tracing(tracer)
+        stop_metrics(exporters)
+
+    print(f"{worker_id}: {processed} shards processados")
+    return 0
+
+
+def work_shards(args, queue, processor, input_dir, worker_id):
+    """
+    Reivindica e processa shards até a fila esvaziar (ou --max-shards)
+
+    Returns:
+        Quantidade de shards processados
+    """
+    metrics = processor.extractor.metrics
+    processed = 0
+
+    while True:
+        if metrics is not None:
+            metrics.gauge("bbox_job_shards_pending",
+                          "Shards do job ainda não reivindicados").set(
+                queue.status()["pending"])
+
+        shard_id = queue.claim(worker_id)
+        if shard_id is None:
+            status = queue.status()
+            if args.wait and status["done"] < status["total"]:
+                # Shards de outros workers ainda podem expirar e ser retomados
+                time.sleep(args.poll_interval)
+                continue
+            break
+
+        files = queue.load_shard(shard_id)
+        print(f"{worker_id}: shard {shard_id} ({len(files)} imagens)")
+
+        try:
+            with Heartbeat(queue, shard_id, worker_id):
+                paths = [input_dir / f for f in files]
+                results = processor.process_files(paths)
+        except Exception as e:
+            logging.getLogger(__name__).error(f"Erro no shard {shard_id}: {e}")
+            queue.release(shard_id, worker_id)
+            raise
+
+        queue.complete(shard_id, {
+            f: results.get(input_dir / f) for f in files
+        }, worker_id)
+        processed += 1
+
+        if args.max_shards and processed >= args.max_shards:
+            break
+
+    return processed
+
+
+def cmd_status(args):
+    """Mostra o andamento do job"""
+    status = JobQueue(args.job_dir).status()
+    print(json.dumps(status, indent=4))
+    return 0
+
+
+def cmd_merge(args):
+    """Consolida os resultados parciais em um diretório de saída"""
+    queue = JobQueue(args.job_dir)
+    job = queue.load_job()
+    status = queue.status()
+    if status["done"] < status["total"] and not args.partial:
+        sys.exit(f"Job incompleto ({status['done']}/{status['total']} shards). "
+                 "Use --partial para consolidar mesmo assim.")
+
+    merged = queue.merged_results()
+    output_path = Path(args.output)
+    output_path.mkdir(parents=True, exist_ok=True)
+
+    processor = BatchProcessor(None, job["template"])
+    for rel_path, results in merged.items():
+        if results:
+            target_dir = output_path / Path(rel_path).parent
+            target_dir.mkdir(parents=True, exist_ok=True)
+            processor.write_results(target_dir, rel_path, results)
+
+    write_json_atomic(output_path / "resultados.json", merged)
+    csv_path = processor.write_consolidated(output_path, merged)
+    processor.write_metadata(output_path, job["input_dir"], {
+        rel_path: ((Path(rel_path).parent / processor.results_name(rel_path)).as_posix()
+                   if results else None)
+        for rel_path, results in merged.items()
+    })
+    print(f"{len(merged)} resultados consolidados em {csv_path}")
+    return 0
+
+
+def cmd_reextract(args):
+    """Atualiza resultados existentes para a versão atual do template"""
+    template = load_template(args.doc_type, args.template)
+    try:
+        reextractor = Reextractor(ROIExtractor(), args.output)
+    except ValueError as e:
+        sys.exit(str(e))
+
+    changed, removed = reextractor.plan(template)
+    print(f"Campos a reextrair: {', '.join(changed) or '-'}")
+    print(f"Campos removidos: {', '.join(removed) or '-'}")
+    if args.dry_run or (not changed and not removed):
+        return 0
+
+    def on_progress(done, total, image_path):
+        print(f"[{done}/{total}] {Path(image_path).name}")
+
+    summary = reextractor.run(template, input_dir=args.input_dir,
+                              workers=args.workers, on_progress=on_progress)
+    print(f"{summary['updated']} resultados atualizados")
+    if summary["failed"]:
+        print(f"{len(summary['failed'])} imagens falharam e exigem processamento "
+              f"completo (campos limpos: {', '.join(summary['changed'])}):")
+        for rel in summary["failed"]:
+            print(f"  {rel}")
+        return 1
+    return 0
+
+
+def cmd_serve(args):
+    """Inicia o serviço HTTP de extração"""
+    service = ExtractionService(
+        TemplateManager(),
+        workers=args.workers,
+        max_concurrency=args.max_concurrency,
+        queue_timeout=args.queue_timeout,
+        batch_size=args.batch_size,
+        batch_wait=args.batch_wait / 1000,
+        batch_ocr=args.batch_ocr
+    )
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def add_budget_args(parser):
+    """Opções dos orçamentos de CPU e memória (batch e work)"""
+    parser.add_argument("--cpu-budget", type=cpu_budget_arg,
+                        help="Núcleos divididos entre workers e threads do "
+                             "Tesseract/OpenCV, ou 'auto' para medir as opções "
+                             "em páginas de amostra (substitui --workers)")
+    parser.add_argument("--cpu-sample", type=int, default=8,
+                        help="Páginas de amostra do --cpu-budget auto")
+    parser.add_argument("--memory-budget-mb", type=int, default=0,
+                        help="Memória máxima (MB); novas páginas aguardam até "
+                             "caberem no limite, reduzindo o paralelismo")
+
+
+def add_batch_ocr_args(parser):
+    """Opções do OCR em faixa composta entre páginas (batch e work)"""
+    parser.add_argument("--batch-ocr", action="store_true",
+                        help="OCR em faixa composta entre páginas: as ROIs de "
+                             "cada grupo de --batch-pages páginas são "
+                             "reconhecidas juntas")
+    parser.add_argument("--batch-pages", type=int, default=8,
+                        help="Páginas por grupo do --batch-ocr")
+
+
+def add_metrics_args(parser):
+    """Opções de exportação das métricas e do rastreamento (batch e work)"""
+    parser.add_argument("--metrics-port", type=int, default=0,
+                        help="Porta local do endpoint de métricas no formato "
+                             "do Prometheus (GET /metrics)")
+    parser.add_argument("--metrics-file",
+                        help="Arquivo JSON Lines com instantâneos periódicos "
+                             "das métricas")
+    parser.add_argument("--metrics-interval", type=float, default=30,
+                        help="Segundos entre os instantâneos de --metrics-file")
+    parser.add_argument("--trace",
+                        help="Arquivo Chrome trace (JSON) com as etapas de cada "
+                             "documento, para abrir no Perfetto")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Processamento em lote de documentos")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    batch = sub.add_parser("batch", help="Processa um diretório localmente")
+    batch.add_argument("--input", required=True, help="Diretório de entrada")
+    batch.add_argument("--output", required=True, help="Diretório de saída")
+    batch.add_argument("--doc-type", required=True, help="Tipo de documento")
+    batch.add_argument("--template", required=True, help="Nome do template")
+    batch.add_argument("--workers", type=int, default=1,
+                       help="Imagens processadas em paralelo")
+    batch.add_argument("--consolidate", action="store_true",
+                       help="Gera o CSV consolidado")
+    batch.add_argument("--page-cache",
+                       help="Diretório do cache de páginas padronizadas "
+                            "(acelera passadas repetidas sobre as mesmas imagens)")
+    batch.add_argument("--page-cache-mb", type=int, default=2048,
+                       help="Tamanho máximo do cache de páginas (MB)")
+    batch.add_argument("--filter-pages", action="store_true",
+                       help="Ignora páginas em branco e reaproveita os resultados "
+                            "de páginas duplicadas")
+    batch.add_argument("--page-index",
+                       help="Índice JSON persistente de páginas já processadas "
+                            "(implica --filter-pages)")
+    batch.add_argument("--profile", action="store_true",
+                       help="Amostra as pilhas de todas as threads durante o lote e "
+                            "grava _profile.collapsed (flamegraph) e _profile.txt "
+                            "(tempo de Python, OpenCV e Tesseract) na saída")
+    batch.add_argument("--profile-pages", type=int, default=0,
+                       help="Encerra a amostragem após N páginas (0: lote inteiro)")
+    batch.add_argument("--profile-interval", type=float, default=10,
+                       help="Intervalo entre amostras do --profile (ms)")
+    add_batch_ocr_args(batch)
+    add_budget_args(batch)
+    add_metrics_args(batch)
+    batch.set_defaults(func=cmd_batch)
+
+    shard = sub.add_parser("shard", help="Cria um job distribuído")
+    shard.add_argument("--input", required=True, help="Diretório de entrada")
+    shard.add_argument("--job-dir", required=True, help="Diretório compartilhado do job")
+    shard.add_argument("--doc-type", required=True, help="Tipo de documento")
+    shard.add_argument("--template", required=True, help="Nome do template")
+    shard.add_argument("--shard-size", type=int, default=50,
+                       help="Imagens por shard")
+    shard.add_argument("--recursive", action="store_true",
+                       help="Inclui subdiretórios da entrada")
+    shard.set_defaults(func=cmd_shard)
+
+    work = sub.add_parser("work", help="Executa um worker do job")
+    work.add_argument("--job-dir", required=True, help="Diretório compartilhado do job")
+    work.add_argument("--input-dir",
+                      help="Caminho da entrada nesta máquina (se diferente do job)")
+    work.add_argument("--worker-id", help="Identificador do worker")
+    work.add_argument("--workers", type=int, default=1,
+                      help="Imagens processadas em paralelo neste worker")
+    work.add_argument("--lease-timeout", type=float, default=120,
+                      help="Segundos sem heartbeat para um shard ser retomado")
+    work.add_argument("--max-shards", type=int, default=0,
+                      help="Encerra após N shards (0 = sem limite)")
+    work.add_argument("--wait", action="store_true",
+                      help="Aguarda shards de outros workers até o job terminar")
+    work.add_argument("--poll-interval", type=float, default=5,
+                      help="Intervalo de espera com --wait (segundos)")
+    add_batch_ocr_args(work)
+    add_budget_args(work)
+    add_metrics_args(work)
+    work.set_defaults(func=cmd_work)
+
+    status = sub.add_parser("status", help="Mostra o andamento de um job")
+    status.add_argument("--job-dir", required=True, help="Diretório compartilhado do job")
+    status.set_defaults(func=cmd_status)
+
+    merge = sub.add_parser("merge", help="Consolida os resultados de um job")
+    merge.add_argument("--job-dir", required=True, help="Diretório compartilhado do job")
+    merge.add_argument("--output", required=True, help="Diretório de saída")
+    merge.add_argument("--partial", action="store_true",
+                       help="Consolida mesmo com shards pendentes")
+    merge.set_defaults(func=cmd_merge)
+
+    reextract = sub.add_parser(
+        "reextract", help="Reextrai apenas os campos alterados do template")
+    reextract.add_argument("--output", required=True,
+                           help="Diretório com os resultados existentes")
+    reextract.add_argument("--doc-type", required=True, help="Tipo de documento")
+    reextract.add_argument("--template", required=True, help="Nome do template")
+    reextract.add_argument("--input-dir",
+                           help="Diretório das imagens (se diferente do registrado)")
+    reextract.add_argument("--workers", type=int, default=1,
+                           help="Imagens processadas em paralelo")
+    reextract.add_argument("--dry-run", action="store_true",
+                           help="Apenas mostra os campos que seriam reextraídos")
+    reextract.set_defaults(func=cmd_reextract)
+
+    serve = sub.add_parser("serve", help="Inicia o serviço HTTP de extração")
+    serve.add_argument("--host", default="127.0.0.1", help="Endereço de escuta")
+    serve.add_argument("--port", type=int, default=8080, help="Porta de escuta")
+    serve.add_argument("--workers", type=int, default=2,
+                       help="Threads do pool de OCR")
+    serve.add_argument("--max-concurrency", type=int, default=16,
+                       help="Requisições atendidas simultaneamente")
+    serve.add_argument("--queue-timeout", type=float, default=30,
+                       help="Espera máxima na fila (segundos)")
+    serve.add_argument("--batch-size", type=int, default=8,
+                       help="Tamanho máximo do micro-lote")
+    serve.add_argument("--batch-wait", type=float, default=20,
+                       help="Espera para formar o micro-lote (ms)")
+    serve.add_argument("--batch-ocr", action="store_true",
+                       help="OCR em faixa composta entre páginas do lote")
+    serve.set_defaults(func=cmd_serve)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    configure_logging()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
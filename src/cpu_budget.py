@@ -0,0 +1,153 @@
+"""
+Orçamento de CPU do processamento em lote.
+
+O Tesseract (OpenMP) e o OpenCV mantêm pools de threads próprios; com várias
+imagens processadas em paralelo cada worker multiplica essas threads e os
+núcleos ficam sobrecarregados. O orçamento divide um número fixo de núcleos
+entre a quantidade de workers e as threads de cada biblioteca
+(OMP_THREAD_LIMIT, herdado pelos processos do Tesseract, e
+cv2.setNumThreads), de modo que workers x threads não passe do total.
+
+As configurações valem para o processo inteiro (a interface as restaura ao
+fim de cada lote, ver current e restore). No modo automático algumas
+divisões são medidas sobre páginas de amostra e a mais rápida é aplicada.
+"""
+
+import logging
+import os
+import time
+
+import cv2
+
+
+def available_cores():
+    """Núcleos disponíveis para o processo (respeita a afinidade de CPU)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+class CPUBudget:
+    """
+    Divide os núcleos entre workers e threads do Tesseract/OpenCV
+    """
+
+    def __init__(self, cores=None):
+        """
+        Args:
+            cores: Núcleos do orçamento (padrão: todos os disponíveis)
+        """
+        self.cores = max(1, int(cores or available_cores()))
+        self.logger = logging.getLogger(__name__)
+
+    def split(self, workers):
+        """
+        Configuração com a quantidade de workers informada e as threads
+        restantes divididas entre eles
+
+        Returns:
+            Dicionário com "workers", "omp_threads" e "cv_threads"
+        """
+        workers = max(1, min(int(workers), self.cores))
+        threads = max(1, self.cores // workers)
+        return {"workers": workers, "omp_threads": threads, "cv_threads": threads}
+
+    def default(self):
+        """Um worker por núcleo, cada um com uma única thread"""
+        return self.split(self.cores)
+
+    def candidates(self):
+        """Divisões testadas no modo automático, da mais paralela à menos"""
+        workers = []
+        for count in (self.cores, self.cores // 2, self.cores // 4, 1):
+            if count >= 1 and count not in workers:
+                workers.append(count)
+        return [self.split(count) for count in workers]
+
+    def apply(self, config, processor=None):
+        """
+        Aplica uma configuração ao processo e, opcionalmente, ao processador
+
+        Args:
+            config: Dicionário retornado por split/default/autotune
+            processor: BatchProcessor cujo número de workers será ajustado
+        """
+        os.environ["OMP_THREAD_LIMIT"] = str(config["omp_threads"])
+        cv2.setNumThreads(config["cv_threads"])
+        if processor is not None:
+            processor.workers = config["workers"]
+        self.logger.info(
+            f"Orçamento de CPU ({self.cores} núcleos): {config['workers']} workers, "
+            f"{config['omp_threads']} threads OpenMP, {config['cv_threads']} threads OpenCV"
+        )
+
+    @staticmethod
+    def current():
+        """
+        Configurações de threads atuais do processo, para restore
+
+        Returns:
+            Dicionário com "omp_thread_limit" (None se não definido) e "cv_threads"
+        """
+        return {"omp_thread_limit": os.environ.get("OMP_THREAD_LIMIT"),
+                "cv_threads": cv2.getNumThreads()}
+
+    @staticmethod
+    def restore(saved):
+        """Restaura as configurações de threads salvas por current"""
+        if saved["omp_thread_limit"] is None:
+            os.environ.pop("OMP_THREAD_LIMIT", None)
+        else:
+            os.environ["OMP_THREAD_LIMIT"] = saved["omp_thread_limit"]
+        cv2.setNumThreads(saved["cv_threads"])
+
+    def measure(self, processor, sample_paths, config):
+        """Páginas por segundo de uma configuração sobre as amostras"""
+        self.apply(config, processor)
+        start = time.perf_counter()
+        processor.process_files(sample_paths)
+        elapsed = time.perf_counter() - start
+        return len(sample_paths) / elapsed if elapsed > 0 else 0.0
+
+    def autotune(self, processor, sample_paths, on_config=None):
+        """
+        Mede as configurações candidatas e aplica a mais rápida
+
+        Args:
+            processor: BatchProcessor usado no lote
+            sample_paths: Imagens de amostra (os resultados são descartados)
+            on_config: Callback opcional on_config(configuração, páginas/s)
+                      após cada medição
+
+        Returns:
+            Configuração escolhida, com a vazão medida em "pages_per_second"
+        """
+        if not sample_paths:
+            best = self.default()
+            self.apply(best, processor)
+            return best
+
+        # As medições não podem alimentar o filtro de páginas, o preview nem o
+        # cache de páginas (que favoreceria as configurações medidas depois)
+        saved = processor.page_filter, processor.on_image, processor.extractor.page_cache
+        processor.page_filter = processor.on_image = None
+        processor.extractor.page_cache = None
+        try:
+            # Aquecimento: arquivos no cache do sistema operacional para todos
+            for image_path in sample_paths:
+                processor.extractor.load_page(image_path)
+
+            best = None
+            for config in self.candidates():
+                rate = self.measure(processor, sample_paths, config)
+                self.logger.info(f"Orçamento de CPU: {config} -> {rate:.2f} páginas/s")
+                if on_config:
+                    on_config(config, rate)
+                if best is None or rate > best["pages_per_second"]:
+                    best = dict(config, pages_per_second=rate)
+        finally:
+            processor.page_filter, processor.on_image, processor.extractor.page_cache = saved
+
+        self.apply(best, processor)
+        return best
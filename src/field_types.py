@@ -0,0 +1,381 @@
+"""
+Registro dos tipos de campo (text, cpf, number, currency, date).
+
+Cada tipo concentra, com padrões e tabelas de tradução pré-compilados, a
+limpeza do texto do OCR, a validação do valor e os critérios usados para
+escolher entre várias leituras. Além das funções por valor há uma API em
+lote que processa uma coluna inteira (ex: todos os CPFs de um lote) com uma
+única passada de regex/str.translate sobre os valores concatenados.
+
+Os tipos numéricos validam o conteúdo (dígitos verificadores de CPF/CNPJ,
+datas existentes, formato monetário) e sabem corrigir leituras com as
+confusões mais comuns do OCR (O/0, l/1, S/5...) e, no caso de CPF/CNPJ, um
+único dígito trocado quando só uma substituição satisfaz os verificadores.
+"""
+
+import re
+from datetime import date
+
+# Caracteres removidos de qualquer leitura antes da formatação por tipo
+UNWANTED_CHARS = re.compile(r'[^\w\s./,-]')
+DATE_PARTS = re.compile(r'(\d{2})/(\d{2})/(\d{2,4})')
+# Ano com 4 dígitos antes do de 2: com o inverso um ano como 2023 seria
+# validado só pelos dois primeiros dígitos
+DATE_FORMAT = re.compile(r'(\d{2})/(\d{2})/(\d{4}|\d{2})')
+CURRENCY_FORMAT = re.compile(r'\d{1,3}(?:\.\d{3})*,\d{2}|\d+,\d{2}')
+
+# Letras que o OCR costuma ler no lugar de dígitos
+DIGIT_CONFUSIONS = str.maketrans({
+    'O': '0', 'o': '0', 'D': '0', 'Q': '0',
+    'l': '1', 'I': '1', 'i': '1', '|': '1', '!': '1',
+    'Z': '2', 'z': '2',
+    'S': '5', 's': '5',
+    'G': '6', 'b': '6',
+    'T': '7',
+    'B': '8',
+    'g': '9', 'q': '9',
+})
+
+# Separador dos valores concatenados na API em lote. É tratado como espaço
+# por \s, portanto sobrevive a UNWANTED_CHARS, e não aparece em leituras
+SEPARATOR = '\x1f'
+
+
+class KeepChars(dict):
+    """
+    Tabela para str.translate que mantém apenas os caracteres informados
+    e remove todos os demais (a decisão de cada caractere fica em cache)
+    """
+
+    def __init__(self, chars):
+        super().__init__()
+        self.keep = frozenset(map(ord, chars))
+
+    def __missing__(self, code):
+        value = code if code in self.keep else None
+        self[code] = value
+        return value
+
+
+DIGITS = '0123456789'
+
+CNPJ_WEIGHTS = (6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2)
+
+
+def cpf_is_valid(digits):
+    """Confere os dígitos verificadores de um CPF (11 dígitos)"""
+    if len(digits) != 11 or digits == digits[0] * 11:
+        return False
+    numbers = [int(d) for d in digits]
+    for size in (9, 10):
+        total = sum(n * w for n, w in zip(numbers, range(size + 1, 1, -1)))
+        check = total * 10 % 11 % 10
+        if check != numbers[size]:
+            return False
+    return True
+
+
+def cnpj_is_valid(digits):
+    """Confere os dígitos verificadores de um CNPJ (14 dígitos)"""
+    if len(digits) != 14 or digits == digits[0] * 14:
+        return False
+    numbers = [int(d) for d in digits]
+    for size in (12, 13):
+        total = sum(n * w for n, w in zip(numbers, CNPJ_WEIGHTS[13 - size:]))
+        remainder = total % 11
+        check = 0 if remainder < 2 else 11 - remainder
+        if check != numbers[size]:
+            return False
+    return True
+
+
+def date_is_valid(day, month, year):
+    """Verifica se a data existe (anos de 1900 a 2099)"""
+    try:
+        year = int(year)
+        if year < 100:
+            year += 2000
+        return 1900 <= year <= 2099 and bool(date(year, int(month), int(day)))
+    except ValueError:
+        return False
+
+
+class FieldType:
+    """
+    Tipo de campo base (texto livre)
+    """
+
+    name = "text"
+    # Se validate confere o formato do valor (e não apenas se há texto)
+    strict = False
+    # Se um valor válido é confiável o bastante para dispensar novas
+    # tentativas de OCR, independentemente da confiança do Tesseract
+    checksum = False
+    # Tabela de str.translate aplicada à leitura bruta na correção
+    confusions = None
+
+    def post_process(self, text):
+        """Limpa e formata o texto extraído"""
+        if not text:
+            return ""
+        return self.format(UNWANTED_CHARS.sub('', text))
+
+    def format(self, text):
+        """Formata o texto já sem caracteres indesejados"""
+        # Para texto normal, apenas limpar espaços extras
+        return ' '.join(text.split())
+
+    @staticmethod
+    def join_column(values):
+        """Concatena os valores de uma coluna com SEPARATOR"""
+        return SEPARATOR.join(v.replace(SEPARATOR, ' ') if v else '' for v in values)
+
+    def clean_column(self, values):
+        """Remove os caracteres indesejados de todos os valores de uma vez"""
+        return UNWANTED_CHARS.sub('', self.join_column(values))
+
+    def post_process_column(self, values):
+        """
+        Limpa e formata uma coluna de valores
+
+        Args:
+            values: Lista de textos extraídos
+
+        Returns:
+            Lista de textos processados, na mesma ordem
+        """
+        cleaned = self.clean_column(values).split(SEPARATOR)
+        return [self.format(text) if value else ""
+                for value, text in zip(values, cleaned)]
+
+    def validate(self, text):
+        """Verifica se o valor corresponde ao tipo"""
+        # Para tipo "text", qualquer string não vazia é válida
+        return bool(text and text.strip())
+
+    def validate_column(self, values):
+        """Valida uma coluna de valores; retorna uma lista de bool"""
+        return [self.validate(text) for text in values]
+
+    def repair(self, raw_text):
+        """
+        Corrige a leitura bruta do OCR
+
+        Args:
+            raw_text: Texto bruto do Tesseract
+
+        Returns:
+            Texto pós-processado e válido, ou None se não houver correção
+            que torne o valor válido
+        """
+        text = self.post_process(raw_text)
+        if self.validate(text):
+            return text
+        if not raw_text or self.confusions is None:
+            return None
+        fixed = self.post_process(raw_text.translate(self.confusions))
+        return fixed if self.validate(fixed) else None
+
+    def plausible(self, text):
+        """Se uma leitura tem formato plausível para o tipo"""
+        return not text.replace('.', '').replace(',', '').isdigit()
+
+    def choose(self, results):
+        """Escolhe a melhor leitura, sem confianças, entre as não vazias"""
+        # Para texto, escolher o mais longo que não seja só números
+        text_results = [r for r in results if self.plausible(r)]
+        if text_results:
+            return max(text_results, key=len)
+        return results[0]
+
+
+class DigitFieldType(FieldType):
+    """
+    Tipo numérico: mantém apenas dígitos e os separadores permitidos
+    """
+
+    keep = DIGITS
+    strict = True
+    confusions = DIGIT_CONFUSIONS
+
+    def __init__(self):
+        self.table = KeepChars(self.keep)
+        self.column_table = KeepChars(self.keep + SEPARATOR)
+
+    def post_process(self, text):
+        if not text:
+            return ""
+        return self.format(text.translate(self.table))
+
+    def format(self, nums):
+        return nums
+
+    def post_process_column(self, values):
+        # Uma única passada de str.translate sobre a coluna inteira
+        nums = self.join_column(values).translate(self.column_table).split(SEPARATOR)
+        return [self.format(n) if value else "" for value, n in zip(values, nums)]
+
+    def plausible(self, text):
+        return any(ch.isdigit() for ch in text)
+
+    def digit_count(self, text):
+        return sum(ch.isdigit() for ch in text)
+
+    def choose(self, results):
+        # Escolher o que tem mais números
+        return max(results, key=self.digit_count)
+
+
+class CPFFieldType(DigitFieldType):
+    name = "cpf"
+    checksum = True
+
+    def format(self, nums):
+        if len(nums) == 11:
+            return f"{nums[:3]}.{nums[3:6]}.{nums[6:9]}-{nums[9:]}"
+        return nums
+
+    @staticmethod
+    def digits_valid(digits):
+        return cpf_is_valid(digits) or cnpj_is_valid(digits)
+
+    def validate(self, text):
+        # CPF ou CNPJ com dígitos verificadores corretos
+        return bool(text) and self.digits_valid(text.translate(self.table))
+
+    def validate_column(self, values):
+        digits = self.join_column(values).translate(self.column_table).split(SEPARATOR)
+        return [bool(value) and self.digits_valid(d)
+                for value, d in zip(values, digits)]
+
+    def repair(self, raw_text):
+        text = super().repair(raw_text)
+        if text is not None or not raw_text:
+            return text
+
+        # Um único dígito trocado: aceito apenas se só uma substituição
+        # satisfaz os dígitos verificadores
+        digits = raw_text.translate(DIGIT_CONFUSIONS).translate(self.table)
+        if len(digits) not in (11, 14):
+            return None
+        candidates = set()
+        for pos, current in enumerate(digits):
+            for digit in DIGITS:
+                if digit == current:
+                    continue
+                candidate = digits[:pos] + digit + digits[pos + 1:]
+                if self.digits_valid(candidate):
+                    candidates.add(candidate)
+                    if len(candidates) > 1:
+                        return None
+        return self.format(candidates.pop()) if candidates else None
+
+
+class NumberFieldType(DigitFieldType):
+    name = "number"
+    keep = DIGITS + '.'
+
+    def validate(self, text):
+        return bool(text) and any(ch.isdigit() for ch in text)
+
+
+class CurrencyFieldType(DigitFieldType):
+    name = "currency"
+    keep = DIGITS + ',.'
+
+    def format(self, nums):
+        if ',' not in nums:
+            nums = nums[:-2] + ',' + nums[-2:]
+        return nums
+
+    def validate(self, text):
+        # Valor completo no formato 1.234,56 ou 1234,56
+        return bool(text) and CURRENCY_FORMAT.fullmatch(text) is not None
+
+
+class DateFieldType(FieldType):
+    name = "date"
+    strict = True
+    confusions = DIGIT_CONFUSIONS
+
+    def format(self, text):
+        match = DATE_PARTS.search(text)
+        if match:
+            day, month, year = match.groups()
+            if len(year) == 2:
+                year = '20' + year
+            return f"{day}/{month}/{year}"
+        return text
+
+    def validate(self, text):
+        """
+        Data no formato DD/MM/AA(AA) que exista no calendário, com o ano
+        inteiro entre 1900 e 2099
+
+        >>> DateFieldType().validate('29/02/2024')
+        True
+        >>> DateFieldType().validate('29/02/2023')
+        False
+        >>> DateFieldType().validate('31/12/1899')
+        False
+        >>> DateFieldType().validate('31/12/20231')
+        False
+        """
+        if not text:
+            return False
+        match = DATE_FORMAT.fullmatch(text.strip())
+        return match is not None and date_is_valid(*match.groups())
+
+    def plausible(self, text):
+        return DATE_PARTS.search(text) is not None
+
+    def choose(self, results):
+        # Escolher o que mais se parece com uma data
+        for result in results:
+            if self.plausible(result):
+                return result
+        return results[0]
+
+
+FIELD_TYPES = {}
+
+
+def register_field_type(field_type):
+    """Registra (ou substitui) um tipo de campo"""
+    FIELD_TYPES[field_type.name] = field_type
+    return field_type
+
+
+for _field_type in (FieldType(), CPFFieldType(), NumberFieldType(),
+                    CurrencyFieldType(), DateFieldType()):
+    register_field_type(_field_type)
+
+
+def get_field_type(expected_type):
+    """Retorna o tipo registrado; tipos desconhecidos são tratados como texto"""
+    return FIELD_TYPES.get(expected_type, FIELD_TYPES["text"])
+
+
+def post_process(text, expected_type):
+    """Limpa e formata um valor extraído"""
+    return get_field_type(expected_type).post_process(text)
+
+
+def post_process_column(values, expected_type):
+    """Limpa e formata uma coluna de valores do mesmo tipo"""
+    return get_field_type(expected_type).post_process_column(list(values))
+
+
+def validate(text, expected_type):
+    """Valida um valor extraído"""
+    return get_field_type(expected_type).validate(text)
+
+
+def repair(raw_text, expected_type):
+    """Corrige uma leitura bruta; retorna None se não houver valor válido"""
+    return get_field_type(expected_type).repair(raw_text)
+
+
+def validate_column(values, expected_type):
+    """Valida uma coluna de valores do mesmo tipo"""
+    return get_field_type(expected_type).validate_column(list(values))
@@ -4,12 +4,14 @@ from PySide6.QtWidgets import (
     QFileDialog, QMessageBox, QScrollArea, QCheckBox, QComboBox
 )
 from PySide6.QtCore import Qt, Signal, QThread
-from PySide6.QtGui import QImage, QPixmap
 import cv2
 from pathlib import Path
-import time
-import json
+from batch_processor import BatchProcessor, ProgressMeter, RateLimiter
+from cpu_budget import CPUBudget
+from page_filter import PageFilter
+from profiler import SamplingProfiler
 from roi_extractor import ROIExtractor
+from gui.qimage_utils import fit_to_size, numpy_to_pixmap
 from gui.template_manager import TemplateManager
 
 class ProcessingWorker(QThread):
@@ -18,53 +20,108 @@ class ProcessingWorker(QThread):
     progress = Signal(int)  # Progresso atual (0-100)
     status = Signal(str)    # Mensagem de status
     finished = Signal(bool) # True se sucesso, False se erro
+    preview = Signal(str, object)  # Caminho e miniatura (BGR) da imagem atual
     
-    def __init__(self, extractor, input_dir, output_dir, template):
+    UPDATE_INTERVAL = 0.1  # Máximo de 10 atualizações por segundo
+    CPU_SAMPLE = 8         # Páginas de amostra da calibração automática de CPU
+    
+    def __init__(self, extractor, input_dir, output_dir, template, consolidate=False,
+                 preview_size=None, filter_pages=False, cpu_mode=None, profile=False):
+        """
+        Args:
+            preview_size: (largura, altura) máxima da miniatura de preview;
+                         None desativa o preview
+            filter_pages: Se True, ignora páginas em branco e duplicadas
+            cpu_mode: None (uma imagem por vez), "all" (orçamento com todos os
+                     núcleos) ou "auto" (mede as opções em páginas de amostra)
+            profile: Se True, amostra as pilhas durante o lote e grava o
+                    perfil (_profile.collapsed e _profile.txt) na saída
+        """
         super().__init__()
         self.extractor = extractor
         self.input_dir = input_dir
         self.output_dir = output_dir
         self.template = template
-        self.running = True
+        self.consolidate = consolidate
+        self.preview_size = preview_size
+        self.processor = BatchProcessor(extractor, template)
+        self.preview_limiter = RateLimiter(self.UPDATE_INTERVAL)
+        if preview_size:
+            self.processor.on_image = self.emit_preview
+        if filter_pages:
+            self.processor.page_filter = PageFilter()
+        self.cpu_mode = cpu_mode
+        self.profile = profile
+            
+    def emit_preview(self, image_path, image):
+        """Envia uma miniatura da imagem já decodificada, limitada a 10 Hz"""
+        if not self.preview_limiter.ready():
+            return
+        thumbnail = fit_to_size(image, *self.preview_size)
+        # A página pode ser um buffer mapeado/reaproveitado pelo pipeline
+        if thumbnail is image:
+            thumbnail = image.copy()
+        self.preview.emit(str(image_path), thumbnail)
+        
+    def apply_cpu_budget(self):
+        """Divide os núcleos entre workers e threads do Tesseract/OpenCV"""
+        if not self.cpu_mode:
+            return
+        budget = CPUBudget()
+        if self.cpu_mode == "auto":
+            self.status.emit(f"Calibrando o uso de CPU ({budget.cores} núcleos)...")
+            samples = BatchProcessor.sample_images(self.input_dir, self.CPU_SAMPLE)
+            config = budget.autotune(self.processor, samples)
+        else:
+            config = budget.default()
+            budget.apply(config, self.processor)
+        self.status.emit(f"Usando {config['workers']} workers com "
+                         f"{config['omp_threads']} thread(s) cada")
         
     def run(self):
         """Executa o processamento"""
         try:
-            input_path = Path(self.input_dir)
-            input_path = Path(self.input_dir)
-            output_path = Path(self.output_dir)
-            
-            # Listar arquivos
-            image_files = list(input_path.glob("*.png"))
-            image_files.extend(input_path.glob("*.jpg"))
+            saved = CPUBudget.current()
+            meter = None
             
-            if not image_files:
-                raise ValueError("Nenhuma imagem encontrada")
+            def on_progress(done, total, img_path):
+                nonlocal meter
+                if meter is None:
+                    meter = ProgressMeter(total, self.UPDATE_INTERVAL)
+                # Progresso agregado em vez de uma mensagem por arquivo
+                if meter.update(done):
+                    self.status.emit(meter.summary())
+                    self.progress.emit(meter.percent())
                 
-            # Criar diretório de saída
-            output_path.mkdir(parents=True, exist_ok=True)
-            
-            # Processar cada imagem
-            for i, img_path in enumerate(image_files):
-                if not self.running:
-                    break
-                    
-                self.status.emit(f"Processando {img_path.name}...")
-                progress = int((i + 1) * 100 / len(image_files))
-                self.progress.emit(progress)
-                
-                results = self.extractor.process_image(
-                    str(img_path),
-                    self.template
+            try:
+                self.apply_cpu_budget()
+                # Depois da calibração, para que as páginas de amostra não entrem no perfil
+                if self.profile:
+                    self.processor.profiler = SamplingProfiler().start()
+                self.processor.run(
+                    self.input_dir,
+                    self.output_dir,
+                    consolidate=self.consolidate,
+                    on_progress=on_progress
                 )
+            finally:
+                if self.processor.profiler is not None:
+                    self.processor.profiler.write(self.output_dir)
+                # O orçamento de CPU vale apenas para este lote
+                CPUBudget.restore(saved)
+            
+            if not self.processor.running:
+                # stop_processing já trata a finalização na interface
+                self.status.emit("Processamento interrompido")
+                return
                 
-                if results:
-                    output_file = output_path / f"{img_path.stem}_results.json"
-                    json.dump(results, output_file.open('w'), indent=4)
-                    
-                time.sleep(0.1)  # Prevenir UI freezing
-                
-            self.status.emit("Processamento concluído")
+            skipped = sum(1 for check in self.processor.page_status.values()
+                          if check["status"] in ("blank", "duplicate"))
+            if skipped:
+                self.status.emit(f"Processamento concluído ({skipped} página(s) "
+                                 "em branco ou duplicada(s) sem OCR)")
+            else:
+                self.status.emit("Processamento concluído")
             self.finished.emit(True)
             
         except Exception as e:
@@ -73,7 +130,7 @@ class ProcessingWorker(QThread):
             
     def stop(self):
         """Para o processamento"""
-        self.running = False
+        self.processor.stop()
 
 class DocumentProcessor(QWidget):
     """Widget para processamento em lote de documentos"""
@@ -199,10 +256,24 @@ class DocumentProcessor(QWidget):
         self.show_preview = QCheckBox("Mostrar preview durante processamento")
         self.save_debug = QCheckBox("Salvar imagens de debug")
         self.consolidate = QCheckBox("Consolidar resultados em um arquivo")
+        self.filter_pages = QCheckBox("Ignorar páginas em branco e duplicadas")
+        self.profile = QCheckBox("Gerar perfil de desempenho (_profile.txt na saída)")
+        
+        # Paralelismo: workers e threads do Tesseract/OpenCV em conjunto
+        cpu_layout = QHBoxLayout()
+        cpu_layout.addWidget(QLabel("Uso de CPU:"))
+        self.cpu_mode = QComboBox()
+        self.cpu_mode.addItem("Uma imagem por vez", None)
+        self.cpu_mode.addItem("Todos os núcleos", "all")
+        self.cpu_mode.addItem("Automático (calibrar)", "auto")
+        cpu_layout.addWidget(self.cpu_mode)
         
         layout.addWidget(self.show_preview)
         layout.addWidget(self.save_debug)
         layout.addWidget(self.consolidate)
+        layout.addWidget(self.filter_pages)
+        layout.addWidget(self.profile)
+        layout.addLayout(cpu_layout)
         
         group.setLayout(layout)
         return group
@@ -286,9 +357,17 @@ class DocumentProcessor(QWidget):
             self.roi_extractor,
             input_dir,
             output_dir,
-            template
+            template,
+            consolidate=self.consolidate.isChecked(),
+            preview_size=((self.preview_label.width(), self.preview_label.height())
+                          if self.show_preview.isChecked() else None),
+            filter_pages=self.filter_pages.isChecked(),
+            cpu_mode=self.cpu_mode.currentData(),
+            profile=self.profile.isChecked()
         )
         
+        self.worker.preview.connect(self.preview_image)
+        
         self.worker.progress.connect(self.progress_bar.setValue)
         self.worker.status.connect(self.status_label.setText)
         self.worker.status.connect(self.processing_status.emit)
@@ -326,40 +405,30 @@ class DocumentProcessor(QWidget):
                 "Processamento interrompido"
             )
             
-    def preview_image(self, image_path):
-        """Mostra uma imagem no preview"""
+    def preview_image(self, image_path, image=None):
+        """
+        Mostra uma imagem no preview
+        
+        Args:
+            image_path: Caminho da imagem
+            image: Imagem já decodificada (BGR), normalmente a miniatura
+                   enviada pelo worker; se None o arquivo é lido do disco
+        """
         try:
-            image = cv2.imread(image_path)
             if image is None:
-                raise ValueError("Não foi possível carregar a imagem")
-                
-            # Converter BGR para RGB
-            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            
-            # Criar QImage
-            height, width, channel = image.shape
-            bytes_per_line = 3 * width
-            q_image = QImage(
-                image.data,
-                width,
-                height,
-                bytes_per_line,
-                QImage.Format_RGB888
-            )
-            
-            # Redimensionar mantendo proporção
-            pixmap = QPixmap.fromImage(q_image)
-            pixmap = pixmap.scaled(
-                self.preview_label.size(),
-                Qt.KeepAspectRatio,
-                Qt.SmoothTransformation
-            )
-            
-            self.preview_label.setPixmap(pixmap)
+                image = cv2.imread(image_path)
+                if image is None:
+                    raise ValueError("Não foi possível carregar a imagem")
+                    
+            # Reduzida para o tamanho do preview antes da conversão, sem cópias
+            # intermediárias (BGR ou escala de cinza)
+            self.preview_label.setPixmap(
+                numpy_to_pixmap(image, self.preview_label.size()))
+            self.preview_label.setToolTip(Path(image_path).name)
             
         except Exception as e:
             QMessageBox.critical(
                 self,
                 "Erro",
                 f"Erro ao carregar preview: {str(e)}"
-            )
\ No newline at end of file
+            )
@@ -0,0 +1,120 @@
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+from PySide6.QtCore import QRect
+
+from gui.qimage_utils import numpy_to_pixmap
+
+
+class ImagePyramid:
+    """
+    Pirâmide multi-resolução de uma imagem com renderização em blocos (tiles).
+
+    A pirâmide é construída uma única vez por imagem carregada. Cada bloco
+    visível é gerado reduzindo apenas o retângulo correspondente do menor nível
+    da pirâmide que ainda tem resolução suficiente para a escala, e convertido
+    em QPixmap; os blocos ficam em um cache LRU até a troca de imagem.
+    """
+
+    TILE_SIZE = 512
+    MIN_LEVEL_SIZE = 256
+
+    def __init__(self, image, max_tiles=256):
+        """
+        Args:
+            image: Imagem OpenCV (BGR ou escala de cinza)
+            max_tiles: Quantidade máxima de blocos QPixmap em cache
+        """
+        self.height, self.width = image.shape[:2]
+        self.levels = [np.ascontiguousarray(image)]
+        while min(self.levels[-1].shape[:2]) // 2 >= self.MIN_LEVEL_SIZE:
+            self.levels.append(cv2.pyrDown(self.levels[-1]))
+
+        self.max_tiles = max_tiles
+        self.tiles = OrderedDict()    # (escala, tx, ty) -> QPixmap
+
+    @staticmethod
+    def scale_key(scale):
+        """Quantiza a escala para reaproveitar o cache entre redimensionamentos"""
+        return round(scale, 3)
+
+    def level_for_scale(self, scale):
+        """Retorna o menor nível da pirâmide com resolução >= à escala pedida"""
+        index = 0
+        while (index + 1 < len(self.levels) and
+               scale <= 1.0 / (2 ** (index + 1))):
+            index += 1
+        return index
+
+    def tile_image(self, scale, tx, ty):
+        """
+        Gera a imagem de um bloco na escala pedida
+
+        Args:
+            scale: Escala quantizada (ver scale_key)
+            tx, ty: Coluna e linha do bloco
+
+        Returns:
+            Array do bloco (menor nas bordas da imagem)
+        """
+        width, height = self.scaled_size(scale)
+        size = self.TILE_SIZE
+        x0, y0 = tx * size, ty * size
+        x1, y1 = min(width, x0 + size), min(height, y0 + size)
+
+        level = self.levels[self.level_for_scale(scale)]
+        fx = level.shape[1] / width
+        fy = level.shape[0] / height
+        # Retângulo do nível que cobre o bloco
+        sx0, sy0 = int(x0 * fx), int(y0 * fy)
+        sx1 = min(level.shape[1], max(sx0 + 1, int(np.ceil(x1 * fx))))
+        sy1 = min(level.shape[0], max(sy0 + 1, int(np.ceil(y1 * fy))))
+        source = level[sy0:sy1, sx0:sx1]
+        if source.shape[:2] == (y1 - y0, x1 - x0):
+            return source
+        return cv2.resize(source, (x1 - x0, y1 - y0), interpolation=cv2.INTER_AREA)
+
+    def scaled_size(self, scale):
+        """Tamanho (largura, altura) da imagem na escala pedida"""
+        key = self.scale_key(scale)
+        return max(1, int(self.width * key)), max(1, int(self.height * key))
+
+    def tile_pixmap(self, scale, tx, ty):
+        """Retorna o QPixmap de um bloco, criando-o se necessário"""
+        key = (self.scale_key(scale), tx, ty)
+        if key in self.tiles:
+            self.tiles.move_to_end(key)
+            return self.tiles[key]
+
+        pixmap = numpy_to_pixmap(self.tile_image(key[0], tx, ty))
+
+        self.tiles[key] = pixmap
+        while len(self.tiles) > self.max_tiles:
+            self.tiles.popitem(last=False)
+        return pixmap
+
+    def visible_tiles(self, scale, rect):
+        """
+        Lista os blocos que intersectam um retângulo da visualização
+
+        Args:
+            scale: Escala da visualização
+            rect: QRect visível (coordenadas do widget)
+
+        Returns:
+            Lista de tuplas (QRect de destino, QPixmap)
+        """
+        width, height = self.scaled_size(scale)
+        size = self.TILE_SIZE
+        visible = rect.intersected(QRect(0, 0, width, height))
+        if visible.isEmpty():
+            return []
+
+        result = []
+        for ty in range(visible.top() // size, visible.bottom() // size + 1):
+            for tx in range(visible.left() // size, visible.right() // size + 1):
+                pixmap = self.tile_pixmap(scale, tx, ty)
+                target = QRect(tx * size, ty * size, pixmap.width(), pixmap.height())
+                result.append((target, pixmap))
+        return result
@@ -120,4 +120,5 @@ class MainWindow(QMainWindow):
     def closeEvent(self, event):
         """Evento de fechamento da janela"""
         self.save_settings()
+        self.template_editor.shutdown()
         super().closeEvent(event)
\ No newline at end of file
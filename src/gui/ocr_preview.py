@@ -0,0 +1,170 @@
+import json
+from collections import OrderedDict
+
+from PySide6.QtWidgets import QGroupBox, QVBoxLayout, QLabel, QCheckBox
+from PySide6.QtCore import Qt, Signal, QThread, QMutex, QMutexLocker, QWaitCondition
+
+from roi_extractor import ROIExtractor
+
+
+class OCRPreviewWorker(QThread):
+    """
+    Thread que executa o OCR de pré-visualização da ROI selecionada.
+
+    Apenas o pedido mais recente é mantido: pedidos novos substituem o
+    pendente e abandonam o que está em execução entre uma variante e outra.
+    Resultados ficam em cache por (imagem, coordenadas, tipo, pipeline), de modo que
+    voltar a uma geometria já testada não executa o Tesseract novamente.
+    """
+
+    result_ready = Signal(int, str, object)  # Geração, nome da ROI, OCRResult
+
+    def __init__(self, template_manager=None, cache_size=128):
+        """
+        Args:
+            template_manager: Instância do TemplateManager (opcional)
+            cache_size: Quantidade máxima de resultados em cache
+        """
+        super().__init__()
+        # Extrator próprio da thread, independente do usado pela interface
+        self.extractor = ROIExtractor(template_manager)
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.mutex = QMutex()
+        self.condition = QWaitCondition()
+        self.pending = None
+        self.generation = 0
+        self.running = True
+
+    @staticmethod
+    def cache_key(image_id, coords, expected_type, pipeline=None):
+        return (image_id, tuple(int(c) for c in coords), expected_type,
+                json.dumps(pipeline, sort_keys=True) if pipeline else None)
+
+    def cached(self, image_id, coords, expected_type, pipeline=None):
+        """Retorna o OCRResult em cache ou None"""
+        key = self.cache_key(image_id, coords, expected_type, pipeline)
+        with QMutexLocker(self.mutex):
+            result = self.cache.get(key)
+            if result is not None:
+                self.cache.move_to_end(key)
+            return result
+
+    def request(self, image, image_id, name, coords, expected_type, pipeline=None):
+        """
+        Agenda o OCR de uma ROI, descartando pedidos anteriores
+
+        Args:
+            image: Imagem padronizada completa
+            image_id: Identificador da imagem carregada (para o cache)
+            name: Nome da ROI
+            coords: Coordenadas (x1, y1, x2, y2)
+            expected_type: Tipo esperado do dado
+            pipeline: Especificação do pipeline de pré-processamento (opcional)
+
+        Returns:
+            Geração do pedido
+        """
+        with QMutexLocker(self.mutex):
+            self.generation += 1
+            self.pending = (self.generation, image, image_id, name,
+                            tuple(coords), expected_type, pipeline)
+            self.condition.wakeOne()
+            return self.generation
+
+    def cancel(self):
+        """Descarta o pedido pendente e o que estiver em execução"""
+        with QMutexLocker(self.mutex):
+            self.generation += 1
+            self.pending = None
+
+    def is_current(self, generation):
+        return generation == self.generation
+
+    def run(self):
+        while True:
+            with QMutexLocker(self.mutex):
+                while self.running and self.pending is None:
+                    self.condition.wait(self.mutex)
+                if not self.running:
+                    return
+                (generation, image, image_id, name, coords, expected_type,
+                 pipeline) = self.pending
+                self.pending = None
+
+            key = self.cache_key(image_id, coords, expected_type, pipeline)
+            result = self.cached(image_id, coords, expected_type, pipeline)
+            if result is None:
+                roi = self.extractor.extract_roi(image, coords)
+                if roi is None or roi.size == 0:
+                    continue
+                result = self.extractor.extract_text_result(
+                    roi, expected_type,
+                    cancelled=lambda: not self.running or not self.is_current(generation),
+                    pipeline=self.extractor.get_pipeline(
+                        {"expected_type": expected_type, "pipeline": pipeline})
+                )
+                if not self.is_current(generation):
+                    continue
+
+                with QMutexLocker(self.mutex):
+                    self.cache[key] = result
+                    while len(self.cache) > self.cache_size:
+                        self.cache.popitem(last=False)
+
+            self.result_ready.emit(generation, name, result)
+
+    def stop(self):
+        """Encerra a thread"""
+        with QMutexLocker(self.mutex):
+            self.running = False
+            self.pending = None
+            self.condition.wakeAll()
+        self.wait()
+
+
+class OCRPreviewPanel(QGroupBox):
+    """Painel com o resultado do OCR da ROI selecionada"""
+
+    live_toggled = Signal(bool)
+
+    def __init__(self):
+        super().__init__("Pré-visualização OCR")
+        layout = QVBoxLayout()
+
+        self.live = QCheckBox("Atualizar automaticamente")
+        self.live.setChecked(True)
+        self.live.toggled.connect(self.live_toggled)
+
+        self.text_label = QLabel("-")
+        self.text_label.setWordWrap(True)
+        self.text_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        self.details_label = QLabel("")
+
+        layout.addWidget(self.live)
+        layout.addWidget(self.text_label)
+        layout.addWidget(self.details_label)
+        self.setLayout(layout)
+
+    def show_pending(self, name):
+        self.details_label.setText(f"{name}: processando...")
+
+    def show_result(self, name, result):
+        """Exibe texto, confiança e variante de um OCRResult"""
+        self.text_label.setText(result.text or "(vazio)")
+        if result.mean_conf >= 0:
+            conf = f"confiança {result.mean_conf:.0f} (mín. {result.min_conf:.0f})"
+        else:
+            conf = "sem confiança"
+        if result.valid is not None:
+            conf += " | válido" if result.valid else " | inválido"
+        if result.corrected:
+            conf += " (corrigido)"
+        self.details_label.setText(
+            f"{name}: {conf} | {result.variant or '-'} | "
+            f"{result.attempts} tentativa(s), {1000 * result.elapsed:.0f} ms"
+        )
+
+    def clear(self):
+        self.text_label.setText("-")
+        self.details_label.setText("")
@@ -0,0 +1,90 @@
+"""
+Conversão entre arrays numpy (OpenCV) e imagens Qt sem cópias intermediárias.
+
+Os arrays uint8 são envolvidos diretamente como QImage, em escala de cinza
+(Format_Grayscale8) ou BGR (Format_BGR888), sem cvtColor/rgbSwapped. O array
+de origem fica referenciado pelo QImage retornado enquanto ele existir; a
+única cópia acontece em QPixmap.fromImage, feita já na resolução exibida.
+"""
+
+import cv2
+import numpy as np
+from PySide6.QtGui import QImage, QPixmap
+
+
+def numpy_to_qimage(array):
+    """
+    Envolve um array uint8 em QImage sem copiar os pixels
+
+    Args:
+        array: Imagem em escala de cinza (H, W), BGR (H, W, 3) ou BGRA (H, W, 4)
+
+    Returns:
+        QImage que compartilha o buffer do array
+    """
+    if array.dtype != np.uint8:
+        raise ValueError(f"Tipo de imagem não suportado: {array.dtype}")
+    if array.ndim == 3 and array.shape[2] == 1:
+        array = array[:, :, 0]
+
+    if array.ndim == 2:
+        image_format = QImage.Format_Grayscale8
+    elif array.ndim == 3 and array.shape[2] == 3:
+        image_format = QImage.Format_BGR888
+    elif array.ndim == 3 and array.shape[2] == 4:
+        image_format = QImage.Format_ARGB32
+    else:
+        raise ValueError(f"Formato de imagem não suportado: {array.shape}")
+
+    # O Qt aceita linhas espaçadas (recortes), mas não pixels intercalados
+    if (array.strides[-1] != 1 or array.strides[0] <= 0 or
+            (array.ndim == 3 and array.strides[1] != array.shape[2])):
+        array = np.ascontiguousarray(array)
+
+    height, width = array.shape[:2]
+    if array.flags.c_contiguous:
+        buffer = array
+    else:
+        # Recorte de uma imagem maior: visão 1-D contínua que cobre do
+        # primeiro ao último pixel, com as linhas espaçadas por strides[0]
+        length = (height - 1) * array.strides[0] + width * array.strides[1]
+        buffer = np.lib.stride_tricks.as_strided(array, shape=(length,), strides=(1,))
+    image = QImage(buffer.data, width, height, array.strides[0], image_format)
+    # Mantém o buffer vivo enquanto o QImage existir
+    image.ndarray = array
+    return image
+
+
+def fit_to_size(array, max_width, max_height):
+    """
+    Reduz o array para caber no tamanho informado, mantendo a proporção
+
+    Imagens menores que o tamanho pedido são devolvidas sem alteração.
+    """
+    height, width = array.shape[:2]
+    scale = min(max_width / width, max_height / height, 1.0)
+    if scale >= 1.0:
+        return array
+    return cv2.resize(
+        array,
+        (max(1, int(width * scale)), max(1, int(height * scale))),
+        interpolation=cv2.INTER_AREA
+    )
+
+
+def numpy_to_pixmap(array, size=None):
+    """
+    Converte um array em QPixmap, reduzindo antes para a resolução exibida
+
+    Args:
+        array: Imagem numpy uint8 (ver numpy_to_qimage)
+        size: QSize ou tupla (largura, altura) máxima; None mantém o tamanho
+
+    Returns:
+        QPixmap
+    """
+    if size is not None:
+        if not isinstance(size, tuple):
+            size = (size.width(), size.height())
+        array = fit_to_size(array, *size)
+    return QPixmap.fromImage(numpy_to_qimage(array))
@@ -0,0 +1,92 @@
+class ROIGridIndex:
+    """
+    Índice espacial em grade uniforme para as ROIs do editor.
+
+    Cada ROI é registrada nas células da grade que ela cobre (coordenadas da
+    imagem), de modo que a busca por clique ou por retângulo visita apenas as
+    ROIs das células consultadas em vez de percorrer todas as regiões.
+    """
+
+    def __init__(self, cell_size=64):
+        self.cell_size = cell_size
+        self.cells = {}    # (cx, cy) -> set de nomes
+        self.boxes = {}    # nome -> (x1, y1, x2, y2)
+        self.order = {}    # nome -> ordem de inserção (desempate de sobreposição)
+        self._counter = 0
+
+    def _cells_for(self, box):
+        x1, y1, x2, y2 = box
+        size = self.cell_size
+        for cy in range(int(min(y1, y2)) // size, int(max(y1, y2)) // size + 1):
+            for cx in range(int(min(x1, x2)) // size, int(max(x1, x2)) // size + 1):
+                yield cx, cy
+
+    def clear(self):
+        self.cells.clear()
+        self.boxes.clear()
+        self.order.clear()
+
+    def rebuild(self, regions):
+        """Reconstrói o índice a partir do dicionário de regiões"""
+        self.clear()
+        for name, region in regions.items():
+            self.insert(name, region["coords"])
+
+    def insert(self, name, box):
+        """Insere ou atualiza a caixa de uma ROI"""
+        box = tuple(box)
+        if name in self.boxes:
+            if self.boxes[name] == box:
+                return
+            self.remove(name, keep_order=True)
+        else:
+            self.order[name] = self._counter
+            self._counter += 1
+
+        self.boxes[name] = box
+        for cell in self._cells_for(box):
+            self.cells.setdefault(cell, set()).add(name)
+
+    def remove(self, name, keep_order=False):
+        """Remove uma ROI do índice"""
+        box = self.boxes.pop(name, None)
+        if box is None:
+            return
+        for cell in self._cells_for(box):
+            names = self.cells.get(cell)
+            if names:
+                names.discard(name)
+                if not names:
+                    del self.cells[cell]
+        if not keep_order:
+            self.order.pop(name, None)
+
+    def hit(self, x, y, margin=0):
+        """
+        Retorna a ROI que contém o ponto (coordenadas da imagem)
+
+        Em caso de sobreposição vale a ROI inserida primeiro, como na busca
+        linear original.
+        """
+        cell = (int(x) // self.cell_size, int(y) // self.cell_size)
+        candidates = []
+        for name in self.cells.get(cell, ()):
+            x1, y1, x2, y2 = self.boxes[name]
+            if (x1 - margin) <= x <= (x2 + margin) and (y1 - margin) <= y <= (y2 + margin):
+                candidates.append(name)
+        if not candidates:
+            return None
+        return min(candidates, key=self.order.get)
+
+    def query(self, box):
+        """Retorna as ROIs que intersectam uma caixa (coordenadas da imagem)"""
+        qx1, qy1, qx2, qy2 = box
+        found = set()
+        for cell in self._cells_for(box):
+            for name in self.cells.get(cell, ()):
+                if name in found:
+                    continue
+                x1, y1, x2, y2 = self.boxes[name]
+                if x1 <= qx2 and qx1 <= x2 and y1 <= qy2 and qy1 <= y2:
+                    found.add(name)
+        return found
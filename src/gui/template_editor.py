@@ -10,10 +10,13 @@ from PySide6.QtWidgets import (
     QSpinBox, QListWidget, QListWidgetItem, QScrollArea, QMessageBox, QInputDialog, QDialogButtonBox, QGridLayout, QDialog
 )
 
-from PySide6.QtCore import Qt, Signal, QPoint
-from PySide6.QtGui import QImage, QPixmap, QPainter, QPen, QColor
+from PySide6.QtCore import Qt, Signal, QPoint, QRect, QTimer
+from PySide6.QtGui import QPainter, QPen, QColor
 
 from roi_extractor import ROIExtractor
+from gui.image_pyramid import ImagePyramid
+from gui.roi_index import ROIGridIndex
+from gui.ocr_preview import OCRPreviewPanel, OCRPreviewWorker
 from gui.template_manager import TemplateManager
 
 class ImageViewer(QLabel):
@@ -22,14 +25,22 @@ class ImageViewer(QLabel):
     roi_selected = Signal(str)  # Emite nome da ROI selecionada
     roi_moved = Signal(str, QPoint)  # Emite nome da ROI e nova posição
     
+    MIN_ZOOM = 1.0
+    MAX_ZOOM = 8.0
+    
     def __init__(self):
         super().__init__()
         self.setMinimumSize(800, 600)
         self.setAlignment(Qt.AlignCenter)
         
         self.image = None
+        self.pyramid = None  # Pirâmide multi-resolução da imagem atual
         self.scale_factor = 1.0
+        self.zoom = 1.0      # Zoom relativo ao ajuste à janela
         self.regions = {}
+        self.roi_index = ROIGridIndex()  # Índice espacial para hit-testing
+        self.roi_coords = {}     # Coordenadas conhecidas de cada ROI
+        self.scaled_rects = {}   # Retângulos de pintura na escala atual
         self.selected_roi = None
         self.dragging = False
         self.drag_start = None
@@ -40,55 +51,151 @@ class ImageViewer(QLabel):
     def load_image(self, image):
         """Carrega uma nova imagem"""
         self.image = image
+        self.pyramid = ImagePyramid(image) if image is not None else None
         self.update_view()
         
     def set_regions(self, regions):
-        """Atualiza as regiões de interesse"""
+        """
+        Atualiza as regiões de interesse
+        
+        Quando o conjunto de ROIs é o mesmo, apenas as ROIs com coordenadas
+        alteradas são reindexadas e só a área que elas ocupavam/ocupam é
+        repintada.
+        """
+        if regions is self.regions and regions.keys() == self.roi_coords.keys():
+            for name, region in regions.items():
+                if tuple(region["coords"]) != self.roi_coords[name]:
+                    self.update_region(name)
+            return
+            
         self.regions = regions
+        self.roi_index.rebuild(regions)
+        self.roi_coords = {name: tuple(region["coords"])
+                           for name, region in regions.items()}
+        self.scaled_rects = {}
         self.update()
         
+    def update_region(self, name):
+        """Reindexa uma ROI e repinta apenas a união da área antiga e nova"""
+        old_rect = self.roi_paint_rect(name)
+        coords = tuple(self.regions[name]["coords"])
+        self.roi_coords[name] = coords
+        self.roi_index.insert(name, coords)
+        self.scaled_rects.pop(name, None)
+        self.update(old_rect.united(self.roi_paint_rect(name)))
+        
+    def roi_paint_rect(self, name):
+        """
+        Área ocupada por uma ROI na escala atual (retângulo, borda e label),
+        mantida em cache até a escala ou as coordenadas mudarem
+        """
+        if name not in self.scaled_rects:
+            x1, y1, x2, y2 = self.roi_coords[name]
+            rect = QRect(
+                int(x1 * self.scale_factor),
+                int(y1 * self.scale_factor),
+                int(x2 * self.scale_factor) - int(x1 * self.scale_factor),
+                int(y2 * self.scale_factor) - int(y1 * self.scale_factor)
+            )
+            metrics = self.fontMetrics()
+            label = QRect(rect.left(), rect.top() - 5 - metrics.ascent(),
+                          metrics.horizontalAdvance(name), metrics.height())
+            # Margem para a espessura da caneta da ROI selecionada
+            self.scaled_rects[name] = (rect, rect.united(label).adjusted(-3, -3, 3, 3))
+        return self.scaled_rects[name][1]
+        
+    def rois_in_rect(self, rect):
+        """
+        ROIs cuja área de pintura pode intersectar um retângulo do widget,
+        consultadas no índice espacial e na ordem de desenho original
+        """
+        # O label fica acima e à direita da ROI: ampliar a consulta
+        metrics = self.fontMetrics()
+        pad = metrics.height() + 8
+        width = max((metrics.horizontalAdvance(name) for name in self.roi_coords),
+                    default=0)
+        query = rect.adjusted(-width - 3, -3, 3, pad)
+        box = (query.left() / self.scale_factor, query.top() / self.scale_factor,
+               query.right() / self.scale_factor, query.bottom() / self.scale_factor)
+        names = self.roi_index.query(box)
+        return sorted(names, key=self.roi_index.order.get)
+        
+    def select_region(self, name):
+        """Altera a ROI selecionada repintando apenas a anterior e a nova"""
+        dirty = QRect()
+        for roi in (self.selected_roi, name):
+            if roi in self.roi_coords:
+                dirty = dirty.united(self.roi_paint_rect(roi))
+        self.selected_roi = name
+        self.update(dirty)
+        
+    def fit_scale(self):
+        """Escala que ajusta a imagem inteira à área visível"""
+        height, width = self.image.shape[:2]
+        # Dentro da QScrollArea o pai é o viewport; o próprio widget cresce
+        # com o zoom e não serve de referência
+        area = self.parentWidget().size() if self.parentWidget() else self.size()
+        return min(area.width() / width, area.height() / height)
+        
     def update_view(self):
         """Atualiza a visualização"""
-        if self.image is None:
+        if self.pyramid is None:
             return
             
-        height, width = self.image.shape[:2]
-        bytes_per_line = 3 * width
-        
-        q_img = QImage(
-            self.image.data,
-            width,
-            height,
-            bytes_per_line,
-            QImage.Format_RGB888
-        ).rgbSwapped()
-        
-        scaled_img = q_img.scaled(
-            self.size(),
-            Qt.KeepAspectRatio,
-            Qt.SmoothTransformation
-        )
+        scale_factor = self.fit_scale() * self.zoom
+        if scale_factor != self.scale_factor:
+            self.scaled_rects = {}
+        self.scale_factor = scale_factor
+        width, height = self.pyramid.scaled_size(self.scale_factor)
+        
+        if self.zoom > self.MIN_ZOOM:
+            self.setMinimumSize(width, height)
+        else:
+            self.setMinimumSize(800, 600)
+        self.update()
         
-        self.setPixmap(QPixmap.fromImage(scaled_img))
-        self.scale_factor = scaled_img.width() / width
+    def set_zoom(self, zoom):
+        """Define o zoom relativo ao ajuste à janela"""
+        zoom = max(self.MIN_ZOOM, min(self.MAX_ZOOM, zoom))
+        if zoom != self.zoom:
+            self.zoom = zoom
+            self.update_view()
+            
+    def wheelEvent(self, event):
+        """Ctrl + roda do mouse altera o zoom"""
+        if event.modifiers() & Qt.ControlModifier and self.pyramid is not None:
+            step = 1.25 if event.angleDelta().y() > 0 else 0.8
+            self.set_zoom(self.zoom * step)
+            event.accept()
+        else:
+            super().wheelEvent(event)
+            
+    def resizeEvent(self, event):
+        """Recalcula a escala quando a área visível muda"""
+        super().resizeEvent(event)
+        if self.pyramid is not None and self.zoom == self.MIN_ZOOM:
+            self.update_view()
         
     def paintEvent(self, event):
-        """Desenha as ROIs sobre a imagem"""
-        super().paintEvent(event)
-        
-        if not self.pixmap():
+        """Desenha os blocos visíveis da imagem e as ROIs"""
+        if self.pyramid is None:
+            super().paintEvent(event)
             return
             
         painter = QPainter(self)
-        painter.begin(self)
         
-        for name, region in self.regions.items():
-            # Obter coordenadas e ajustar para escala
-            x1, y1, x2, y2 = region["coords"]
-            x1 = int(x1 * self.scale_factor)
-            y1 = int(y1 * self.scale_factor)
-            x2 = int(x2 * self.scale_factor)
-            y2 = int(y2 * self.scale_factor)
+        # Apenas os blocos que intersectam a área exposta são desenhados
+        for target, pixmap in self.pyramid.visible_tiles(
+                self.scale_factor, event.rect()):
+            painter.drawPixmap(target, pixmap)
+        
+        # Apenas as ROIs que intersectam a área exposta são redesenhadas
+        exposed = event.rect()
+        for name in self.rois_in_rect(exposed):
+            if not self.roi_paint_rect(name).intersects(exposed):
+                continue
+            region = self.regions[name]
+            rect = self.scaled_rects[name][0]
             
             # Configurar estilo
             color = QColor(*region["color"])
@@ -98,10 +205,10 @@ class ImageViewer(QLabel):
             painter.setPen(pen)
             
             # Desenhar retângulo
-            painter.drawRect(x1, y1, x2-x1, y2-y1)
+            painter.drawRect(rect)
             
             # Desenhar label
-            painter.drawText(x1, y1-5, name)
+            painter.drawText(rect.left(), rect.top()-5, name)
             
         painter.end()
         
@@ -111,21 +218,15 @@ class ImageViewer(QLabel):
             pos = event.position()
             x, y = pos.x(), pos.y()
             
-            # Encontrar ROI clicada
-            for name, region in self.regions.items():
-                x1, y1, x2, y2 = region["coords"]
-                x1 = int(x1 * self.scale_factor)
-                y1 = int(y1 * self.scale_factor)
-                x2 = int(x2 * self.scale_factor)
-                y2 = int(y2 * self.scale_factor)
-                
-                if x1 <= x <= x2 and y1 <= y <= y2:
-                    self.selected_roi = name
-                    self.dragging = True
-                    self.drag_start = (x - x1, y - y1)
-                    self.roi_selected.emit(name)
-                    self.update()
-                    break
+            # Encontrar ROI clicada pelo índice espacial
+            name = self.roi_index.hit(x / self.scale_factor, y / self.scale_factor)
+            if name is not None:
+                self.roi_paint_rect(name)
+                rect = self.scaled_rects[name][0]
+                self.select_region(name)
+                self.dragging = True
+                self.drag_start = (x - rect.left(), y - rect.top())
+                self.roi_selected.emit(name)
                     
     def mouseMoveEvent(self, event):
         """Processa movimento do mouse"""
@@ -134,17 +235,16 @@ class ImageViewer(QLabel):
             x, y = int(pos.x()), int(pos.y())
             
             # Calcular nova posição
-            region = self.regions[self.selected_roi]
-            x1, y1, x2, y2 = region["coords"]
-            width = x2 - x1
-            height = y2 - y1
+            new_x = int((x - self.drag_start[0]) / self.scale_factor)
+            new_y = int((y - self.drag_start[1]) / self.scale_factor)
             
-            new_x = (x - self.drag_start[0]) / self.scale_factor
-            new_y = (y - self.drag_start[1]) / self.scale_factor
-            
-            # Emitir sinal de movimento
+            # Emitir sinal de movimento (o editor atualiza as coordenadas e a
+            # repintura fica restrita à área suja da ROI via set_regions)
             self.roi_moved.emit(self.selected_roi, QPoint(new_x, new_y))
-            self.update()
+            if self.selected_roi in self.regions and \
+                    tuple(self.regions[self.selected_roi]["coords"]) != \
+                    self.roi_coords.get(self.selected_roi):
+                self.update_region(self.selected_roi)
             
     def mouseReleaseEvent(self, event):
         """Processa liberação do botão do mouse"""
@@ -157,6 +257,8 @@ class TemplateEditor(QWidget):
     
     template_saved = Signal()  # Emitido quando um template é salvo
     
+    PREVIEW_DELAY_MS = 300  # Espera após a última alteração da ROI
+    
     def __init__(self):
         super().__init__()
         self.template_modified = False
@@ -171,6 +273,15 @@ class TemplateEditor(QWidget):
         self.template_manager = TemplateManager()
         self.roi_extractor = ROIExtractor(self.template_manager)
         
+        # OCR de pré-visualização em background
+        self.ocr_worker = OCRPreviewWorker(self.template_manager)
+        self.ocr_worker.result_ready.connect(self.show_ocr_preview)
+        self.ocr_worker.start()
+        self.preview_timer = QTimer(self)
+        self.preview_timer.setSingleShot(True)
+        self.preview_timer.setInterval(self.PREVIEW_DELAY_MS)
+        self.preview_timer.timeout.connect(self.run_ocr_preview)
+        
         # Conectar sinais
         self.roi_list.itemClicked.connect(self.select_roi)
         self.fields_list_widget.itemClicked.connect(self.on_field_selected)
@@ -201,6 +312,12 @@ class TemplateEditor(QWidget):
         prop_group = self.setup_properties_group()
         left_layout.addWidget(prop_group)
         
+        # Pré-visualização do OCR
+        self.ocr_preview = OCRPreviewPanel()
+        self.ocr_preview.live_toggled.connect(
+            lambda live: self.schedule_ocr_preview() if live else None)
+        left_layout.addWidget(self.ocr_preview)
+        
         left_panel.setLayout(left_layout)
         left_panel.setMaximumWidth(400)
         
@@ -335,7 +452,9 @@ class TemplateEditor(QWidget):
                 raise ValueError("Não foi possível carregar a imagem")
                 
             self.current_image = self.roi_extractor.standardize_image(image)
+            self.image_serial += 1
             self.image_viewer.load_image(self.current_image)
+            self.schedule_ocr_preview()
             
             # Desabilitar edição de ROIs até confirmação
             self.enable_roi_editing(False)
@@ -513,6 +632,7 @@ class TemplateEditor(QWidget):
         self.template_modified = False
         self.regions = {}
         self.current_image = None
+        self.image_serial = 0  # Identifica a imagem carregada no cache de OCR
         
         # Popula o combo de tipos de documento
         self.doc_type.addItems(["RG", "CPF", "CNH", "OUTROS"])  # Ajuste conforme necessário
@@ -869,26 +989,54 @@ class TemplateEditor(QWidget):
         self.update_roi_display()
 
     def test_roi_ocr(self):
-        """Testa o OCR na ROI selecionada"""
-        if not self.selected_roi or not self.current_image:
+        """Testa o OCR na ROI selecionada imediatamente"""
+        self.preview_timer.stop()
+        self.run_ocr_preview()
+        
+    def schedule_ocr_preview(self):
+        """
+        Reinicia a espera da pré-visualização; enquanto a ROI é arrastada ou
+        redimensionada apenas o último estado é enviado ao OCR
+        """
+        if not self.ocr_preview.live.isChecked():
+            return
+        if self.selected_roi and self.current_image is not None:
+            self.preview_timer.start()
+            
+    def run_ocr_preview(self):
+        """Envia a ROI selecionada ao OCR em background"""
+        if not self.selected_roi or self.current_image is None:
             return
             
         region = self.regions[self.selected_roi]
-        roi = self.roi_extractor.extract_roi(
-            self.current_image, 
-            region["coords"]
-        )
-        
-        text = self.roi_extractor.extract_text(
-            roi, 
-            region["expected_type"]
+        result = self.ocr_worker.cached(
+            self.image_serial, region["coords"], region["expected_type"],
+            region.get("pipeline"))
+        if result is not None:
+            # Geometria já testada: nada a executar
+            self.ocr_worker.cancel()
+            self.ocr_preview.show_result(self.selected_roi, result)
+            return
+            
+        self.ocr_preview.show_pending(self.selected_roi)
+        self.ocr_worker.request(
+            self.current_image,
+            self.image_serial,
+            self.selected_roi,
+            region["coords"],
+            region["expected_type"],
+            region.get("pipeline")
         )
         
-        QMessageBox.information(
-            self,
-            "Resultado OCR",
-            f"Texto extraído: {text}"
-        )
+    def show_ocr_preview(self, generation, name, result):
+        """Exibe o resultado do OCR se ainda corresponder à seleção atual"""
+        if self.ocr_worker.is_current(generation) and name == self.selected_roi:
+            self.ocr_preview.show_result(name, result)
+            
+    def shutdown(self):
+        """Encerra a thread de pré-visualização"""
+        self.preview_timer.stop()
+        self.ocr_worker.stop()
 
     def add_roi(self):
         """Adiciona uma nova ROI"""
@@ -966,7 +1114,9 @@ class TemplateEditor(QWidget):
             return
             
         region = self.regions[self.selected_roi]
-        region["expected_type"] = self.roi_type.currentText()
+        if region["expected_type"] != self.roi_type.currentText():
+            region["expected_type"] = self.roi_type.currentText()
+            self.schedule_ocr_preview()
         
         new_name = self.roi_name.text()
         if new_name and new_name != self.selected_roi:
@@ -1001,6 +1151,7 @@ class TemplateEditor(QWidget):
             self.roi_w.setValue(x2 - x1)
             self.roi_h.setValue(y2 - y1)
             self.roi_type.setCurrentText(region["expected_type"])
+        self.schedule_ocr_preview()
 
     def select_roi(self, name):
         """Seleciona uma ROI para edição"""
@@ -1017,7 +1168,9 @@ class TemplateEditor(QWidget):
                 raise ValueError("Não foi possível carregar a imagem")
                 
             self.current_image = self.roi_extractor.standardize_image(image)
+            self.image_serial += 1
             self.image_viewer.load_image(self.current_image)
+            self.schedule_ocr_preview()
             
         except Exception as e:
             QMessageBox.critical(
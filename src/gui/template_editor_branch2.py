@@ -15,6 +15,7 @@ from PySide6.QtGui import *
 
 
 from template_manager import TemplateManager
+from qimage_utils import numpy_to_pixmap
 class Template:
     """Classe que representa um template de documento."""
     
@@ -67,20 +68,16 @@ class ImageViewer(QLabel):
     def set_image(self, image):
         """Define a imagem atual."""
         if isinstance(image, np.ndarray):
-            height, width = image.shape[:2]
-            bytes_per_line = 3 * width
-            q_img = QImage(image.data, width, height, bytes_per_line, 
-                          QImage.Format_RGB888).rgbSwapped()
-            self.image = QPixmap.fromImage(q_img)
+            # Mantém o array; o QPixmap é gerado só na resolução exibida
+            self.image = image
             self.update_view()
             
     def update_view(self):
         """Atualiza a visualização."""
-        if self.image:
-            scaled = self.image.scaled(self.size(), Qt.KeepAspectRatio, 
-                                     Qt.SmoothTransformation)
+        if self.image is not None:
+            scaled = numpy_to_pixmap(self.image, self.size())
             self.setPixmap(scaled)
-            self.scale_factor = scaled.width() / self.image.width()
+            self.scale_factor = scaled.width() / self.image.shape[1]
             
     def set_fields(self, fields: List[Dict]):
         """Atualiza a lista de campos/ROIs."""
@@ -424,19 +421,19 @@ class TemplateEditor(QWidget):
         else:
             gray = roi
             
+        # Remover ruído antes de ampliar (filtro sobre 4x menos pixels)
+        denoised = cv2.bilateralFilter(gray, 5, 75, 75)
+        
         # Redimensionar para melhor OCR
         scale = 2
-        enlarged = cv2.resize(
-            gray, 
+        denoised = cv2.resize(
+            denoised, 
             None, 
             fx=scale, 
             fy=scale, 
             interpolation=cv2.INTER_CUBIC
         )
         
-        # Remover ruído
-        denoised = cv2.bilateralFilter(enlarged, 9, 75, 75)
-        
         # Ajustes baseados no tipo
         if field_type in ['cpf', 'date', 'currency', 'number']:
             # Aumentar contraste para números
@@ -1,9 +1,11 @@
 import json
 from pathlib import Path
 import shutil
-import logging
 from datetime import datetime
 
+from logging_setup import get_file_logger
+from preprocessing import PreprocessPipeline
+
 class TemplateManager:
     """
     Gerencia o armazenamento e manipulação de templates de documentos.
@@ -32,21 +34,9 @@ class TemplateManager:
         
     def setup_logging(self):
         """Configura o sistema de logging"""
-        self.logger = logging.getLogger(__name__)
-        self.logger.setLevel(logging.INFO)
-        
-        # Criar handler para arquivo
-        log_file = self.templates_dir / "template_manager.log"
-        file_handler = logging.FileHandler(log_file)
-        file_handler.setLevel(logging.INFO)
-        
-        # Formato do log
-        formatter = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        )
-        file_handler.setFormatter(formatter)
-        
-        self.logger.addHandler(file_handler)
+        # Handler único por processo e arquivo, mesmo com várias instâncias
+        self.logger = get_file_logger(
+            __name__, self.templates_dir / "template_manager.log")
 
     def load_templates(self):
         """
@@ -192,6 +182,11 @@ class TemplateManager:
                     errors.append(f"Região {name} não tem coordenadas")
                 if "expected_type" not in region:
                     errors.append(f"Região {name} não tem tipo definido")
+                elif region.get("pipeline"):
+                    try:
+                        PreprocessPipeline(region["pipeline"], region["expected_type"])
+                    except ValueError as e:
+                        errors.append(f"Região {name}: {e}")
                     
         return len(errors) == 0, errors
 
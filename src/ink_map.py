@@ -0,0 +1,142 @@
+"""
+Mapa de tinta de uma página padronizada.
+
+A página é binarizada uma única vez (Otsu) e resumida em uma imagem integral
+dos pixels de tinta. A partir dela a quantidade de tinta de qualquer
+retângulo sai de quatro leituras, e a caixa delimitadora do texto dentro de
+uma ROI sai das projeções de linhas e colunas, sem recortar nem processar a
+imagem da ROI. Para ROIs avulsas (sem o mapa da página) crop_ink_bbox faz o
+mesmo a partir do recorte.
+"""
+
+import cv2
+import numpy as np
+
+from preprocessing import to_gray
+
+
+def ink_mask(image, max_ink_level=200):
+    """
+    Binariza a imagem por Otsu
+
+    Args:
+        image: Imagem BGR ou em escala de cinza
+        max_ink_level: Nível de cinza acima do qual um pixel nunca é tinta,
+                      mesmo que o limiar de Otsu seja maior (evita que o
+                      ruído de fundo de áreas vazias vire tinta)
+
+    Returns:
+        Máscara uint8 com 1 para tinta (pixels escuros) e 0 para fundo
+    """
+    gray = to_gray(np.asarray(image))
+    threshold, _ = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return (gray <= min(threshold, max_ink_level)).astype(np.uint8)
+
+
+def projection_bbox(rows, cols, min_pixels=1):
+    """
+    Caixa (x1, y1, x2, y2) das linhas e colunas com pelo menos min_pixels de
+    tinta, relativa ao início das projeções, ou None
+    """
+    ink_rows = np.flatnonzero(rows >= min_pixels)
+    ink_cols = np.flatnonzero(cols >= min_pixels)
+    if ink_rows.size == 0 or ink_cols.size == 0:
+        return None
+    return (int(ink_cols[0]), int(ink_rows[0]),
+            int(ink_cols[-1]) + 1, int(ink_rows[-1]) + 1)
+
+
+def crop_ink_bbox(roi, margin=0, min_pixels=1, max_ink_level=200):
+    """
+    Caixa delimitadora da tinta em um recorte
+
+    Args:
+        roi: Imagem da ROI
+        margin: Pixels ignorados em cada borda
+        min_pixels: Linhas/colunas com menos tinta que isso são ignoradas
+        max_ink_level: Ver ink_mask
+
+    Returns:
+        Coordenadas (x1, y1, x2, y2) relativas ao recorte, ou None
+    """
+    height, width = roi.shape[:2]
+    if 2 * margin >= min(height, width):
+        return None
+    mask = ink_mask(roi, max_ink_level)[margin:height - margin, margin:width - margin]
+    bbox = projection_bbox(mask.sum(axis=1), mask.sum(axis=0), min_pixels)
+    if bbox is None:
+        return None
+    return tuple(c + margin for c in bbox)
+
+
+class InkMap:
+    """
+    Imagem integral dos pixels de tinta de uma página
+    """
+
+    def __init__(self, page, max_ink_level=200):
+        """
+        Args:
+            page: Página padronizada (BGR ou escala de cinza)
+            max_ink_level: Ver ink_mask
+        """
+        ink = ink_mask(page, max_ink_level)
+        self.height, self.width = ink.shape
+        self.integral = cv2.integral(ink, sdepth=cv2.CV_32S)
+
+    def clip(self, coords, margin=0):
+        """Limita o retângulo à página, descontando uma margem interna"""
+        x1, y1, x2, y2 = (int(c) for c in coords)
+        x1, y1 = max(0, x1 + margin), max(0, y1 + margin)
+        x2, y2 = min(self.width, x2 - margin), min(self.height, y2 - margin)
+        return x1, y1, max(x1, x2), max(y1, y2)
+
+    def ink_pixels(self, coords, margin=0):
+        """Quantidade de pixels de tinta no retângulo (x1, y1, x2, y2)"""
+        x1, y1, x2, y2 = self.clip(coords, margin)
+        s = self.integral
+        return int(s[y2, x2] - s[y1, x2] - s[y2, x1] + s[y1, x1])
+
+    def ink_ratio(self, coords, margin=0):
+        """
+        Fração de pixels de tinta em um retângulo
+
+        Args:
+            coords: Coordenadas (x1, y1, x2, y2) na página
+            margin: Pixels ignorados em cada borda (ex: linhas da caixa)
+
+        Returns:
+            Razão entre 0 e 1 (0 para retângulos vazios)
+        """
+        x1, y1, x2, y2 = self.clip(coords, margin)
+        area = (x2 - x1) * (y2 - y1)
+        if area == 0:
+            return 0.0
+        return self.ink_pixels((x1, y1, x2, y2)) / area
+
+    def ink_bbox(self, coords, margin=0, min_pixels=1):
+        """
+        Caixa delimitadora da tinta dentro de um retângulo
+
+        Args:
+            coords: Coordenadas (x1, y1, x2, y2) na página
+            margin: Pixels ignorados em cada borda
+            min_pixels: Linhas/colunas com menos tinta que isso são ignoradas
+
+        Returns:
+            Coordenadas (x1, y1, x2, y2) da tinta na página, ou None se não há
+            tinta
+        """
+        x1, y1, x2, y2 = self.clip(coords, margin)
+        if x1 == x2 or y1 == y2:
+            return None
+        s = self.integral
+
+        # Projeções a partir da integral: tinta por linha e por coluna
+        rows = np.diff(s[y1:y2 + 1, x2] - s[y1:y2 + 1, x1])
+        cols = np.diff(s[y2, x1:x2 + 1] - s[y1, x1:x2 + 1])
+
+        bbox = projection_bbox(rows, cols, min_pixels)
+        if bbox is None:
+            return None
+        return (x1 + bbox[0], y1 + bbox[1], x1 + bbox[2], y1 + bbox[3])
@@ -0,0 +1,349 @@
+"""
+Fila de trabalho em sistema de arquivos para processamento distribuído.
+
+Um coordenador divide as imagens de um diretório em shards gravados em um
+diretório de trabalho compartilhado (ex: montagem de rede). Workers em uma
+ou várias máquinas reivindicam shards criando arquivos de lease exclusivos,
+renovam o lease com heartbeats enquanto processam, gravam resultados parciais
+e marcam o shard como concluído. Leases sem heartbeat além do tempo limite
+são considerados abandonados e podem ser reivindicados por outro worker.
+
+Estrutura do diretório:
+    job.json            Metadados do job (template, diretório de entrada...)
+    shards/NNNNN.json   Lista de arquivos (relativos à entrada) de cada shard
+    leases/NNNNN.lease  Worker dono do shard e último heartbeat
+    results/NNNNN.json  Resultados parciais {arquivo: resultados}
+    done/NNNNN          Marcador de shard concluído
+"""
+
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+
+def write_json_atomic(path, data):
+    """Grava um JSON de forma atômica (arquivo temporário + rename)"""
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=4, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def default_worker_id():
+    """Identificador do worker: máquina + PID"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class JobQueue:
+    """
+    Fila de shards baseada em arquivos compartilhados
+    """
+
+    def __init__(self, job_dir, lease_timeout=120):
+        """
+        Args:
+            job_dir: Diretório compartilhado do job
+            lease_timeout: Segundos sem heartbeat para um lease ser
+                          considerado abandonado
+        """
+        self.job_dir = Path(job_dir)
+        self.lease_timeout = lease_timeout
+        self.shards_dir = self.job_dir / "shards"
+        self.leases_dir = self.job_dir / "leases"
+        self.results_dir = self.job_dir / "results"
+        self.done_dir = self.job_dir / "done"
+        self.logger = logging.getLogger(__name__)
+
+    def create(self, input_dir, image_files, template, shard_size=50):
+        """
+        Cria o job dividindo as imagens em shards (papel do coordenador)
+
+        Args:
+            input_dir: Diretório de entrada
+            image_files: Lista de caminhos das imagens
+            template: Dicionário do template usado pelos workers
+            shard_size: Quantidade de imagens por shard
+
+        Returns:
+            Número de shards criados
+        """
+        if (self.job_dir / "job.json").exists():
+            raise ValueError(f"Já existe um job em {self.job_dir}")
+
+        for directory in (self.shards_dir, self.leases_dir,
+                          self.results_dir, self.done_dir):
+            directory.mkdir(parents=True, exist_ok=True)
+
+        input_path = Path(input_dir).resolve()
+        files = [str(Path(f).resolve().relative_to(input_path)) for f in image_files]
+        shard_size = max(1, int(shard_size))
+
+        shard_count = 0
+        for start in range(0, len(files), shard_size):
+            write_json_atomic(
+                self.shards_dir / f"{shard_count:05d}.json",
+                {"id": shard_count, "files": files[start:start + shard_size]}
+            )
+            shard_count += 1
+
+        write_json_atomic(self.job_dir / "job.json", {
+            "input_dir": str(input_path),
+            "template": template,
+            "shard_count": shard_count,
+            "total_files": len(files),
+            "created": datetime.now().isoformat()
+        })
+        return shard_count
+
+    def load_job(self):
+        """Retorna os metadados do job"""
+        with open(self.job_dir / "job.json", 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def shard_ids(self):
+        """Lista os identificadores de todos os shards"""
+        return sorted(p.stem for p in self.shards_dir.glob("*.json"))
+
+    def load_shard(self, shard_id):
+        """Retorna a lista de arquivos de um shard"""
+        with open(self.shards_dir / f"{shard_id}.json", 'r', encoding='utf-8') as f:
+            return json.load(f)["files"]
+
+    def is_done(self, shard_id):
+        return (self.done_dir / shard_id).exists()
+
+    def lease_path(self, shard_id):
+        return self.leases_dir / f"{shard_id}.lease"
+
+    def lease_expired(self, shard_id):
+        """Verifica se o lease do shard está sem heartbeat há muito tempo"""
+        try:
+            age = time.time() - self.lease_path(shard_id).stat().st_mtime
+        except FileNotFoundError:
+            return True
+        return age > self.lease_timeout
+
+    @staticmethod
+    def read_lease(path):
+        """
+        Lê um arquivo de lease
+
+        Returns:
+            Tupla (worker dono, último heartbeat) ou None se o arquivo não
+            existe ou está incompleto
+        """
+        try:
+            mtime = path.stat().st_mtime
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f).get("worker"), mtime
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def take_lease(self, shard_id, tag):
+        """
+        Move o lease do shard para um nome exclusivo deste worker; apenas um
+        worker consegue mover cada arquivo
+
+        Returns:
+            Caminho do lease movido ou None se ele não existia mais
+        """
+        taken = self.leases_dir / f"{shard_id}.{tag}"
+        try:
+            os.rename(self.lease_path(shard_id), taken)
+        except FileNotFoundError:
+            return None
+        return taken
+
+    def restore_lease(self, shard_id, taken):
+        """
+        Devolve um lease movido por take_lease. Se outro lease já foi criado
+        nesse meio-tempo ele é mantido e o movido é descartado.
+
+        Em sistemas de arquivos sem hard links (alguns compartilhamentos
+        SMB/NFS) o lease é devolvido por rename, que não é atômico com a
+        verificação: um lease criado no mesmo instante pode ser substituído,
+        e o worker dele percebe a perda no próximo heartbeat.
+        """
+        path = self.lease_path(shard_id)
+        try:
+            os.link(taken, path)
+        except FileExistsError:
+            pass
+        except OSError:
+            if not path.exists():
+                try:
+                    os.rename(taken, path)
+                except OSError:
+                    pass
+        taken.unlink(missing_ok=True)
+
+    def owns_lease(self, shard_id, worker_id):
+        """Verifica se o lease atual do shard pertence ao worker"""
+        lease = self.read_lease(self.lease_path(shard_id))
+        return lease is not None and lease[0] == worker_id
+
+    def try_lease(self, shard_id, worker_id):
+        """Cria o lease de forma exclusiva; retorna True se conseguiu"""
+        try:
+            fd = os.open(self.lease_path(shard_id),
+                         os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({"worker": worker_id, "claimed": time.time()}, f)
+        return True
+
+    def claim(self, worker_id):
+        """
+        Reivindica o próximo shard disponível
+
+        Args:
+            worker_id: Identificador do worker
+
+        Returns:
+            Identificador do shard ou None se não houver shards livres
+        """
+        for shard_id in self.shard_ids():
+            if self.is_done(shard_id):
+                continue
+
+            if self.try_lease(shard_id, worker_id):
+                # O shard pode ter sido concluído entre a verificação e o lease
+                if self.is_done(shard_id):
+                    self.release(shard_id, worker_id)
+                    continue
+                return shard_id
+
+            lease = self.read_lease(self.lease_path(shard_id))
+            if lease is None or time.time() - lease[1] <= self.lease_timeout:
+                continue
+
+            # Outro worker pode ter recuperado o lease abandonado e criado um
+            # novo entre a leitura e o rename: o arquivo movido é conferido e
+            # devolvido se não for o mesmo lease abandonado
+            stale = self.take_lease(shard_id, f"stale.{worker_id}")
+            if stale is None:
+                continue
+            if self.read_lease(stale) != lease:
+                self.restore_lease(shard_id, stale)
+                continue
+            stale.unlink(missing_ok=True)
+            self.logger.warning(f"Lease abandonado do shard {shard_id} "
+                                f"(de {lease[0]}) recuperado por {worker_id}")
+            if self.try_lease(shard_id, worker_id):
+                return shard_id
+
+        return None
+
+    def heartbeat(self, shard_id, worker_id):
+        """
+        Renova o lease do shard, se ainda pertence ao worker
+
+        Returns:
+            False se o lease não existe mais ou foi recuperado por outro worker
+        """
+        if not self.owns_lease(shard_id, worker_id):
+            self.logger.warning(f"Lease do shard {shard_id} não pertence mais a {worker_id}")
+            return False
+        try:
+            os.utime(self.lease_path(shard_id))
+        except FileNotFoundError:
+            self.logger.warning(f"Lease do shard {shard_id} não existe mais")
+            return False
+        return True
+
+    def release(self, shard_id, worker_id):
+        """
+        Libera o lease sem concluir o shard (apenas o lease do próprio
+        worker): confirmado o dono, o lease é removido com um único rename
+        para um nome exclusivo do worker
+        """
+        if not self.owns_lease(shard_id, worker_id):
+            # O lease expirou e já foi reivindicado por outro worker
+            return
+        taken = self.take_lease(shard_id, f"release.{worker_id}")
+        if taken is None:
+            return
+        lease = self.read_lease(taken)
+        if lease is not None and lease[0] != worker_id:
+            # Recuperado por outro worker entre a leitura e o rename
+            self.restore_lease(shard_id, taken)
+            return
+        taken.unlink(missing_ok=True)
+
+    def complete(self, shard_id, results, worker_id):
+        """
+        Grava os resultados parciais e marca o shard como concluído
+
+        Args:
+            shard_id: Identificador do shard
+            results: Dicionário {arquivo relativo: resultados}
+            worker_id: Identificador do worker dono do lease
+        """
+        write_json_atomic(self.results_dir / f"{shard_id}.json", results)
+        (self.done_dir / shard_id).touch()
+        self.release(shard_id, worker_id)
+
+    def status(self):
+        """
+        Retorna a contagem de shards por estado
+
+        Returns:
+            Dicionário com total, done, leased e pending
+        """
+        total = done = leased = 0
+        for shard_id in self.shard_ids():
+            total += 1
+            if self.is_done(shard_id):
+                done += 1
+            elif not self.lease_expired(shard_id):
+                leased += 1
+        return {"total": total, "done": done, "leased": leased,
+                "pending": total - done - leased}
+
+    def merged_results(self):
+        """
+        Consolida os resultados parciais de todos os shards concluídos
+
+        Returns:
+            Dicionário {arquivo relativo: resultados} em ordem alfabética
+        """
+        merged = {}
+        for result_file in sorted(self.results_dir.glob("*.json")):
+            with open(result_file, 'r', encoding='utf-8') as f:
+                merged.update(json.load(f))
+        return dict(sorted(merged.items()))
+
+
+class Heartbeat:
+    """
+    Thread que renova periodicamente o lease de um shard
+    """
+
+    def __init__(self, queue, shard_id, worker_id, interval=None):
+        self.queue = queue
+        self.shard_id = shard_id
+        self.worker_id = worker_id
+        self.interval = interval or max(1, queue.lease_timeout / 3)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if not self.queue.heartbeat(self.shard_id, self.worker_id):
+                # Sem o lease não adianta renovar; o shard termina normalmente
+                break
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
@@ -0,0 +1,255 @@
+"""
+Configuração central dos logs em arquivo.
+
+Os loggers não escrevem direto no arquivo: cada registro é colocado em uma
+fila (QueueHandler, que nunca bloqueia) e uma única thread por arquivo e por
+processo (QueueListener) faz a escrita em um RotatingFileHandler. A
+configuração é idempotente: instanciar o ROIExtractor ou o TemplateManager
+várias vezes (uma vez por aba, por worker...) não duplica handlers nem abre
+o arquivo de novo.
+
+A rotação só é segura com um único processo escrevendo em cada arquivo. O
+primeiro processo a obter o lock de um log (arquivo .<nome>.lock ao lado)
+escreve no nome normal; os demais — outros `cli.py work` simultâneos,
+processos filhos criados por fork ou spawn — escrevem em <nome>.<pid>.log.
+
+Mensagens repetidas (ex: o mesmo erro em um campo em todas as páginas do
+lote) são amostradas: após algumas ocorrências dentro de uma janela de tempo
+as seguintes são descartadas e contadas, e o total aparece na próxima
+ocorrência registrada ou no encerramento do processo.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+LOG_DIR = Path(__file__).parent.parent / "logs"
+# Log comum dos módulos sem arquivo próprio (lote, fila, serviço...)
+APP_LOG = LOG_DIR / "bbox.log"
+
+# Números (páginas, coordenadas, confianças) não distinguem mensagens repetidas
+VARIABLE_PARTS = re.compile(r'\d+')
+
+
+class RepeatSampler(logging.Filter):
+    """
+    Filtro que deixa passar no máximo `burst` registros iguais (mesmo logger,
+    nível e mensagem sem os números) a cada `window` segundos
+    """
+
+    def __init__(self, burst=5, window=60.0):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self.lock = threading.Lock()
+        self.counts = {}  # chave -> [início da janela, registrados, descartados]
+
+    @staticmethod
+    def key(record):
+        message = VARIABLE_PARTS.sub('#', record.getMessage())[:200]
+        return record.name, record.levelno, message
+
+    def filter(self, record):
+        key = self.key(record)
+        now = time.monotonic()
+        with self.lock:
+            entry = self.counts.get(key)
+            if entry is None or now - entry[0] >= self.window:
+                suppressed = entry[2] if entry else 0
+                self.counts[key] = [now, 1, 0]
+            elif entry[1] < self.burst:
+                entry[1] += 1
+                return True
+            else:
+                entry[2] += 1
+                return False
+
+        if suppressed:
+            record.msg = (f"{record.getMessage()} (mensagem semelhante omitida "
+                          f"{suppressed} vez(es) na janela anterior)")
+            record.args = None
+        return True
+
+    def pending(self):
+        """Retorna e zera as contagens de registros descartados"""
+        with self.lock:
+            pending = [(key, entry[2]) for key, entry in self.counts.items() if entry[2]]
+            self.counts.clear()
+        return pending
+
+
+def lock_log(log_file):
+    """
+    Tenta obter o lock exclusivo de escrita de um arquivo de log
+
+    Returns:
+        Arquivo do lock (mantido aberto enquanto o processo existir) ou None
+        se outro processo já escreve nesse log
+    """
+    lock = open(log_file.with_name(f".{log_file.name}.lock"), 'a+')
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(lock.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        lock.close()
+        return None
+    return lock
+
+
+def process_log_file(log_file):
+    """Arquivo de log exclusivo do processo atual: <nome>.<pid>.log"""
+    return log_file.with_name(f"{log_file.stem}.{os.getpid()}{log_file.suffix}")
+
+
+class QueuedFileLog:
+    """Fila, handler de arquivo e thread de escrita de um arquivo de log"""
+
+    def __init__(self, log_file, level, max_bytes, backup_count, sampler):
+        self.log_file = log_file
+        self.level = level
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.lock = lock_log(log_file)
+        self.queue = queue.SimpleQueue()
+        self.queue_handler = QueueHandler(self.queue)
+        self.queue_handler.setLevel(level)
+        if sampler is not None:
+            self.queue_handler.addFilter(sampler)
+        self.sampler = sampler
+        self.open(log_file if self.lock is not None else process_log_file(log_file))
+        self.start()
+
+    def open(self, path):
+        self.file_handler = RotatingFileHandler(
+            path, maxBytes=self.max_bytes, backupCount=self.backup_count,
+            encoding='utf-8')
+        self.file_handler.setLevel(self.level)
+        self.file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    def start(self):
+        self.listener = QueueListener(self.queue, self.file_handler,
+                                      respect_handler_level=True)
+        self.listener.start()
+
+    def restart_in_child(self):
+        """
+        Recria fila, arquivo e thread de escrita em um processo filho (fork):
+        o arquivo do pai continua só do pai, e os registros que estavam na
+        cópia da fila já serão gravados por ele
+        """
+        self.lock = None
+        self.queue = queue.SimpleQueue()
+        self.queue_handler.queue = self.queue
+        self.open(process_log_file(self.log_file))
+        if self.sampler is not None:
+            # O lock pode ter sido copiado travado por outra thread do pai
+            self.sampler.lock = threading.Lock()
+            self.sampler.counts = {}
+        self.start()
+
+    def stop(self):
+        """Esvazia a fila e registra em seguida o resumo das mensagens omitidas"""
+        self.listener.stop()
+        if self.sampler is not None:
+            for (name, levelno, message), count in self.sampler.pending():
+                self.file_handler.handle(logging.LogRecord(
+                    name, levelno, __file__, 0,
+                    f"{message} (mensagem semelhante omitida {count} vez(es))",
+                    None, None))
+        self.file_handler.close()
+
+
+_lock = threading.Lock()
+_logs = {}  # caminho do arquivo -> QueuedFileLog
+
+
+def get_file_logger(name, log_file=None, level=logging.INFO,
+                    max_bytes=5 * 1024 * 1024, backup_count=3, sample=True):
+    """
+    Retorna um logger que escreve em arquivo através da fila
+
+    Chamadas repetidas com o mesmo logger e arquivo não adicionam handlers.
+    Loggers com arquivo próprio não repassam os registros ao logger raiz
+    (ver configure_logging), evitando gravá-los duas vezes.
+
+    Args:
+        name: Nome do logger
+        log_file: Arquivo de log (padrão: logs/<último trecho do nome>.log)
+        level: Nível mínimo registrado
+        max_bytes: Tamanho a partir do qual o arquivo é rotacionado
+        backup_count: Arquivos rotacionados mantidos
+        sample: Se True, amostra mensagens repetidas (ver RepeatSampler)
+
+    Returns:
+        logging.Logger
+    """
+    logger = logging.getLogger(name)
+    logger.setLevel(level)
+    if name:
+        logger.propagate = False
+    if log_file is None:
+        log_file = LOG_DIR / f"{name.rsplit('.', 1)[-1]}.log"
+    log_file = Path(log_file).resolve()
+
+    with _lock:
+        log = _logs.get(log_file)
+        if log is None:
+            log_file.parent.mkdir(parents=True, exist_ok=True)
+            log = QueuedFileLog(log_file, level, max_bytes, backup_count,
+                                RepeatSampler() if sample else None)
+            _logs[log_file] = log
+        if log.queue_handler not in logger.handlers:
+            logger.addHandler(log.queue_handler)
+    return logger
+
+
+def configure_logging(log_file=APP_LOG, level=logging.INFO):
+    """
+    Liga o logger raiz ao log em fila, rotacionado e amostrado: os módulos
+    que usam logging.getLogger(__name__) passam a gravar em log_file em vez
+    de ter os registros INFO descartados e os avisos escritos no stderr.
+    Deve ser chamada pelos pontos de entrada (CLI, interface, serviço).
+
+    Args:
+        log_file: Arquivo do log comum
+        level: Nível mínimo registrado
+
+    Returns:
+        logging.Logger raiz
+    """
+    return get_file_logger("", log_file, level)
+
+
+def shutdown():
+    """Grava os registros pendentes e encerra as threads de escrita"""
+    with _lock:
+        for log in _logs.values():
+            log.stop()
+        _logs.clear()
+
+
+def _restart_in_child():
+    # A thread de escrita não sobrevive ao fork: cada processo filho passa a
+    # ter a sua, com fila e arquivo próprios
+    for log in _logs.values():
+        log.restart_in_child()
+
+
+atexit.register(shutdown)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_in_child)
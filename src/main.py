@@ -9,6 +9,7 @@ src_dir = Path(__file__).resolve().parent
 sys.path.append(str(src_dir))
 
 from gui.main_window import MainWindow
+from logging_setup import configure_logging
 
 def setup_app_style(app):
     """Configura o estilo global da aplicação"""
@@ -66,6 +67,9 @@ def setup_app_settings():
     return settings
 
 def main():
+    # Logs dos módulos em logs/bbox.log (fila com rotação)
+    configure_logging()
+    
     # Criar aplicação
     app = QApplication(sys.argv)
     
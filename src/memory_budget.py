@@ -0,0 +1,215 @@
+"""
+Controle de memória do processamento em lote.
+
+Cada página em processamento reserva uma estimativa da memória que vai
+ocupar: a imagem decodificada (tamanho lido do cabeçalho PNG/JPEG, sem
+decodificar), os buffers da padronização e do mapa de tinta e o pico do
+pré-processamento das ROIs. Uma nova página só é admitida se a soma das
+reservas e a memória residente (RSS) real do processo couberem no orçamento;
+caso contrário a thread aguarda, reduzindo o paralelismo em vez de levar a
+máquina a usar swap. Uma página sozinha é sempre admitida.
+"""
+
+import logging
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+# Marcadores JPEG SOFn que trazem as dimensões (exceto DHT, JPG e DAC)
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def image_dimensions(image_path):
+    """
+    Lê largura e altura do cabeçalho de um PNG ou JPEG
+
+    Returns:
+        Tupla (largura, altura) ou None se o formato não for reconhecido
+    """
+    try:
+        with open(image_path, 'rb') as f:
+            head = f.read(26)
+            if head[:8] == b'\x89PNG\r\n\x1a\n' and head[12:16] == b'IHDR':
+                return struct.unpack('>II', head[16:24])
+
+            if head[:2] != b'\xff\xd8':
+                return None
+            f.seek(2)
+            while True:
+                byte = f.read(1)
+                while byte and byte != b'\xff':
+                    byte = f.read(1)
+                while byte == b'\xff':
+                    byte = f.read(1)
+                if not byte:
+                    return None
+                marker = byte[0]
+                if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+                    continue
+                length = struct.unpack('>H', f.read(2))[0]
+                if marker in JPEG_SOF_MARKERS:
+                    _, height, width = struct.unpack('>BHH', f.read(5))
+                    return width, height
+                f.seek(length - 2, os.SEEK_CUR)
+    except (OSError, struct.error):
+        return None
+
+
+def current_rss():
+    """Memória residente do processo em bytes, ou None se indisponível"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def roi_peak_bytes(regions, scale=8, buffers=4):
+    """
+    Pico estimado do pré-processamento de uma ROI do template: a maior ROI
+    ampliada pelo fator do perfil, com alguns buffers intermediários
+    """
+    largest = 0
+    for region in regions.values():
+        x1, y1, x2, y2 = region["coords"]
+        largest = max(largest, abs(x2 - x1) * abs(y2 - y1))
+    return largest * scale * scale * buffers
+
+
+class MemoryBudget:
+    """
+    Admissão de páginas sob um limite de memória
+    """
+
+    def __init__(self, limit_bytes, target_size=(1654, 2339), roi_bytes=0):
+        """
+        Args:
+            limit_bytes: Memória máxima do processo
+            target_size: (largura, altura) da página padronizada
+            roi_bytes: Pico do pré-processamento das ROIs (ver roi_peak_bytes)
+        """
+        self.limit = int(limit_bytes)
+        self.target_size = target_size
+        self.roi_bytes = int(roi_bytes)
+        # Memória já ocupada antes do lote (interpretador, bibliotecas)
+        self.baseline = current_rss() or 0
+        self.condition = threading.Condition()
+        self.reserved = 0
+        self.in_flight = {}  # token -> {"path", "estimate", "rss"}
+        self.next_token = 0
+        self.logger = logging.getLogger(__name__)
+
+        self.pages = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.peak_in_flight = 0
+        self.peak_rss = self.baseline
+        self.max_estimate = 0
+
+    def estimate(self, image_path):
+        """
+        Estima a memória de uma página em bytes
+
+        Args:
+            image_path: Caminho da imagem
+
+        Returns:
+            Imagem decodificada (BGR) + cinza + página padronizada (cinza e
+            BGR) + mapa de tinta + pico das ROIs
+        """
+        dimensions = image_dimensions(image_path)
+        if dimensions is not None:
+            width, height = dimensions
+            decoded = width * height * 4
+        else:
+            # Formato desconhecido: estimativa pela taxa de compressão
+            decoded = Path(image_path).stat().st_size * 10
+        target = self.target_size[0] * self.target_size[1]
+        return decoded + target * (4 + 5) + self.roi_bytes
+
+    def fits(self, estimate):
+        """Se uma página com a estimativa cabe agora no orçamento"""
+        if not self.in_flight:
+            return True
+        if self.baseline + self.reserved + estimate > self.limit:
+            return False
+        rss = current_rss()
+        return rss is None or rss + estimate <= self.limit
+
+    def acquire(self, image_path, running=None):
+        """
+        Aguarda até a página caber no orçamento e reserva a estimativa
+
+        Args:
+            image_path: Caminho da imagem
+            running: Função opcional consultada durante a espera; retornando
+                     False a espera é abandonada (a página é admitida)
+
+        Returns:
+            Token para release
+        """
+        estimate = self.estimate(image_path)
+        start = time.perf_counter()
+        waited = False
+        with self.condition:
+            # A memória liberada por outras threads nem sempre passa por
+            # release (ex: coleta de lixo), por isso a condição é reavaliada
+            # periodicamente
+            while not self.fits(estimate):
+                if running is not None and not running():
+                    break
+                waited = True
+                self.condition.wait(0.2)
+
+            token = self.next_token
+            self.next_token += 1
+            self.in_flight[token] = {"path": str(image_path), "estimate": estimate,
+                                     "rss": current_rss()}
+            self.reserved += estimate
+            self.pages += 1
+            self.peak_in_flight = max(self.peak_in_flight, len(self.in_flight))
+            self.max_estimate = max(self.max_estimate, estimate)
+            if waited:
+                self.waits += 1
+                self.wait_time += time.perf_counter() - start
+        return token
+
+    def release(self, token):
+        """Libera a reserva de uma página concluída"""
+        rss = current_rss()
+        with self.condition:
+            entry = self.in_flight.pop(token)
+            self.reserved -= entry["estimate"]
+            if rss is not None:
+                self.peak_rss = max(self.peak_rss, rss)
+                if entry["rss"] is not None and rss - entry["rss"] > entry["estimate"]:
+                    self.logger.info(
+                        f"{entry['path']}: memória acima da estimativa "
+                        f"({(rss - entry['rss']) / 2**20:.0f} MB > "
+                        f"{entry['estimate'] / 2**20:.0f} MB)")
+            self.condition.notify_all()
+
+    @contextmanager
+    def admit(self, image_path, running=None):
+        """Contexto que reserva a página na entrada e libera na saída"""
+        token = self.acquire(image_path, running)
+        try:
+            yield
+        finally:
+            self.release(token)
+
+    def stats(self):
+        """Páginas, esperas, pico de páginas simultâneas e de memória"""
+        with self.condition:
+            return {
+                "limit": self.limit,
+                "pages": self.pages,
+                "waits": self.waits,
+                "wait_time": round(self.wait_time, 3),
+                "peak_in_flight": self.peak_in_flight,
+                "peak_rss": self.peak_rss,
+                "max_estimate": self.max_estimate,
+            }
@@ -0,0 +1,335 @@
+"""
+Métricas de execução dos modos em lote e de serviço.
+
+Um MetricsRegistry guarda contadores, gauges e histogramas alimentados pelo
+ROIExtractor (campos, chamadas de OCR, tempos) e pelo BatchProcessor
+(páginas, filas, cache). As métricas podem ser lidas de duas formas:
+
+- No formato texto do Prometheus, por um endpoint HTTP local
+  (MetricsServer, ou GET /metrics?format=prometheus no serviço)
+- Em instantâneos periódicos gravados em um arquivo JSON Lines
+  (MetricsSnapshotter), um por linha com o horário da coleta
+
+Os rótulos se limitam a tipo de documento, template e campo (nunca caminhos
+de arquivos ou valores extraídos), e cada métrica aceita um número máximo de
+séries: combinações novas além do limite são somadas na série "outros".
+"""
+
+import json
+import logging
+import math
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Únicos rótulos aceitos pelas métricas
+ALLOWED_LABELS = ("doc_type", "template", "field")
+
+# Valor dos rótulos das séries além do limite de cardinalidade
+OVERFLOW_VALUE = "outros"
+
+# Limites (segundos) dos histogramas de tempo
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def escape_label(value):
+    """Escapa um valor de rótulo para o formato texto do Prometheus"""
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def format_labels(names, values, extra=()):
+    pairs = [(n, v) for n, v in zip(names, values)] + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{n}="{escape_label(str(v))}"' for n, v in pairs) + "}"
+
+
+class Metric:
+    """
+    Base das métricas: séries indexadas pelos valores dos rótulos
+    """
+
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=(), max_series=1000):
+        """
+        Args:
+            name: Nome da métrica (ex: bbox_pages_total)
+            help_text: Descrição exibida no formato do Prometheus
+            labelnames: Rótulos da métrica, dentre ALLOWED_LABELS
+            max_series: Séries distintas antes de agrupar em "outros"
+        """
+        invalid = [label for label in labelnames if label not in ALLOWED_LABELS]
+        if invalid:
+            raise ValueError(f"Rótulos não permitidos em {name}: {invalid}")
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.max_series = max_series
+        self.lock = threading.Lock()
+        self.series = {}
+
+    def key(self, labels):
+        """Valores dos rótulos na ordem declarada (chamar com o lock)"""
+        unknown = set(labels) - set(self.labelnames)
+        if unknown:
+            raise ValueError(f"Rótulos não declarados em {self.name}: {sorted(unknown)}")
+        key = tuple(str(labels.get(label) or "") for label in self.labelnames)
+        if key not in self.series and len(self.series) >= self.max_series:
+            key = (OVERFLOW_VALUE,) * len(self.labelnames)
+        return key
+
+    def samples(self):
+        """Lista de (sufixo, valores dos rótulos, rótulos extras, valor)"""
+        with self.lock:
+            return [("", key, (), value) for key, value in sorted(self.series.items())]
+
+    def snapshot(self):
+        """Séries da métrica como lista de dicionários"""
+        with self.lock:
+            return [dict(zip(self.labelnames, key), value=value)
+                    for key, value in sorted(self.series.items())]
+
+
+class Counter(Metric):
+    """Contador monotônico"""
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        with self.lock:
+            key = self.key(labels)
+            self.series[key] = self.series.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """Valor que sobe e desce (profundidade de filas, páginas em andamento)"""
+
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.series[self.key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        with self.lock:
+            key = self.key(labels)
+            self.series[key] = self.series.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    """Distribuição de valores em faixas cumulativas fixas"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), max_series=1000,
+                 buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames, max_series)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        with self.lock:
+            key = self.key(labels)
+            entry = self.series.get(key)
+            if entry is None:
+                entry = self.series[key] = {"counts": [0] * len(self.buckets),
+                                            "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry["counts"][i] += 1
+                    break
+            entry["sum"] += value
+            entry["count"] += 1
+
+    def samples(self):
+        samples = []
+        with self.lock:
+            for key, entry in sorted(self.series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, entry["counts"]):
+                    cumulative += count
+                    samples.append(("_bucket", key, (("le", format_value(bound)),),
+                                    cumulative))
+                samples.append(("_sum", key, (), entry["sum"]))
+                samples.append(("_count", key, (), entry["count"]))
+        return samples
+
+    def snapshot(self):
+        with self.lock:
+            return [dict(zip(self.labelnames, key), count=entry["count"],
+                         sum=round(entry["sum"], 6),
+                         buckets={format_value(bound): count for bound, count
+                                  in zip(self.buckets, entry["counts"]) if count})
+                    for key, entry in sorted(self.series.items())]
+
+
+class MetricsRegistry:
+    """
+    Conjunto das métricas de um processo
+    """
+
+    def __init__(self, max_series=1000):
+        """
+        Args:
+            max_series: Limite de séries de cada métrica (ver Metric)
+        """
+        self.max_series = max_series
+        self.lock = threading.Lock()
+        self.metrics = {}
+
+    def get(self, cls, name, help_text, labelnames=(), **kwargs):
+        """Retorna a métrica registrada com o nome, criando-a se necessário"""
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(
+                    name, help_text, labelnames, self.max_series, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Métrica {name} já registrada com outro tipo ou rótulos")
+            return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self.get(Counter, name, help_text, labelnames)
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self.get(Gauge, name, help_text, labelnames)
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.get(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def render(self):
+        """
+        Exporta as métricas no formato texto do Prometheus
+
+        Returns:
+            String com HELP, TYPE e as amostras de cada métrica
+        """
+        with self.lock:
+            metrics = sorted(self.metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for suffix, key, extra, value in metric.samples():
+                labels = format_labels(metric.labelnames, key, extra)
+                lines.append(f"{metric.name}{suffix}{labels} {format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """Dicionário {nome: séries} com o estado atual das métricas"""
+        with self.lock:
+            metrics = list(self.metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+
+class MetricsServer:
+    """
+    Endpoint HTTP local (GET /metrics) no formato do Prometheus, atendido em
+    uma thread própria
+    """
+
+    def __init__(self, registry, host="127.0.0.1", port=9464):
+        """
+        Args:
+            registry: MetricsRegistry exportado
+            host: Endereço de escuta (padrão: apenas a máquina local)
+            port: Porta de escuta
+        """
+        self.registry = registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(handler):
+                if handler.path.split("?", 1)[0] != "/metrics":
+                    handler.send_error(404)
+                    return
+                data = registry.render().encode("utf-8")
+                handler.send_response(200)
+                handler.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+                handler.send_header("Content-Length", str(len(data)))
+                handler.end_headers()
+                handler.wfile.write(data)
+
+            def log_message(handler, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       name="metrics-server", daemon=True)
+
+    @property
+    def address(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class MetricsSnapshotter:
+    """
+    Grava instantâneos periódicos das métricas em um arquivo JSON Lines
+    """
+
+    def __init__(self, registry, path, interval=30.0):
+        """
+        Args:
+            registry: MetricsRegistry gravado
+            path: Arquivo de destino (cada instantâneo é acrescentado como uma linha)
+            interval: Segundos entre instantâneos
+        """
+        self.registry = registry
+        self.path = Path(path)
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.loop, name="metrics-snapshot",
+                                       daemon=True)
+        self.logger = logging.getLogger(__name__)
+
+    def write(self):
+        """Acrescenta um instantâneo ao arquivo"""
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            line = json.dumps({"time": datetime.now().isoformat(),
+                               "monotonic": round(time.monotonic(), 3),
+                               "metrics": self.registry.snapshot()},
+                              ensure_ascii=False)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + "\n")
+        except Exception as e:
+            self.logger.error(f"Erro ao gravar instantâneo de métricas: {e}")
+
+    def loop(self):
+        while not self.stopped.wait(self.interval):
+            self.write()
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Encerra a thread gravando um último instantâneo"""
+        self.stopped.set()
+        if self.thread.is_alive():
+            self.thread.join()
+        self.write()
@@ -0,0 +1,208 @@
+"""
+Cache em disco de páginas decodificadas e padronizadas.
+
+Cada página é gravada como um arquivo uint8 bruto (escala de cinza, já no
+tamanho padrão do ROIExtractor) e lida de volta com np.memmap, de modo que
+passadas seguintes sobre as mesmas imagens recortam as ROIs direto do
+buffer mapeado, sem decodificar PNG/JPEG nem redimensionar novamente.
+
+As entradas são identificadas pelo hash do conteúdo do arquivo e pelo
+tamanho padrão; um índice JSON guarda o tamanho e o último uso de cada
+entrada para a remoção LRU quando o limite de espaço é excedido.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from job_queue import write_json_atomic
+
+
+class PageCache:
+    """
+    Cache LRU de páginas padronizadas em arquivos mapeados em memória
+    """
+
+    INDEX_FILE = "index.json"
+
+    def __init__(self, cache_dir, max_bytes=2 * 1024 ** 3):
+        """
+        Args:
+            cache_dir: Diretório do cache
+            max_bytes: Espaço máximo ocupado pelas páginas
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+
+        self.entries = {}  # chave -> {"shape", "size", "used"}
+        self.digests = {}  # caminho -> {"mtime", "size", "digest"}
+        index_path = self.cache_dir / self.INDEX_FILE
+        if index_path.exists():
+            try:
+                with open(index_path, 'r', encoding='utf-8') as f:
+                    index = json.load(f)
+                self.entries = index.get("entries", {})
+                self.digests = index.get("digests", {})
+            except Exception as e:
+                self.logger.error(f"Índice do cache de páginas inválido: {e}")
+
+        # Páginas gravadas por uma execução que terminou sem salvar o índice
+        for path in self.cache_dir.glob("*.u8"):
+            if path.stem not in self.entries:
+                path.unlink(missing_ok=True)
+
+    def file_digest(self, image_path):
+        """
+        Hash do conteúdo do arquivo, reaproveitado enquanto tamanho e data de
+        modificação não mudarem
+        """
+        path = str(Path(image_path).resolve())
+        stat = os.stat(path)
+        with self.lock:
+            known = self.digests.get(path)
+            if (known and known["mtime"] == stat.st_mtime_ns and
+                    known["size"] == stat.st_size):
+                return known["digest"]
+
+        digest = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        digest = digest.hexdigest()
+
+        with self.lock:
+            self.digests[path] = {"mtime": stat.st_mtime_ns,
+                                  "size": stat.st_size, "digest": digest}
+            self.dirty = True
+        return digest
+
+    @staticmethod
+    def entry_key(digest, width, height):
+        return f"{digest}_{width}x{height}"
+
+    def page_path(self, key):
+        return self.cache_dir / f"{key}.u8"
+
+    def get(self, image_path, width, height):
+        """
+        Retorna a página mapeada em memória (somente leitura) ou None
+        """
+        key = self.entry_key(self.file_digest(image_path), width, height)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            entry["used"] = time.time()
+            self.dirty = True
+
+        try:
+            page = np.memmap(self.page_path(key), dtype=np.uint8, mode='r',
+                             shape=tuple(entry["shape"]))
+        except (FileNotFoundError, ValueError):
+            # Removida por outro processo ou truncada
+            with self.lock:
+                self.entries.pop(key, None)
+                self.misses += 1
+            return None
+
+        with self.lock:
+            self.hits += 1
+        return page
+
+    def put(self, image_path, width, height, page):
+        """
+        Grava uma página no cache
+
+        Returns:
+            A página mapeada em memória, ou a própria página se ela sozinha
+            não cabe no limite do cache
+        """
+        page = np.ascontiguousarray(page, dtype=np.uint8)
+        if page.nbytes > self.max_bytes:
+            return page
+        key = self.entry_key(self.file_digest(image_path), width, height)
+        path = self.page_path(key)
+
+        # Arquivo temporário + rename: leitores nunca veem páginas parciais
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        page.tofile(tmp_path)
+        os.replace(tmp_path, path)
+
+        with self.lock:
+            self.entries[key] = {"shape": list(page.shape),
+                                 "size": int(page.nbytes), "used": time.time()}
+            self.dirty = True
+            self.evict(keep=key)
+            # Mapeada ainda com o lock: outro put não pode removê-la antes
+            return np.memmap(path, dtype=np.uint8, mode='r', shape=page.shape)
+
+    def evict(self, keep=None):
+        """
+        Remove as páginas usadas há mais tempo até caber no limite
+
+        Args:
+            keep: Chave que nunca é removida (a página sendo inserida)
+        """
+        total = sum(entry["size"] for entry in self.entries.values())
+        for key in sorted(self.entries, key=lambda k: self.entries[k]["used"]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            total -= self.entries.pop(key)["size"]
+            self.page_path(key).unlink(missing_ok=True)
+
+    def load(self, image_path, width, height, standardize):
+        """
+        Retorna a página padronizada, do cache ou decodificando o arquivo
+
+        Args:
+            image_path: Caminho da imagem
+            width, height: Tamanho padrão da página
+            standardize: Função que recebe a imagem decodificada e devolve a
+                        página em escala de cinza no tamanho padrão
+
+        Returns:
+            Página (np.memmap uint8) ou None se a imagem não puder ser lida
+        """
+        page = self.get(image_path, width, height)
+        if page is not None:
+            return page
+
+        img = cv2.imread(str(image_path))
+        if img is None:
+            return None
+        return self.put(image_path, width, height, standardize(img))
+
+    def save(self):
+        """Grava o índice se houve alterações (ao fim de cada lote)"""
+        with self.lock:
+            if not self.dirty:
+                return
+            write_json_atomic(self.cache_dir / self.INDEX_FILE,
+                              {"entries": self.entries, "digests": self.digests})
+            self.dirty = False
+
+    def stats(self):
+        """Retorna acertos, falhas, páginas e bytes ocupados"""
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "pages": len(self.entries),
+                "bytes": sum(entry["size"] for entry in self.entries.values()),
+            }
@@ -0,0 +1,178 @@
+"""
+Filtro de páginas em branco e duplicadas para o processamento em lote.
+
+Logo após a decodificação cada página recebe uma assinatura barata: a fração
+de tinta (para descartar páginas em branco), o hash do conteúdo padronizado
+(duplicatas exatas) e um hash perceptual (dHash) de uma versão reduzida da
+página (quase duplicatas, ex: a mesma folha digitalizada duas vezes). As
+assinaturas ficam em um índice em memória durante a execução e, opcionalmente,
+em um índice JSON persistente entre execuções.
+
+Quase duplicatas são apenas sinalizadas: formulários do mesmo modelo com
+conteúdo diferente podem ter dHashes muito próximos.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from ink_map import ink_mask
+from job_queue import write_json_atomic
+from preprocessing import to_gray
+
+
+def dhash(gray, hash_size=32):
+    """
+    Hash perceptual por diferença entre pixels vizinhos
+
+    Args:
+        gray: Imagem em escala de cinza
+        hash_size: Lado da grade; o hash tem hash_size² bits
+
+    Returns:
+        Inteiro com hash_size² bits
+    """
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def page_signature(page, hash_size=32, margin=0.02):
+    """
+    Calcula a assinatura de uma página padronizada
+
+    Args:
+        page: Página no tamanho padrão (BGR ou escala de cinza)
+        hash_size: Ver dhash
+        margin: Fração de cada borda ignorada na fração de tinta (sombras e
+                bordas da digitalização)
+
+    Returns:
+        Dicionário com "ink_ratio", "digest" (hash do conteúdo) e "dhash"
+    """
+    gray = to_gray(np.asarray(page))
+    height, width = gray.shape
+    my, mx = int(height * margin), int(width * margin)
+    inner = gray[my:height - my, mx:width - mx]
+    ink_ratio = cv2.countNonZero(ink_mask(inner)) / inner.size
+
+    digest = hashlib.sha1(np.ascontiguousarray(gray).data).hexdigest()
+    return {"ink_ratio": ink_ratio, "digest": digest, "dhash": dhash(gray, hash_size)}
+
+
+class PageFilter:
+    """
+    Classifica as páginas de um lote em novas, em branco, duplicadas ou
+    quase duplicadas
+    """
+
+    def __init__(self, blank_ink_ratio=0.001, max_distance=16, hash_size=32,
+                 index_path=None):
+        """
+        Args:
+            blank_ink_ratio: Fração de tinta abaixo da qual a página está em branco
+            max_distance: Distância de Hamming máxima entre dHashes para
+                          considerar duas páginas quase duplicadas
+            hash_size: Lado da grade do dHash
+            index_path: Arquivo JSON do índice persistente (opcional)
+        """
+        self.blank_ink_ratio = blank_ink_ratio
+        self.max_distance = max_distance
+        self.hash_size = hash_size
+        self.index_path = Path(index_path) if index_path else None
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+        self.dirty = False
+
+        self.pages = {}    # digest -> {"path", "dhash", "previous"}
+        self.hashes = []   # (dhash, digest) para a busca de quase duplicatas
+
+        if self.index_path and self.index_path.exists():
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    index = json.load(f)
+                if index.get("hash_size") == hash_size:
+                    for digest, entry in index.get("pages", {}).items():
+                        self.add(digest, entry["path"], int(entry["dhash"], 16),
+                                 previous=True)
+            except Exception as e:
+                self.logger.error(f"Índice de páginas inválido: {e}")
+
+    def add(self, digest, path, page_hash, previous=False):
+        self.pages[digest] = {"path": path, "dhash": page_hash, "previous": previous}
+        self.hashes.append((page_hash, digest))
+
+    def nearest(self, page_hash):
+        """Retorna (distância, digest) da página indexada mais parecida"""
+        best = (None, None)
+        for other_hash, digest in self.hashes:
+            distance = (page_hash ^ other_hash).bit_count()
+            if best[0] is None or distance < best[0]:
+                best = (distance, digest)
+        return best
+
+    def check(self, image_path, page):
+        """
+        Classifica uma página e a registra no índice
+
+        Args:
+            image_path: Caminho da imagem
+            page: Página padronizada
+
+        Returns:
+            Dicionário com "status" ("new", "blank", "duplicate" ou
+            "near_duplicate"), "ink_ratio" e "digest"; duplicatas trazem
+            também "of" (caminho da página original), "previous" (se a
+            original é de uma execução anterior) e "distance"
+        """
+        signature = page_signature(page, self.hash_size)
+        result = {"status": "new", "ink_ratio": round(signature["ink_ratio"], 6),
+                  "digest": signature["digest"]}
+        if signature["ink_ratio"] < self.blank_ink_ratio:
+            result["status"] = "blank"
+            return result
+
+        path = str(Path(image_path).resolve())
+        with self.lock:
+            known = self.pages.get(signature["digest"])
+            # A mesma imagem reprocessada em outra execução não é duplicata
+            if known is not None and known["path"] != path:
+                result.update(status="duplicate", of=known["path"],
+                              previous=known["previous"], distance=0)
+                return result
+
+            if known is not None:
+                # Página de uma execução anterior processada de novo nesta
+                known["previous"] = False
+            else:
+                distance, digest = self.nearest(signature["dhash"])
+                if distance is not None and distance <= self.max_distance:
+                    near = self.pages[digest]
+                    result.update(status="near_duplicate", of=near["path"],
+                                  previous=near["previous"], distance=distance)
+                self.add(signature["digest"], path, signature["dhash"])
+                self.dirty = True
+
+        return result
+
+    def save(self):
+        """Grava o índice persistente, se configurado e alterado"""
+        if self.index_path is None:
+            return
+        with self.lock:
+            if not self.dirty:
+                return
+            write_json_atomic(self.index_path, {
+                "hash_size": self.hash_size,
+                "pages": {
+                    digest: {"path": entry["path"],
+                             "dhash": format(entry["dhash"], 'x')}
+                    for digest, entry in self.pages.items()
+                }
+            })
+            self.dirty = False
@@ -0,0 +1,343 @@
+"""
+Perfis de pré-processamento de ROIs para OCR.
+
+Cada perfil recebe a ROI em escala de cinza (no tamanho original do recorte)
+e devolve a imagem pronta para o Tesseract. Os perfis mais baratos aplicam o
+filtro de ruído antes da ampliação, trabalhando sobre até 64x menos pixels
+que o pipeline original (ampliação 8x seguida de filtro bilateral).
+
+Além dos perfis fixos, cada campo do template pode declarar um pipeline de
+operações nomeadas (ver PreprocessPipeline), compilado uma vez e executado
+como uma árvore: variantes que começam pelas mesmas operações reaproveitam
+as imagens intermediárias em vez de recalculá-las.
+"""
+
+import inspect
+import json
+
+import cv2
+
+# Tipos numéricos recebem ajuste extra de contraste no perfil legado
+NUMERIC_TYPES = ('cpf', 'number', 'currency', 'date')
+
+
+def to_gray(image):
+    """Converte a imagem para escala de cinza se necessário"""
+    if len(image.shape) == 3:
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return image
+
+
+def upscale(gray, factor, interpolation=cv2.INTER_CUBIC):
+    """Amplia a imagem pelo fator informado"""
+    if factor == 1:
+        return gray
+    return cv2.resize(gray, None, fx=factor, fy=factor,
+                      interpolation=interpolation)
+
+
+def profile_bilateral(gray, expected_type):
+    """Pipeline original: ampliação 8x, bilateral e contraste para números"""
+    enlarged = upscale(gray, 8)
+    denoised = cv2.bilateralFilter(enlarged, 9, 75, 75)
+    if expected_type in NUMERIC_TYPES:
+        denoised = cv2.convertScaleAbs(denoised, alpha=1.5, beta=0)
+    return denoised
+
+
+def profile_denoise_first(gray, expected_type):
+    """Bilateral no recorte original e só depois ampliação 8x"""
+    denoised = cv2.bilateralFilter(gray, 5, 75, 75)
+    enlarged = upscale(denoised, 8)
+    if expected_type in NUMERIC_TYPES:
+        enlarged = cv2.convertScaleAbs(enlarged, alpha=1.5, beta=0)
+    return enlarged
+
+
+def profile_median(gray, expected_type):
+    """Mediana 3x3 no recorte original e ampliação 4x"""
+    denoised = cv2.medianBlur(gray, 3)
+    enlarged = upscale(denoised, 4)
+    return cv2.convertScaleAbs(enlarged, alpha=1.5, beta=0)
+
+
+def profile_gaussian(gray, expected_type):
+    """Gaussiano 3x3 no recorte original e ampliação 4x"""
+    denoised = cv2.GaussianBlur(gray, (3, 3), 0)
+    enlarged = upscale(denoised, 4)
+    return cv2.convertScaleAbs(enlarged, alpha=1.5, beta=0)
+
+
+def profile_adaptive(gray, expected_type):
+    """Mediana, ampliação 4x linear e limiarização adaptativa"""
+    denoised = cv2.medianBlur(gray, 3)
+    enlarged = upscale(denoised, 4, cv2.INTER_LINEAR)
+    return cv2.adaptiveThreshold(
+        enlarged, 255,
+        cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+        cv2.THRESH_BINARY,
+        31, 10
+    )
+
+
+def profile_otsu(gray, expected_type):
+    """Gaussiano, ampliação 4x linear e binarização de Otsu"""
+    denoised = cv2.GaussianBlur(gray, (3, 3), 0)
+    enlarged = upscale(denoised, 4, cv2.INTER_LINEAR)
+    _, binary = cv2.threshold(
+        enlarged, 0, 255,
+        cv2.THRESH_BINARY + cv2.THRESH_OTSU
+    )
+    return binary
+
+
+# Registro de perfis disponíveis (nome -> função)
+PREPROCESS_PROFILES = {
+    "bilateral": profile_bilateral,
+    "denoise_first": profile_denoise_first,
+    "median": profile_median,
+    "gaussian": profile_gaussian,
+    "adaptive": profile_adaptive,
+    "otsu": profile_otsu,
+}
+
+# Perfil padrão por tipo de campo
+DEFAULT_PROFILES = {
+    "text": "denoise_first",
+    "cpf": "gaussian",
+    "number": "gaussian",
+    "currency": "gaussian",
+    "date": "gaussian",
+}
+
+
+INTERPOLATIONS = {
+    "nearest": cv2.INTER_NEAREST,
+    "linear": cv2.INTER_LINEAR,
+    "cubic": cv2.INTER_CUBIC,
+    "area": cv2.INTER_AREA,
+}
+
+MORPHOLOGY_OPS = {
+    "erode": cv2.MORPH_ERODE,
+    "dilate": cv2.MORPH_DILATE,
+    "open": cv2.MORPH_OPEN,
+    "close": cv2.MORPH_CLOSE,
+}
+
+
+def op_crop(image, expected_type, margin=2):
+    """Remove uma margem (em pixels) de cada lado, ex: bordas da caixa"""
+    height, width = image.shape[:2]
+    if margin <= 0 or 2 * margin >= min(height, width):
+        return image
+    return image[margin:height - margin, margin:width - margin]
+
+
+def op_scale(image, expected_type, factor=4, interpolation="cubic"):
+    """Amplia (ou reduz) pelo fator informado"""
+    if interpolation not in INTERPOLATIONS:
+        raise ValueError(f"Interpolação desconhecida: {interpolation}")
+    return upscale(image, factor, INTERPOLATIONS[interpolation])
+
+
+def op_blur(image, expected_type, kind="gaussian", size=3):
+    """Filtro de ruído: gaussian, median ou bilateral"""
+    if kind == "gaussian":
+        return cv2.GaussianBlur(image, (size, size), 0)
+    if kind == "median":
+        return cv2.medianBlur(image, size)
+    if kind == "bilateral":
+        return cv2.bilateralFilter(image, size, 75, 75)
+    raise ValueError(f"Filtro desconhecido: {kind}")
+
+
+def op_contrast(image, expected_type, alpha=1.5, beta=0):
+    """Ajuste linear de contraste e brilho"""
+    return cv2.convertScaleAbs(image, alpha=alpha, beta=beta)
+
+
+def op_threshold(image, expected_type, method="otsu", value=127, block=31, c=10):
+    """Binarização: otsu, adaptive (gaussiana) ou fixed"""
+    if method == "otsu":
+        _, binary = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    elif method == "adaptive":
+        binary = cv2.adaptiveThreshold(image, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                       cv2.THRESH_BINARY, block, c)
+    elif method == "fixed":
+        _, binary = cv2.threshold(image, value, 255, cv2.THRESH_BINARY)
+    else:
+        raise ValueError(f"Binarização desconhecida: {method}")
+    return binary
+
+
+def op_morphology(image, expected_type, operation="close", size=2):
+    """Operação morfológica (erode, dilate, open, close) com elemento size x size"""
+    if operation not in MORPHOLOGY_OPS:
+        raise ValueError(f"Operação morfológica desconhecida: {operation}")
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (size, size))
+    return cv2.morphologyEx(image, MORPHOLOGY_OPS[operation], kernel)
+
+
+def op_invert(image, expected_type):
+    """Inverte as cores"""
+    return cv2.bitwise_not(image)
+
+
+def op_profile(image, expected_type, name="gaussian"):
+    """Aplica um perfil registrado em PREPROCESS_PROFILES"""
+    if name not in PREPROCESS_PROFILES:
+        raise ValueError(f"Perfil de pré-processamento desconhecido: {name}")
+    return PREPROCESS_PROFILES[name](image, expected_type)
+
+
+# Operações disponíveis nos pipelines dos templates (nome -> função)
+PIPELINE_OPS = {
+    "crop": op_crop,
+    "scale": op_scale,
+    "blur": op_blur,
+    "contrast": op_contrast,
+    "threshold": op_threshold,
+    "morphology": op_morphology,
+    "invert": op_invert,
+    "profile": op_profile,
+}
+
+
+def parse_value(text):
+    """Converte o argumento de um passo em texto ('4', '1.5', 'otsu')"""
+    for convert in (int, float):
+        try:
+            return convert(text)
+        except ValueError:
+            pass
+    return text
+
+
+def parse_step(step):
+    """
+    Interpreta um passo do pipeline
+
+    Args:
+        step: Texto "operação" ou "operação:argumento" (ex: "scale:4") ou
+              dicionário {"op": "scale", "factor": 4, ...}
+
+    Returns:
+        Tupla (função, chave) em que a chave identifica o passo com seus
+        parâmetros, para o compartilhamento de resultados entre variantes
+    """
+    if isinstance(step, str):
+        name, _, arg = step.partition(':')
+        args = [parse_value(arg)] if arg else []
+        kwargs = {}
+    elif isinstance(step, dict) and "op" in step:
+        name = step["op"]
+        args = []
+        kwargs = {k: v for k, v in step.items() if k != "op"}
+    else:
+        raise ValueError(f"Passo de pré-processamento inválido: {step!r}")
+
+    if name not in PIPELINE_OPS:
+        raise ValueError(f"Operação de pré-processamento desconhecida: {name}")
+    func = PIPELINE_OPS[name]
+    try:
+        bound = inspect.signature(func).bind(None, None, *args, **kwargs)
+    except TypeError as e:
+        raise ValueError(f"Parâmetros inválidos em {step!r}: {e}")
+    bound.apply_defaults()
+    params = dict(list(bound.arguments.items())[2:])
+
+    key = f"{name}{json.dumps(params, sort_keys=True)}"
+    return (lambda image, expected_type: func(image, expected_type, **params)), key
+
+
+class PreprocessPipeline:
+    """
+    Pipeline de pré-processamento de um campo, declarado no template
+
+    A especificação é uma lista de passos (uma única variante, "processed")
+    ou um dicionário com os passos comuns e as variantes testadas pelo OCR,
+    em ordem de prioridade:
+
+        {"steps": ["crop:2", "blur:3", "scale:4"],
+         "variants": {"processed": [],
+                      "otsu": ["threshold:otsu"],
+                      "inverted": ["threshold:otsu", "invert"]}}
+
+    Variantes cujo nome começa com "retry:" só são testadas quando as
+    anteriores tiveram baixa confiança (ver ROIExtractor.extract_text_result).
+    """
+
+    def __init__(self, spec, expected_type):
+        """
+        Args:
+            spec: Especificação do pipeline (ver docstring da classe)
+            expected_type: Tipo esperado do dado
+
+        Raises:
+            ValueError: Se a especificação for inválida
+        """
+        if isinstance(spec, list):
+            spec = {"steps": spec}
+        if not isinstance(spec, dict):
+            raise ValueError(f"Pipeline de pré-processamento inválido: {spec!r}")
+
+        self.expected_type = expected_type
+        self.funcs = {}  # chave do passo -> função
+        common = [self.compile_step(step) for step in spec.get("steps", [])]
+        variants = spec.get("variants") or {"processed": []}
+
+        self.variants = []  # (nome, tupla de chaves dos passos)
+        for name, steps in variants.items():
+            keys = common + [self.compile_step(step) for step in steps]
+            self.variants.append((name, tuple(keys)))
+
+    def compile_step(self, step):
+        func, key = parse_step(step)
+        self.funcs.setdefault(key, func)
+        return key
+
+    def run(self, steps, results):
+        """Executa os passos a partir do maior prefixo já calculado"""
+        start = len(steps)
+        while steps[:start] not in results:
+            start -= 1
+
+        image = results[steps[:start]]
+        for i in range(start, len(steps)):
+            image = self.funcs[steps[i]](image, self.expected_type)
+            results[steps[:i + 1]] = image
+        return image
+
+    def iter_variants(self, roi):
+        """
+        Gera as variantes da ROI sob demanda, em ordem de prioridade
+
+        Yields:
+            Tuplas (nome da variante, imagem)
+        """
+        results = {(): to_gray(roi)}
+        for name, steps in self.variants:
+            yield name, self.run(steps, results)
+
+    def __call__(self, roi):
+        """Retorna apenas a primeira variante (ex: para o OCR em lote)"""
+        name, steps = self.variants[0]
+        return self.run(steps, {(): to_gray(roi)})
+
+
+def preprocess(image, profile, expected_type):
+    """
+    Aplica um perfil de pré-processamento a uma ROI
+
+    Args:
+        image: Imagem da ROI (BGR ou escala de cinza)
+        profile: Nome do perfil registrado em PREPROCESS_PROFILES
+        expected_type: Tipo esperado do dado ('text', 'cpf', etc)
+
+    Returns:
+        ROI pré-processada
+    """
+    if profile not in PREPROCESS_PROFILES:
+        raise ValueError(f"Perfil de pré-processamento desconhecido: {profile}")
+    return PREPROCESS_PROFILES[profile](to_gray(image), expected_type)
@@ -0,0 +1,222 @@
+"""
+Profiler estatístico do processamento em lote.
+
+Uma thread de amostragem lê, a intervalos fixos, a pilha Python de todas as
+threads do processo (sys._current_frames) — workers do lote, thread principal
+e demais — sem instrumentar o código, com custo proporcional apenas à
+frequência de amostragem. Cada amostra é classificada pelo ponto em que a
+thread está:
+
+- tesseract: dentro do pytesseract (inclui a espera pelo processo do Tesseract)
+- opencv: executando uma chamada cv2.* (o OpenCV libera o GIL)
+- espera: bloqueada em locks, filas, pools ou sockets (tempo ocioso)
+- python: todo o resto (NumPy, pós-processamento, código da aplicação)
+
+Ao final são gravadas as pilhas no formato "collapsed" (uma linha por pilha
+com a contagem, aceito pelo flamegraph.pl e pelo speedscope, com a categoria
+como raiz) e um relatório com o tempo por categoria e as funções mais
+frequentes. As proporções são de tempo de parede das threads, não de CPU.
+"""
+
+import linecache
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+CATEGORIES = ("tesseract", "opencv", "python", "espera")
+
+# Módulos em que a thread está apenas aguardando (logging/handlers.py: a
+# thread de escrita dos logs esperando a fila, ver logging_setup)
+WAIT_MODULES = ("threading.py", "queue.py", "selectors.py", "socketserver.py",
+                os.path.join("concurrent", "futures", "thread.py"),
+                os.path.join("concurrent", "futures", "_base.py"),
+                os.path.join("logging", "handlers.py"))
+
+
+class SamplingProfiler:
+    """
+    Amostragem periódica das pilhas de todas as threads
+    """
+
+    def __init__(self, interval=0.01, max_pages=0, max_depth=64):
+        """
+        Args:
+            interval: Segundos entre amostras
+            max_pages: Se > 0, a amostragem termina após essa quantidade de
+                       páginas concluídas (ver page_done)
+            max_depth: Quadros mais profundos que isso são descartados
+        """
+        self.interval = interval
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.stacks = Counter()  # (categoria, códigos da raiz à folha) -> amostras
+        self.samples = 0
+        self.threads = set()
+        self.pages = 0
+        self.elapsed = 0.0
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.labels = {}      # código -> "função (arquivo:linha)"
+        self.leaf_kinds = {}  # (código, linha) -> categoria da folha
+        self.logger = logging.getLogger(__name__)
+
+    def start(self):
+        """Inicia a thread de amostragem"""
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run, name="profiler", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Encerra a amostragem (pode ser chamado mais de uma vez)"""
+        self.stopped.set()
+        if (self.thread is not None and self.thread.is_alive()
+                and self.thread is not threading.current_thread()):
+            self.thread.join()
+
+    def page_done(self):
+        """Conta uma página concluída, encerrando a amostragem no limite"""
+        with self.lock:
+            self.pages += 1
+            reached = self.max_pages and self.pages >= self.max_pages
+        if reached:
+            self.stopped.set()
+
+    def run(self):
+        own = threading.get_ident()
+        start = time.perf_counter()
+        while not self.stopped.wait(self.interval):
+            self.sample(own)
+        self.elapsed += time.perf_counter() - start
+
+    def sample(self, own):
+        """Registra a pilha atual de cada thread, exceto a do profiler"""
+        frames = sys._current_frames()
+        with self.lock:
+            for ident, frame in frames.items():
+                if ident == own:
+                    continue
+                codes = []
+                leaf = (frame.f_code, frame.f_lineno)
+                while frame is not None and len(codes) < self.max_depth:
+                    codes.append(frame.f_code)
+                    frame = frame.f_back
+                codes.reverse()
+                self.stacks[(self.classify(codes, leaf), tuple(codes))] += 1
+                self.threads.add(ident)
+            self.samples += 1
+
+    def classify(self, codes, leaf):
+        """Categoria de uma pilha (ver CATEGORIES)"""
+        if any("pytesseract" in code.co_filename for code in codes):
+            return "tesseract"
+        kind = self.leaf_kinds.get(leaf)
+        if kind is None:
+            code, lineno = leaf
+            line = linecache.getline(code.co_filename, lineno)
+            if "cv2." in line:
+                kind = "opencv"
+            elif code.co_filename.endswith(WAIT_MODULES):
+                kind = "espera"
+            else:
+                kind = "python"
+            self.leaf_kinds[leaf] = kind
+        return kind
+
+    def label(self, code):
+        """Nome legível de uma função: nome (arquivo:linha)"""
+        label = self.labels.get(code)
+        if label is None:
+            label = self.labels[code] = (
+                f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+        return label
+
+    def categories(self):
+        """Amostras por categoria"""
+        totals = Counter({category: 0 for category in CATEGORIES})
+        for (category, _), count in self.stacks.items():
+            totals[category] += count
+        return totals
+
+    def top_functions(self, n=25, include_wait=False):
+        """
+        Funções com mais amostras
+
+        Args:
+            n: Quantidade de funções
+            include_wait: Se True, inclui as amostras de threads em espera
+
+        Returns:
+            Tupla (próprio, acumulado): listas de (função, amostras), em que
+            "próprio" conta só a função no topo da pilha e "acumulado" conta
+            a função em qualquer posição
+        """
+        own, cumulative = Counter(), Counter()
+        for (category, codes), count in self.stacks.items():
+            if category == "espera" and not include_wait:
+                continue
+            own[self.label(codes[-1])] += count
+            for label in {self.label(code) for code in codes}:
+                cumulative[label] += count
+        return own.most_common(n), cumulative.most_common(n)
+
+    def collapsed(self):
+        """Linhas no formato collapsed: categoria;raiz;...;folha amostras"""
+        lines = Counter()
+        for (category, codes), count in self.stacks.items():
+            frames = [category] + [self.label(code).replace(";", ",") for code in codes]
+            lines[";".join(frames)] += count
+        return [f"{stack} {count}" for stack, count in sorted(lines.items())]
+
+    def report(self, n=25):
+        """Relatório em texto: categorias e funções mais frequentes"""
+        totals = self.categories()
+        total = sum(totals.values()) or 1
+        lines = [
+            f"Amostras: {self.samples} em {self.elapsed:.1f} s "
+            f"(intervalo {1000 * self.interval:.0f} ms, {len(self.threads)} threads, "
+            f"{self.pages} páginas)",
+            "",
+            "Tempo das threads por categoria:",
+        ]
+        for category in CATEGORIES:
+            lines.append(f"  {category:<10} {100 * totals[category] / total:6.1f}%"
+                         f"  ({totals[category]} amostras)")
+
+        active = (total - totals["espera"]) or 1
+        own, cumulative = self.top_functions(n)
+        for title, functions in (("próprio", own), ("acumulado", cumulative)):
+            lines += ["", f"Funções mais frequentes, tempo {title} (sem espera):"]
+            for label, count in functions:
+                lines.append(f"  {100 * count / active:6.1f}%  {count:7d}  {label}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, output_dir, name="_profile", n=25):
+        """
+        Grava as pilhas (<name>.collapsed) e o relatório (<name>.txt)
+
+        Args:
+            output_dir: Diretório de destino
+            name: Prefixo dos arquivos
+            n: Funções listadas no relatório
+
+        Returns:
+            Tupla (caminho das pilhas, caminho do relatório)
+        """
+        self.stop()
+        output_path = Path(output_dir)
+        output_path.mkdir(parents=True, exist_ok=True)
+        with self.lock:
+            collapsed_path = output_path / f"{name}.collapsed"
+            with open(collapsed_path, 'w', encoding='utf-8') as f:
+                f.write("\n".join(self.collapsed()) + "\n")
+            report_path = output_path / f"{name}.txt"
+            with open(report_path, 'w', encoding='utf-8') as f:
+                f.write(self.report(n))
+        self.logger.info(f"Perfil gravado em {report_path}")
+        return collapsed_path, report_path
@@ -0,0 +1,189 @@
+"""
+Reextração parcial de resultados quando o template muda.
+
+Compara o template atual com o registrado nos metadados da saída
+(`_metadata.json`, gravado por BatchProcessor.run e pelo merge de jobs),
+executa o OCR apenas dos campos novos ou com coordenadas, tipo ou pipeline
+de pré-processamento alterados e
+atualiza no lugar os JSONs por imagem, o `resultados.json` e o CSV
+consolidado, quando existirem. Nas imagens em que a reextração falha os
+campos alterados ficam vazios, e a imagem volta a exigir processamento
+completo.
+"""
+
+import json
+import logging
+from pathlib import Path
+
+from batch_processor import BatchProcessor
+from job_queue import write_json_atomic
+
+
+def diff_templates(old_template, new_template):
+    """
+    Compara as regiões de dois templates
+
+    Args:
+        old_template: Template usado nos resultados existentes
+        new_template: Template atual
+
+    Returns:
+        Tupla (campos a reextrair, campos removidos)
+    """
+    old_regions = old_template.get("regions", {})
+    new_regions = new_template.get("regions", {})
+
+    changed = []
+    for name, region in new_regions.items():
+        old = old_regions.get(name)
+        # Coordenadas voltam do JSON como listas
+        if (old is None or
+                list(old["coords"]) != list(region["coords"]) or
+                old.get("expected_type") != region.get("expected_type") or
+                old.get("pipeline") != region.get("pipeline")):
+            changed.append(name)
+
+    removed = [name for name in old_regions if name not in new_regions]
+    return changed, removed
+
+
+class Reextractor:
+    """
+    Atualiza um diretório de resultados existente para um novo template
+    """
+
+    RESULTS_FILE = "resultados.json"
+
+    def __init__(self, extractor, output_dir):
+        """
+        Args:
+            extractor: Instância do ROIExtractor
+            output_dir: Diretório de saída com os resultados existentes
+        """
+        self.extractor = extractor
+        self.output_dir = Path(output_dir)
+        self.logger = logging.getLogger(__name__)
+
+        metadata_path = self.output_dir / BatchProcessor.METADATA_FILE
+        if not metadata_path.exists():
+            raise ValueError(f"Metadados não encontrados em {self.output_dir}; "
+                             "é necessário um processamento completo")
+        with open(metadata_path, 'r', encoding='utf-8') as f:
+            self.metadata = json.load(f)
+
+    def plan(self, template):
+        """Retorna (campos a reextrair, campos removidos) para o template"""
+        return diff_templates(self.metadata["template"], template)
+
+    def run(self, template, input_dir=None, workers=1, on_progress=None):
+        """
+        Reextrai os campos alterados e atualiza as saídas
+
+        Args:
+            template: Novo template
+            input_dir: Diretório das imagens (padrão: o dos metadados)
+            workers: Imagens processadas em paralelo
+            on_progress: Callback opcional on_progress(concluídas, total, caminho)
+
+        Returns:
+            Dicionário com campos reextraídos, removidos, imagens atualizadas
+            e imagens que falharam (com os campos alterados limpos)
+        """
+        changed, removed = self.plan(template)
+        summary = {"changed": changed, "removed": removed, "updated": 0,
+                   "failed": []}
+        if not changed and not removed:
+            return summary
+
+        input_path = Path(input_dir or self.metadata["input_dir"])
+        # Imagens que falharam no processamento original não têm resultados
+        # a corrigir e continuam exigindo um processamento completo
+        files = {rel: results_file
+                 for rel, results_file in self.metadata["files"].items()
+                 if results_file}
+
+        processor = BatchProcessor(self.extractor, template, workers=workers)
+        processor.fields = set(changed)
+        path_to_rel = {input_path / rel: rel for rel in files}
+
+        new_values = {}
+        if changed:
+            total = len(path_to_rel)
+            done = 0
+
+            def on_result(image_path, results):
+                nonlocal done
+                done += 1
+                if on_progress:
+                    on_progress(done, total, image_path)
+
+            new_values = processor.process_files(list(path_to_rel), on_result)
+
+        field_order = processor.field_order()
+        patched = {}
+        for image_path, rel in path_to_rel.items():
+            results_path = self.output_dir / files[rel]
+            try:
+                with open(results_path, 'r', encoding='utf-8') as f:
+                    results = json.load(f)
+            except FileNotFoundError:
+                self.logger.error(f"Resultados não encontrados: {results_path}")
+                continue
+
+            if changed:
+                values = new_values.get(image_path)
+                if values is None:
+                    # Os valores antigos dos campos alterados não correspondem
+                    # mais ao template: são limpos em todas as saídas e a
+                    # imagem volta a exigir processamento completo
+                    self.logger.error(f"Falha ao reextrair {image_path}; "
+                                      f"campos limpos: {', '.join(changed)}")
+                    self.metadata["files"][rel] = None
+                    summary["failed"].append(rel)
+                    values = dict.fromkeys(changed, "")
+                else:
+                    summary["updated"] += 1
+                results.update(values)
+            else:
+                summary["updated"] += 1
+
+            results = {field: results.get(field, "") for field in field_order}
+            write_json_atomic(results_path, results)
+            patched[rel] = results
+
+        self.patch_consolidated(processor, patched)
+
+        self.metadata["template"] = template
+        processor.write_metadata(self.output_dir, input_path, self.metadata["files"],
+                                 self.metadata.get("pages"))
+        return summary
+
+    def patch_consolidated(self, processor, patched):
+        """Atualiza resultados.json e o CSV consolidado, se existirem"""
+        results_json = self.output_dir / self.RESULTS_FILE
+        csv_path = self.output_dir / BatchProcessor.CONSOLIDATED_FILE
+        if not results_json.exists() and not csv_path.exists():
+            return
+
+        if results_json.exists():
+            with open(results_json, 'r', encoding='utf-8') as f:
+                all_results = json.load(f)
+        else:
+            # Sem o JSON consolidado o CSV é reconstruído dos JSONs por imagem
+            all_results = {}
+            for rel, results_file in self.metadata["files"].items():
+                if rel in patched or not results_file:
+                    continue
+                try:
+                    with open(self.output_dir / results_file, 'r', encoding='utf-8') as f:
+                        all_results[rel] = json.load(f)
+                except FileNotFoundError:
+                    continue
+
+        all_results.update(patched)
+        all_results = dict(sorted(all_results.items()))
+
+        if results_json.exists():
+            write_json_atomic(results_json, all_results)
+        if csv_path.exists():
+            processor.write_consolidated(self.output_dir, all_results)
@@ -1,10 +1,54 @@
 import cv2
+import json
 import numpy as np
-from pathlib import Path
 import pytesseract
-import logging
+import time
 from datetime import datetime
 
+from batch_ocr import (
+    CompositeStrip, data_to_words, recognize_strip,
+    words_confidence, words_to_text
+)
+from field_types import get_field_type, post_process, post_process_column
+from ink_map import InkMap, crop_ink_bbox
+from logging_setup import get_file_logger
+from preprocessing import DEFAULT_PROFILES, PreprocessPipeline, preprocess
+from tracing import span, traced_variants
+
+class OCRResult:
+    """
+    Resultado estruturado da extração de texto de uma ROI
+    """
+    
+    def __init__(self, text="", raw_text="", mean_conf=-1.0, min_conf=-1.0,
+                 variant=None, elapsed=0.0, attempts=0, valid=None,
+                 corrected=False, blank=False):
+        self.text = text              # Texto pós-processado
+        self.raw_text = raw_text      # Texto bruto do Tesseract
+        self.mean_conf = mean_conf    # Confiança média das palavras (0-100)
+        self.min_conf = min_conf      # Confiança da pior palavra (0-100)
+        self.variant = variant        # Variante de imagem escolhida
+        self.elapsed = elapsed        # Tempo total em segundos
+        self.attempts = attempts      # Chamadas de OCR executadas
+        self.valid = valid            # Se o valor passou na validação do tipo
+        self.corrected = corrected    # Se o texto foi corrigido após o OCR
+        self.blank = blank            # Campo em branco (OCR não executado)
+        
+    def to_dict(self):
+        return {
+            'text': self.text,
+            'raw_text': self.raw_text,
+            'mean_conf': round(self.mean_conf, 2),
+            'min_conf': round(self.min_conf, 2),
+            'variant': self.variant,
+            'elapsed': round(self.elapsed, 4),
+            'attempts': self.attempts,
+            'valid': self.valid,
+            'corrected': self.corrected,
+            'blank': self.blank
+        }
+
+
 class ROIExtractor:
     """
     Classe responsável pela extração e processamento de ROIs (Regiões de Interesse)
@@ -35,29 +79,57 @@ class ROIExtractor:
             "date": "--psm 7 --oem 3 -c tessedit_char_whitelist=0123456789/"
         }
         
-        # Configurar logging
-        self.setup_logging()
+        # Perfil de pré-processamento usado para cada tipo de campo
+        self.preprocess_profiles = dict(DEFAULT_PROFILES)
         
-    def setup_logging(self):
-        """Configura o sistema de logging"""
-        self.logger = logging.getLogger(__name__)
-        self.logger.setLevel(logging.INFO)
+        # Pipelines declarados nos templates, compilados uma única vez
+        self.pipelines = {}
         
-        # Handler para arquivo
-        log_dir = Path(__file__).parent.parent / "logs"
-        log_dir.mkdir(exist_ok=True)
+        # OCR em lote: ROIs do mesmo tipo reconhecidas em uma única chamada
+        self.batch_ocr = False
+        self.batch_ocr_types = ('cpf', 'number', 'currency', 'date')
+        self.batch_ocr_max_items = 32
         
-        log_file = log_dir / "roi_extractor.log"
-        file_handler = logging.FileHandler(log_file)
-        file_handler.setLevel(logging.INFO)
+        # Confiança (0-100) a partir da qual uma variante é aceita sem tentar
+        # as demais, e abaixo da qual um perfil alternativo é tentado
+        self.accept_confidence = 85
+        self.retry_confidence = 60
+        self.retry_profile = "bilateral"
         
-        # Formato do log
-        formatter = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        )
-        file_handler.setFormatter(formatter)
+        # Correção das leituras de campos numéricos (confusões O/0, l/1...
+        # e dígito trocado em CPF/CNPJ) antes de tentar outra variante
+        self.correct_fields = True
+        
+        # Detecção de campos em branco: ROIs com fração de tinta abaixo do
+        # limiar (descontada a margem das bordas) não passam pelo OCR
+        self.blank_detection = True
+        self.blank_ink_ratio = 0.002
+        self.blank_margin = 3
+        
+        # Recorte das ROIs ajustado à caixa da tinta (mais tighten_margin
+        # pixels), reduzindo a área em branco enviada ao pré-processamento
+        self.tighten_rois = True
+        self.tighten_margin = 6
+        self.tighten_min_pixels = 2
+        
+        # Cache opcional de páginas padronizadas (PageCache)
+        self.page_cache = None
         
-        self.logger.addHandler(file_handler)
+        # Métricas opcionais (MetricsRegistry) e os rótulos de tipo de
+        # documento e template das páginas processadas
+        self.metrics = None
+        self.metric_labels = {}
+        
+        # Rastreamento opcional das etapas (Tracer, formato Chrome trace)
+        self.tracer = None
+        
+        # Configurar logging
+        self.setup_logging()
+        
+    def setup_logging(self):
+        """Configura o sistema de logging (logs/roi_extractor.log)"""
+        # Handler único por processo, compartilhado por todas as instâncias
+        self.logger = get_file_logger(__name__)
 
     def standardize_image(self, image):
         """
@@ -73,18 +145,7 @@ class ROIExtractor:
             if image is None:
                 raise ValueError("Imagem inválida")
             
-            # Converter para escala de cinza se necessário
-            if len(image.shape) == 3:
-                gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            else:
-                gray = image
-            
-            # Redimensionar
-            resized = cv2.resize(
-                gray, 
-                (self.target_width, self.target_height), 
-                interpolation=cv2.INTER_CUBIC
-            )
+            resized = self.standardize_gray(image)
             
             # Converter de volta para BGR
             standardized = cv2.cvtColor(resized, cv2.COLOR_GRAY2BGR)
@@ -94,13 +155,92 @@ class ROIExtractor:
             self.logger.error(f"Erro ao padronizar imagem: {e}")
             return image
 
-    def extract_roi(self, image, coords):
+    def standardize_gray(self, image):
+        """
+        Converte para escala de cinza e redimensiona para o tamanho padrão
+        
+        Args:
+            image: Imagem OpenCV
+            
+        Returns:
+            Imagem em escala de cinza no tamanho padrão
+        """
+        # Converter para escala de cinza se necessário
+        if len(image.shape) == 3:
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        else:
+            gray = image
+        
+        # Redimensionar
+        return cv2.resize(
+            gray, 
+            (self.target_width, self.target_height), 
+            interpolation=cv2.INTER_CUBIC
+        )
+
+    def load_page(self, image_path):
+        """
+        Carrega uma imagem já padronizada, do cache de páginas quando ativo
+        
+        Args:
+            image_path: Caminho da imagem
+            
+        Returns:
+            Página padronizada (em escala de cinza quando vem do cache) ou
+            None se a imagem não puder ser lida
+        """
+        if self.page_cache is not None:
+            with span(self.tracer, "decode", cache=True):
+                return self.page_cache.load(
+                    image_path, self.target_width, self.target_height,
+                    self.standardize_gray)
+        
+        with span(self.tracer, "decode"):
+            img = cv2.imread(str(image_path))
+        if img is None:
+            return None
+        with span(self.tracer, "standardize"):
+            return self.standardize_image(img)
+
+    def tighten_coords(self, image, coords, ink_map=None):
+        """
+        Ajusta as coordenadas de uma ROI à caixa delimitadora da tinta
+        
+        Args:
+            image: Página padronizada
+            coords: Tupla (x1, y1, x2, y2) já limitada à página
+            ink_map: InkMap da página (opcional); sem ele a tinta é medida
+                    no próprio recorte
+            
+        Returns:
+            Coordenadas ajustadas, nunca maiores que as originais; as
+            originais se a ROI não tem tinta
+        """
+        x1, y1, x2, y2 = coords
+        if ink_map is not None:
+            bbox = ink_map.ink_bbox(coords, self.blank_margin, self.tighten_min_pixels)
+        else:
+            bbox = crop_ink_bbox(image[y1:y2, x1:x2], self.blank_margin,
+                                 self.tighten_min_pixels)
+            if bbox is not None:
+                bbox = (x1 + bbox[0], y1 + bbox[1], x1 + bbox[2], y1 + bbox[3])
+        
+        if bbox is None:
+            return coords
+        
+        pad = self.tighten_margin
+        return (max(x1, bbox[0] - pad), max(y1, bbox[1] - pad),
+                min(x2, bbox[2] + pad), min(y2, bbox[3] + pad))
+
+    def extract_roi(self, image, coords, ink_map=None):
         """
         Extrai uma ROI da imagem
         
         Args:
             image: Imagem OpenCV
             coords: Tupla (x1, y1, x2, y2) com coordenadas da ROI
+            ink_map: InkMap da página (opcional), usado para ajustar o
+                    recorte à tinta quando tighten_rois está ativo
             
         Returns:
             Imagem da ROI extraída
@@ -118,6 +258,10 @@ class ROIExtractor:
             # Verificar se região é válida
             if x1 >= x2 or y1 >= y2:
                 raise ValueError(f"Coordenadas inválidas: ({x1}, {y1}, {x2}, {y2})")
+            
+            # Descartar a margem em branco ao redor do texto
+            if self.tighten_rois:
+                x1, y1, x2, y2 = self.tighten_coords(image, (x1, y1, x2, y2), ink_map)
                 
             # Extrair região
             roi = image[y1:y2, x1:x2]
@@ -132,137 +276,279 @@ class ROIExtractor:
             # Retornar uma pequena imagem preta em caso de erro
             return np.zeros((10, 10, 3), dtype=np.uint8)
 
-    def preprocess_roi(self, roi, expected_type):
+    def ink_map(self, page):
+        """
+        Cria o mapa de tinta de uma página padronizada
+        
+        Args:
+            page: Página no tamanho padrão
+            
+        Returns:
+            InkMap, ou None se a detecção de campos em branco estiver desativada
+        """
+        if not self.blank_detection:
+            return None
+        try:
+            return InkMap(page)
+        except Exception as e:
+            self.logger.error(f"Erro ao criar o mapa de tinta: {e}")
+            return None
+
+    def is_blank(self, ink_map, coords):
+        """
+        Verifica se uma ROI está em branco
+        
+        Args:
+            ink_map: InkMap da página (ou None)
+            coords: Coordenadas (x1, y1, x2, y2) da ROI
+            
+        Returns:
+            True se a fração de tinta da ROI está abaixo de blank_ink_ratio
+        """
+        if ink_map is None:
+            return False
+        return ink_map.ink_ratio(coords, self.blank_margin) < self.blank_ink_ratio
+
+    def preprocess_roi(self, roi, expected_type, profile=None):
         """
         Pré-processa uma ROI para melhorar o reconhecimento de texto
         
         Args:
             roi: Imagem da ROI
             expected_type: Tipo esperado do dado ('text', 'cpf', etc)
+            profile: Perfil de pré-processamento (opcional). Se None, usa o
+                    perfil configurado para o tipo em preprocess_profiles
             
         Returns:
             ROI pré-processada
         """
         try:
-            # Converter para escala de cinza se necessário
-            if len(roi.shape) == 3:
-                gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
-            else:
-                gray = roi
+            if profile is None:
+                profile = self.preprocess_profiles.get(expected_type, "bilateral")
             
-            # Aumentar resolução
-            scale_factor = 8
-            enlarged = cv2.resize(gray, None, 
-                                fx=scale_factor, 
-                                fy=scale_factor, 
-                                interpolation=cv2.INTER_CUBIC)
-            
-            # Remover ruído mantendo bordas
-            denoised = cv2.bilateralFilter(enlarged, 9, 75, 75)
-            
-            # Ajustes específicos por tipo
-            if expected_type in ['cpf', 'number', 'currency', 'date']:
-                # Aumentar contraste para números
-                denoised = cv2.convertScaleAbs(denoised, alpha=1.5, beta=0)
-            
-            return denoised
+            return preprocess(roi, profile, expected_type)
             
         except Exception as e:
             self.logger.error(f"Erro no pré-processamento: {e}")
             return roi
 
-    def extract_text(self, roi, expected_type):
+    def get_pipeline(self, region):
         """
-        Extrai texto de uma ROI usando OCR
+        Retorna o pipeline de pré-processamento compilado de uma região
+        
+        Args:
+            region: Região do template; o pipeline é lido da chave "pipeline"
+            
+        Returns:
+            PreprocessPipeline, ou None se a região não declara pipeline (ou
+            se ele for inválido) e deve usar o perfil do tipo
+        """
+        spec = region.get("pipeline")
+        if not spec:
+            return None
+        
+        key = (json.dumps(spec, sort_keys=True), region["expected_type"])
+        if key not in self.pipelines:
+            try:
+                self.pipelines[key] = PreprocessPipeline(spec, region["expected_type"])
+            except ValueError as e:
+                self.logger.error(f"Pipeline de pré-processamento inválido: {e}")
+                self.pipelines[key] = None
+        return self.pipelines[key]
+
+    def ocr_image(self, image, expected_type):
+        """
+        Executa o OCR de uma imagem coletando a confiança de cada palavra
+        
+        Args:
+            image: Imagem pré-processada
+            expected_type: Tipo esperado do dado
+            
+        Returns:
+            Tupla (texto bruto, confiança média, confiança mínima)
+        """
+        data = pytesseract.image_to_data(
+            image,
+            lang='por',
+            config=self.tesseract_config[expected_type],
+            output_type=pytesseract.Output.DICT
+        )
+        words = data_to_words(data)
+        mean_conf, min_conf = words_confidence(words)
+        return words_to_text(words), mean_conf, min_conf
+
+    def image_variants(self, roi, expected_type, pipeline=None):
+        """
+        Gera as variantes de imagem testadas pelo OCR, em ordem de prioridade
+        
+        Args:
+            roi: Imagem da ROI
+            expected_type: Tipo esperado do dado
+            pipeline: PreprocessPipeline do campo (opcional). Se informado,
+                     as variantes são as declaradas no template
+            
+        Yields:
+            Tuplas (nome da variante, imagem)
+        """
+        if pipeline is not None:
+            yield from pipeline.iter_variants(roi)
+            return
+        
+        # Primeira tentativa: imagem pré-processada
+        processed_roi = self.preprocess_roi(roi, expected_type)
+        yield "processed", processed_roi
+        
+        # Segunda tentativa: inverter cores
+        yield "inverted", cv2.bitwise_not(processed_roi)
+        
+        # Terceira tentativa: aumentar contraste
+        yield "contrasted", cv2.convertScaleAbs(processed_roi, alpha=1.5, beta=0)
+        
+        # Nova tentativa com perfil alternativo (só chega aqui se as
+        # variantes anteriores tiveram baixa confiança)
+        profile = self.preprocess_profiles.get(expected_type)
+        if self.retry_profile and self.retry_profile != profile:
+            yield f"retry:{self.retry_profile}", self.preprocess_roi(
+                roi, expected_type, self.retry_profile)
+
+    def extract_text_result(self, roi, expected_type, cancelled=None, pipeline=None):
+        """
+        Extrai texto de uma ROI usando OCR, parando assim que uma variante
+        atinge a confiança de aceitação
         
         Args:
             roi: Imagem da ROI
             expected_type: Tipo esperado do dado
+            cancelled: Função opcional consultada antes de cada variante;
+                      retornando True a extração é abandonada
+            pipeline: PreprocessPipeline do campo (opcional)
             
         Returns:
-            Texto extraído e processado
+            OCRResult com texto, confianças, variante usada e tempo
         """
+        start = time.perf_counter()
+        candidates = []
+        field_type = get_field_type(expected_type)
+        
         try:
-            # Lista para armazenar resultados de diferentes tentativas
-            results = []
-            
-            # Primeira tentativa: imagem pré-processada
-            processed_roi = self.preprocess_roi(roi, expected_type)
-            text1 = pytesseract.image_to_string(
-                processed_roi,
-                lang='por',
-                config=self.tesseract_config[expected_type]
-            ).strip()
-            results.append(text1)
-            
-            # Segunda tentativa: inverter cores
-            inverted_roi = cv2.bitwise_not(processed_roi)
-            text2 = pytesseract.image_to_string(
-                inverted_roi,
-                lang='por',
-                config=self.tesseract_config[expected_type]
-            ).strip()
-            results.append(text2)
-            
-            # Terceira tentativa: aumentar contraste
-            contrasted = cv2.convertScaleAbs(processed_roi, alpha=1.5, beta=0)
-            text3 = pytesseract.image_to_string(
-                contrasted,
-                lang='por',
-                config=self.tesseract_config[expected_type]
-            ).strip()
-            results.append(text3)
-            
-            # Escolher melhor resultado e pós-processar
-            best_text = self.choose_best_result(results, expected_type)
-            cleaned_text = self.post_process_text(best_text, expected_type)
-            
-            return cleaned_text
+            variants = traced_variants(
+                self.tracer, self.image_variants(roi, expected_type, pipeline))
+            for variant, image in variants:
+                if cancelled is not None and cancelled():
+                    break
+                if variant.startswith("retry:") and candidates:
+                    best_conf = max(c.mean_conf for c in candidates)
+                    if best_conf >= self.retry_confidence:
+                        break
+                
+                with span(self.tracer, "ocr", variant=variant):
+                    raw_text, mean_conf, min_conf = self.ocr_image(image, expected_type)
+                candidate = self.make_candidate(
+                    raw_text, expected_type,
+                    mean_conf=mean_conf,
+                    min_conf=min_conf,
+                    variant=variant
+                )
+                candidates.append(candidate)
+                
+                # Um valor que confere com os dígitos verificadores dispensa
+                # as demais variantes, mesmo com confiança baixa
+                if candidate.text and (mean_conf >= self.accept_confidence or
+                                       (field_type.checksum and candidate.valid)):
+                    break
+            
+            valid = [c for c in candidates if c.valid]
+            if valid:
+                result = max(valid, key=lambda c: c.mean_conf)
+            else:
+                best = self.choose_best_result(
+                    [c.raw_text for c in candidates],
+                    expected_type,
+                    confidences=[c.mean_conf for c in candidates]
+                )
+                result = next(
+                    (c for c in candidates if c.raw_text == best and best),
+                    OCRResult()
+                )
             
         except Exception as e:
             self.logger.error(f"Erro na extração de texto: {e}")
-            return ""
+            result = OCRResult()
+        
+        result.attempts = len(candidates)
+        result.elapsed = time.perf_counter() - start
+        return result
+
+    def make_candidate(self, raw_text, expected_type, **kwargs):
+        """
+        Cria o OCRResult de uma leitura, validando e, se necessário,
+        corrigindo o texto conforme o tipo do campo
+        
+        Args:
+            raw_text: Texto bruto do Tesseract
+            expected_type: Tipo esperado do dado
+            **kwargs: Demais atributos do OCRResult (confianças, variante)
+            
+        Returns:
+            OCRResult
+        """
+        text = self.post_process_text(raw_text, expected_type)
+        field_type = get_field_type(expected_type)
+        if not field_type.strict:
+            return OCRResult(text=text, raw_text=raw_text, **kwargs)
+        
+        if field_type.validate(text):
+            return OCRResult(text=text, raw_text=raw_text, valid=True, **kwargs)
+        
+        repaired = field_type.repair(raw_text) if self.correct_fields else None
+        if repaired is None:
+            return OCRResult(text=text, raw_text=raw_text, valid=False, **kwargs)
+        return OCRResult(text=repaired, raw_text=raw_text, valid=True,
+                         corrected=True, **kwargs)
 
-    def choose_best_result(self, results, expected_type):
+    def extract_text(self, roi, expected_type, pipeline=None):
+        """
+        Extrai texto de uma ROI usando OCR
+        
+        Args:
+            roi: Imagem da ROI
+            expected_type: Tipo esperado do dado
+            pipeline: PreprocessPipeline do campo (opcional)
+            
+        Returns:
+            Texto extraído e processado
+        """
+        return self.extract_text_result(roi, expected_type, pipeline=pipeline).text
+
+    def choose_best_result(self, results, expected_type, confidences=None):
         """
         Escolhe o melhor resultado entre várias tentativas de OCR
         
         Args:
             results: Lista de textos extraídos
             expected_type: Tipo esperado do dado
+            confidences: Confiança média de cada resultado (opcional). Quando
+                        informada, decide entre os resultados plausíveis
             
         Returns:
             Melhor texto encontrado
         """
+        field_type = get_field_type(expected_type)
+        
+        if confidences is not None:
+            scored = [(r, c) for r, c in zip(results, confidences) if r.strip()]
+            if not scored:
+                return ""
+            
+            # Preferir resultados com formato plausível para o tipo
+            plausible = [(r, c) for r, c in scored if field_type.plausible(r)]
+            return max(plausible or scored, key=lambda rc: rc[1])[0]
+        
         # Remover resultados vazios
         valid_results = [r for r in results if r.strip()]
         if not valid_results:
             return ""
-            
-        if expected_type == "cpf":
-            # Escolher o que tem mais números
-            return max(valid_results, 
-                      key=lambda x: len([c for c in x if c.isdigit()]))
-            
-        elif expected_type == "date":
-            # Escolher o que mais se parece com uma data
-            import re
-            for result in valid_results:
-                if re.search(r'\d{2}/\d{2}/\d{2,4}', result):
-                    return result
-            return valid_results[0]
-            
-        elif expected_type in ["number", "currency"]:
-            # Escolher o que tem mais números
-            return max(valid_results, 
-                      key=lambda x: len([c for c in x if c.isdigit()]))
-            
-        # Para texto, escolher o mais longo que não seja só números
-        text_results = [r for r in valid_results 
-                       if not r.replace('.','').replace(',','').isdigit()]
-        if text_results:
-            return max(text_results, key=len)
-        return valid_results[0]
+        return field_type.choose(valid_results)
 
     def post_process_text(self, text, expected_type):
         """
@@ -275,92 +561,379 @@ class ROIExtractor:
         Returns:
             Texto processado
         """
-        if not text:
-            return ""
+        return post_process(text, expected_type)
+
+    def extract_texts_batched(self, items):
+        """
+        Extrai o texto de várias ROIs agrupando as do mesmo tipo em uma
+        única chamada de OCR
+        
+        Args:
+            items: Lista de tuplas (chave, roi, expected_type, pipeline). As
+                  chaves podem combinar página e campo para agrupar ROIs de
+                  várias páginas; pipeline é o PreprocessPipeline do campo ou None
             
-        # Remover caracteres indesejados
-        import re
-        text = re.sub(r'[^\w\s./,-]', '', text)
-        
-        if expected_type == "cpf":
-            # Formatar CPF
-            nums = ''.join(filter(str.isdigit, text))
-            if len(nums) == 11:
-                return f"{nums[:3]}.{nums[3:6]}.{nums[6:9]}-{nums[9:]}"
-            return nums
-            
-        elif expected_type == "date":
-            # Formatar data
-            match = re.search(r'(\d{2})/(\d{2})/(\d{2,4})', text)
-            if match:
-                day, month, year = match.groups()
-                if len(year) == 2:
-                    year = '20' + year
-                return f"{day}/{month}/{year}"
-            return text
-            
-        elif expected_type == "currency":
-            # Formatar valor monetário
-            nums = ''.join(filter(lambda x: x.isdigit() or x in ',.', text))
-            if ',' not in nums:
-                nums = nums[:-2] + ',' + nums[-2:]
-            return nums
-            
-        elif expected_type == "number":
-            # Manter apenas números e pontos
-            return ''.join(filter(lambda x: x.isdigit() or x == '.', text))
-            
-        # Para texto normal, apenas limpar espaços extras
-        return ' '.join(text.split())
-
-    def process_image(self, image_path, template_name=None):
+        Returns:
+            Dicionário {chave: texto extraído}
+        """
+        results = {}
+        groups = {}
+        
+        for key, roi, expected_type, pipeline in items:
+            if expected_type in self.batch_ocr_types:
+                groups.setdefault(expected_type, []).append((key, (roi, pipeline)))
+            else:
+                result = self.extract_text_result(roi, expected_type, pipeline=pipeline)
+                self.record_field(key[-1] if isinstance(key, tuple) else key, result)
+                results[key] = result.text
+        
+        for expected_type, group in groups.items():
+            rois = dict(group)
+            field_type = get_field_type(expected_type)
+            
+            for start in range(0, len(group), self.batch_ocr_max_items):
+                strip = CompositeStrip()
+                with span(self.tracer, "preprocess", type=expected_type):
+                    for key, (roi, pipeline) in group[start:start + self.batch_ocr_max_items]:
+                        if pipeline is not None:
+                            strip.add(key, pipeline(roi))
+                        else:
+                            strip.add(key, self.preprocess_roi(roi, expected_type))
+                
+                if self.metrics is not None:
+                    self.metrics.counter(
+                        "bbox_ocr_strip_calls_total",
+                        "Chamadas de OCR em faixa composta",
+                        ("doc_type", "template")
+                    ).inc(**self.metric_labels)
+                try:
+                    with span(self.tracer, "ocr_strip", type=expected_type,
+                              items=len(strip.items)):
+                        words = recognize_strip(
+                            strip,
+                            self.tesseract_config[expected_type]
+                        )
+                except Exception as e:
+                    self.logger.error(f"Erro no OCR em lote ({expected_type}): {e}")
+                    words = {key: [] for key, _ in strip.items}
+                
+                # Pós-processamento e validação da coluna inteira de uma vez
+                keys = list(words)
+                raw_texts = [words_to_text(words[key]) for key in keys]
+                texts = post_process_column(raw_texts, expected_type)
+                valid = field_type.validate_column(texts)
+                
+                for key, raw_text, text, is_valid in zip(keys, raw_texts, texts, valid):
+                    corrected = False
+                    if not is_valid and self.correct_fields:
+                        repaired = field_type.repair(raw_text)
+                        if repaired is not None:
+                            text, is_valid, corrected = repaired, True, True
+                    
+                    mean_conf, _ = words_confidence(words[key])
+                    # Campos sem leitura confiável na faixa voltam ao OCR
+                    # individual, exceto os confirmados pelos dígitos verificadores
+                    if not text or (mean_conf < self.retry_confidence and
+                                    not (field_type.checksum and is_valid)):
+                        roi, pipeline = rois[key]
+                        result = self.extract_text_result(roi, expected_type,
+                                                          pipeline=pipeline)
+                    else:
+                        result = OCRResult(text=text, raw_text=raw_text,
+                                           mean_conf=mean_conf,
+                                           valid=is_valid if field_type.strict else None,
+                                           corrected=corrected)
+                    # Chaves de várias páginas são tuplas (página, campo)
+                    self.record_field(key[-1] if isinstance(key, tuple) else key, result)
+                    results[key] = result.text
+        
+        return results
+
+    def record_field(self, field, result=None):
+        """
+        Registra a extração de um campo nas métricas, se ativas
+        
+        Args:
+            field: Nome do campo
+            result: OCRResult do campo, ou None se a extração falhou
+        """
+        if self.metrics is None:
+            return
+        labels = dict(self.metric_labels, field=field)
+        names = ("doc_type", "template", "field")
+        metrics = self.metrics
+        metrics.counter("bbox_fields_total", "Campos processados", names).inc(**labels)
+        if result is None:
+            metrics.counter("bbox_field_errors_total", "Campos com erro na extração",
+                            names).inc(**labels)
+            return
+        if result.blank:
+            metrics.counter("bbox_fields_blank_total", "Campos em branco (sem OCR)",
+                            names).inc(**labels)
+            return
+        # Campos lidos na faixa composta não têm chamadas nem tempo próprios
+        if result.attempts:
+            metrics.counter("bbox_ocr_calls_total", "Chamadas de OCR individuais",
+                            names).inc(result.attempts, **labels)
+            metrics.histogram("bbox_field_seconds", "Tempo de OCR de um campo (s)",
+                              names).observe(result.elapsed, **labels)
+        if result.valid is False:
+            metrics.counter("bbox_fields_invalid_total", "Campos com valor inválido",
+                            names).inc(**labels)
+        if result.corrected:
+            metrics.counter("bbox_fields_corrected_total", "Campos corrigidos após o OCR",
+                            names).inc(**labels)
+
+    def record_page(self, elapsed):
+        """Registra uma página processada e o seu tempo nas métricas, se ativas"""
+        if self.metrics is None:
+            return
+        names = ("doc_type", "template")
+        self.metrics.counter("bbox_pages_total", "Páginas processadas",
+                             names).inc(**self.metric_labels)
+        self.metrics.histogram("bbox_page_seconds", "Tempo de extração de uma página (s)",
+                               names).observe(elapsed, **self.metric_labels)
+
+    def process_image(self, image_path, template_name=None, detailed=False,
+                      fields=None):
         """
         Processa uma imagem usando um template específico
         
         Args:
             image_path: Caminho da imagem
             template_name: Nome do template a ser usado
+            detailed: Se True, cada campo traz o OCRResult.to_dict() em vez
+                     de apenas o texto
+            fields: Subconjunto opcional dos campos do template a extrair
             
         Returns:
             Dicionário com os resultados extraídos
         """
         try:
-            # Carregar imagem
-            img = cv2.imread(str(image_path))
-            if img is None:
+            # Carregar imagem padronizada
+            page = self.load_page(image_path)
+            if page is None:
                 raise ValueError(f"Não foi possível ler a imagem: {image_path}")
 
-            # Padronizar imagem
-            standardized_img = self.standardize_image(img)
+            return self.process_page(page, template_name, detailed, fields)
+            
+        except Exception as e:
+            self.logger.error(f"Erro ao processar {image_path}: {e}")
+            return None
 
+    def process_loaded_image(self, img, template_name=None, detailed=False,
+                             fields=None):
+        """
+        Processa uma imagem já decodificada usando um template específico
+        
+        Args:
+            img: Imagem OpenCV
+            template_name: Nome do template a ser usado
+            detailed: Se True, cada campo traz o OCRResult.to_dict() em vez
+                     de apenas o texto
+            fields: Subconjunto opcional dos campos do template a extrair
+            
+        Returns:
+            Dicionário com os resultados extraídos
+        """
+        with span(self.tracer, "standardize"):
+            page = self.standardize_image(img)
+        return self.process_page(page, template_name, detailed, fields)
+
+    def process_page(self, standardized_img, template_name=None, detailed=False,
+                     fields=None):
+        """
+        Processa uma página já padronizada (ver standardize_image e load_page)
+        
+        Args:
+            standardized_img: Página no tamanho padrão
+            template_name: Nome do template a ser usado
+            detailed: Se True, cada campo traz o OCRResult.to_dict() em vez
+                     de apenas o texto
+            fields: Subconjunto opcional dos campos do template a extrair
+            
+        Returns:
+            Dicionário com os resultados extraídos
+        """
+        start = time.perf_counter()
+        regions = self.get_regions(template_name)
+        if fields is not None:
+            regions = {name: region for name, region in regions.items()
+                       if name in fields}
+        with span(self.tracer, "ink_map"):
+            ink_map = self.ink_map(standardized_img)
+        
+        if self.batch_ocr and not detailed:
             results = {}
-            # Processar cada região definida no template
-            for name, region in self.get_regions(template_name).items():
-                try:
-                    roi = self.extract_roi(standardized_img, region["coords"])
-                    text = self.extract_text(roi, region["expected_type"])
-                    results[name] = text.strip()
-                    
-                except Exception as e:
-                    self.logger.error(f"Erro ao processar região {name}: {e}")
+            items = []
+            for name, region in regions.items():
+                if self.is_blank(ink_map, region["coords"]):
+                    self.record_field(name, OCRResult(blank=True))
                     results[name] = ""
+                    continue
+                with span(self.tracer, "crop", field=name):
+                    roi = self.extract_roi(standardized_img, region["coords"], ink_map)
+                items.append((name, roi, region["expected_type"],
+                              self.get_pipeline(region)))
+            results.update(self.extract_texts_batched(items))
+            self.record_page(time.perf_counter() - start)
+            return {name: results[name].strip() for name in regions}
+
+        results = {}
+        # Processar cada região definida no template
+        for name, region in regions.items():
+            try:
+                if self.is_blank(ink_map, region["coords"]):
+                    # Campo em branco: sem pré-processamento nem OCR
+                    result = OCRResult(blank=True)
+                    self.record_field(name, result)
+                    results[name] = result.to_dict() if detailed else ""
+                    continue
+                
+                with span(self.tracer, "field", field=name,
+                          type=region["expected_type"]):
+                    with span(self.tracer, "crop", field=name):
+                        roi = self.extract_roi(standardized_img, region["coords"],
+                                               ink_map)
+                    result = self.extract_text_result(
+                        roi, region["expected_type"],
+                        pipeline=self.get_pipeline(region)
+                    )
+                result.text = result.text.strip()
+                self.record_field(name, result)
+                results[name] = result.to_dict() if detailed else result.text
+                
+            except Exception as e:
+                self.logger.error(f"Erro ao processar região {name}: {e}")
+                self.record_field(name)
+                results[name] = OCRResult().to_dict() if detailed else ""
 
-            return results
+        self.record_page(time.perf_counter() - start)
+        return results
+
+    def page_rois(self, standardized_img, template_name=None, fields=None, key=None):
+        """
+        Recorta as ROIs de uma página para o OCR em lote entre páginas (ver
+        extract_texts_batched). As ROIs são copiadas, então a página pode ser
+        liberada antes do OCR
+        
+        Args:
+            standardized_img: Página no tamanho padrão
+            template_name: Nome do template a ser usado
+            fields: Subconjunto opcional dos campos do template a extrair
+            key: Identificação da página nas chaves dos itens
             
-        except Exception as e:
-            self.logger.error(f"Erro ao processar {image_path}: {e}")
-            return None
+        Returns:
+            Tupla (resultados, itens): os campos em branco já resolvidos e as
+            tuplas ((key, campo), roi, expected_type, pipeline)
+        """
+        regions = self.get_regions(template_name)
+        if fields is not None:
+            regions = {name: region for name, region in regions.items()
+                       if name in fields}
+        with span(self.tracer, "ink_map"):
+            ink_map = self.ink_map(standardized_img)
+        
+        # Campos na ordem do template, preenchidos depois pelo OCR
+        results = dict.fromkeys(regions, "")
+        items = []
+        for name, region in regions.items():
+            if self.is_blank(ink_map, region["coords"]):
+                self.record_field(name, OCRResult(blank=True))
+                continue
+            with span(self.tracer, "crop", field=name):
+                roi = self.extract_roi(standardized_img, region["coords"], ink_map)
+            items.append(((key, name), roi.copy() if roi is not None else None,
+                          region["expected_type"], self.get_pipeline(region)))
+        return results, items
+
+    def process_images_batched(self, image_paths, template_name=None, fields=None):
+        """
+        Processa várias imagens agrupando as ROIs de todas as páginas no OCR
+        em lote
+        
+        Args:
+            image_paths: Lista de caminhos das imagens
+            template_name: Nome do template a ser usado
+            fields: Subconjunto opcional dos campos do template a extrair
+            
+        Returns:
+            Dicionário {caminho: resultados}, com None para imagens ilegíveis
+        """
+        images = {}
+        for image_path in image_paths:
+            images[image_path] = self.load_page(image_path)
+            if images[image_path] is None:
+                self.logger.error(f"Não foi possível ler a imagem: {image_path}")
+        
+        return self.process_loaded_images_batched(images, template_name,
+                                                  standardized=True, fields=fields)
+
+    def process_loaded_images_batched(self, images, template_name=None,
+                                      standardized=False, fields=None):
+        """
+        Processa imagens já decodificadas agrupando as ROIs de todas as
+        páginas no OCR em lote
+        
+        Args:
+            images: Dicionário {chave: imagem OpenCV ou None}
+            template_name: Nome do template a ser usado
+            standardized: Se True, as imagens já estão no tamanho padrão
+            fields: Subconjunto opcional dos campos do template a extrair
+            
+        Returns:
+            Dicionário {chave: resultados}, com None para imagens inválidas
+        """
+        start = time.perf_counter()
+        pages = {}
+        items = []
+        
+        for key, img in images.items():
+            if img is None:
+                pages[key] = None
+                continue
+            
+            standardized_img = img if standardized else self.standardize_image(img)
+            pages[key], page_items = self.page_rois(standardized_img, template_name,
+                                                    fields, key)
+            items.extend(page_items)
+        
+        self.extract_pages_batched(pages, items, time.perf_counter() - start)
+        return pages
+
+    def extract_pages_batched(self, pages, items, elapsed=0.0):
+        """
+        Faz o OCR em lote das ROIs recortadas de várias páginas (ver page_rois)
+        
+        Args:
+            pages: Dicionário {chave: resultados da página ou None}, completado
+                  com os textos extraídos
+            items: Itens de page_rois de todas as páginas
+            elapsed: Segundos já gastos preparando as páginas
+        """
+        start = time.perf_counter()
+        for (key, name), text in self.extract_texts_batched(items).items():
+            pages[key][name] = text.strip()
+        
+        # Páginas reconhecidas juntas: o tempo de cada uma é a média do lote
+        loaded = sum(1 for page in pages.values() if page is not None)
+        elapsed += time.perf_counter() - start
+        for _ in range(loaded):
+            self.record_page(elapsed / loaded)
 
     def get_regions(self, template_name=None):
         """
         Obtém as regiões de um template
         
         Args:
-            template_name: Nome do template
+            template_name: Nome do template ou o próprio dicionário do
+                          template (como retornado por TemplateManager.get_template)
             
         Returns:
             Dicionário com as regiões
         """
+        if isinstance(template_name, dict):
+            return template_name.get("regions", {})
         if (template_name and self.template_manager and 
             template_name in self.template_manager.templates):
             return self.template_manager.templates[template_name]["regions"]
@@ -0,0 +1,436 @@
+"""
+Serviço HTTP local de extração de documentos.
+
+Endpoints:
+    POST /extract?doc_type=<tipo>&template=<nome>
+        Corpo: bytes da imagem (PNG/JPEG). Resposta: JSON com os campos.
+    GET /metrics
+        Métricas de latência, fila e lotes em JSON.
+    GET /metrics?format=prometheus
+        Métricas do serviço e da extração (campos, chamadas de OCR, tempos)
+        no formato texto do Prometheus.
+    GET /health
+        Verificação simples de disponibilidade.
+
+Requisições concorrentes são agrupadas em micro-lotes antes de seguir para o
+pool de OCR, cujas threads mantêm instâncias de ROIExtractor já aquecidas.
+Um limite de concorrência e um tempo máximo de espera na fila protegem o
+serviço de sobrecarga (resposta 503).
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import cv2
+import numpy as np
+
+from logging_setup import configure_logging
+from metrics import PROMETHEUS_CONTENT_TYPE, MetricsRegistry
+from roi_extractor import ROIExtractor
+
+HTTP_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+# Marca requisições que expiraram aguardando o pool de OCR
+QUEUE_TIMEOUT = object()
+
+
+class ServiceError(Exception):
+    """Erro com status HTTP associado"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class LatencyStats:
+    """
+    Janela deslizante de latências para cálculo de percentis
+    """
+
+    def __init__(self, window=1000):
+        self.samples = deque(maxlen=window)
+
+    def add(self, value):
+        self.samples.append(value)
+
+    def summary(self):
+        if not self.samples:
+            return {"count": 0}
+        ordered = sorted(self.samples)
+
+        def percentile(p):
+            return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+        return {
+            "count": len(ordered),
+            "mean_ms": round(1000 * sum(ordered) / len(ordered), 2),
+            "p50_ms": round(1000 * percentile(0.50), 2),
+            "p95_ms": round(1000 * percentile(0.95), 2),
+            "p99_ms": round(1000 * percentile(0.99), 2),
+        }
+
+
+class ExtractionJob:
+    """Requisição de extração aguardando processamento"""
+
+    def __init__(self, image_bytes, template, key):
+        self.image_bytes = image_bytes
+        self.template = template
+        self.key = key
+        self.enqueued = time.perf_counter()
+        self.future = asyncio.get_running_loop().create_future()
+
+
+class ExtractionService:
+    """
+    Serviço de extração com micro-lotes sobre um pool de OCR
+    """
+
+    def __init__(self, template_manager, workers=2, max_concurrency=16,
+                 queue_timeout=30.0, batch_size=8, batch_wait=0.02,
+                 max_body=50 * 1024 * 1024, batch_ocr=False):
+        """
+        Args:
+            template_manager: Instância do TemplateManager
+            workers: Threads do pool de OCR
+            max_concurrency: Requisições admitidas simultaneamente
+            queue_timeout: Segundos máximos de espera antes do processamento
+            batch_size: Tamanho máximo de cada micro-lote
+            batch_wait: Segundos aguardando novas requisições para o lote
+            max_body: Tamanho máximo do corpo da requisição (bytes)
+            batch_ocr: Ativa o OCR em faixa composta entre páginas do lote
+        """
+        self.template_manager = template_manager
+        self.workers = workers
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.max_body = max_body
+        self.batch_ocr = batch_ocr
+
+        self.logger = logging.getLogger(__name__)
+        self.local = threading.local()
+        self.pool = ThreadPoolExecutor(
+            max_workers=workers,
+            initializer=self._init_worker,
+            thread_name_prefix="ocr"
+        )
+
+        self.queue = None
+        self.admission = None
+        self.batcher = None
+
+        self.latency = LatencyStats()
+        self.queue_wait = LatencyStats()
+        self.counters = {"requests": 0, "ok": 0, "errors": 0,
+                         "rejected": 0, "batches": 0, "batched_jobs": 0}
+        self.in_flight = 0
+        # Métricas por tipo de documento e template, compartilhadas com os
+        # extratores do pool
+        self.registry = MetricsRegistry()
+
+    def _init_worker(self):
+        """Cria o ROIExtractor de cada thread do pool uma única vez"""
+        self.local.extractor = ROIExtractor(self.template_manager)
+        self.local.extractor.batch_ocr = self.batch_ocr
+        self.local.extractor.metrics = self.registry
+
+    def _process_batch(self, template, jobs):
+        """
+        Executa no pool um micro-lote (com OCR em faixa composta) ou uma
+        única requisição (mesmo template para todos)
+        """
+        extractor = self.local.extractor
+        doc_type, template_name = jobs[0].key
+        extractor.metric_labels = {"doc_type": doc_type, "template": template_name}
+        images = {}
+        expired = {}
+        now = time.perf_counter()
+        for job in jobs:
+            # O lote pode ter esperado por uma thread livre do pool
+            if now - job.enqueued > self.queue_timeout:
+                expired[id(job)] = QUEUE_TIMEOUT
+                continue
+            buffer = np.frombuffer(job.image_bytes, dtype=np.uint8)
+            images[id(job)] = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
+        if extractor.batch_ocr and len(images) > 1:
+            return {**extractor.process_loaded_images_batched(images, template),
+                    **expired}
+
+        return {
+            **{key: (extractor.process_loaded_image(img, template)
+                     if img is not None else None)
+               for key, img in images.items()},
+            **expired
+        }
+
+    async def start(self):
+        """Inicializa fila, limite de concorrência e o agrupador de lotes"""
+        self.queue = asyncio.Queue()
+        self.admission = asyncio.Semaphore(self.max_concurrency)
+        self.batcher = asyncio.create_task(self._batch_loop())
+        # Aquecer todas as threads do pool antes da primeira requisição
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[
+            loop.run_in_executor(self.pool, time.sleep, 0.01)
+            for _ in range(self.workers)
+        ])
+
+    async def _batch_loop(self):
+        """Agrupa requisições da fila em micro-lotes por template"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.batch_wait
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            groups = {}
+            now = time.perf_counter()
+            for job in batch:
+                waited = now - job.enqueued
+                self.queue_wait.add(waited)
+                if job.future.done():
+                    continue
+                if waited > self.queue_timeout:
+                    job.future.set_exception(
+                        ServiceError(503, "Tempo de espera na fila excedido"))
+                    continue
+                groups.setdefault(job.key, (job.template, []))[1].append(job)
+
+            for template, jobs in groups.values():
+                self.counters["batches"] += 1
+                self.counters["batched_jobs"] += len(jobs)
+                asyncio.create_task(self._run_batch(template, jobs))
+
+    async def _run_batch(self, template, jobs):
+        loop = asyncio.get_running_loop()
+        if self.batch_ocr and len(jobs) > 1:
+            # OCR em faixa composta: o micro-lote inteiro em uma thread
+            groups = [jobs]
+        else:
+            # Sem faixa composta cada página ocupa uma thread livre do pool
+            groups = [[job] for job in jobs]
+        outcomes = await asyncio.gather(*[
+            loop.run_in_executor(self.pool, self._process_batch, template, group)
+            for group in groups
+        ], return_exceptions=True)
+
+        for group, results in zip(groups, outcomes):
+            if isinstance(results, Exception):
+                self.logger.error(f"Erro no lote de extração: {results}")
+                for job in group:
+                    if not job.future.done():
+                        job.future.set_exception(ServiceError(500, str(results)))
+                continue
+
+            for job in group:
+                if job.future.done():
+                    continue
+                result = results.get(id(job))
+                if result is QUEUE_TIMEOUT:
+                    job.future.set_exception(
+                        ServiceError(503, "Tempo de espera na fila excedido"))
+                elif result is None:
+                    job.future.set_exception(
+                        ServiceError(400, "Não foi possível decodificar a imagem"))
+                else:
+                    job.future.set_result(result)
+
+    async def extract(self, image_bytes, doc_type, template_name):
+        """
+        Extrai os campos de uma imagem respeitando os limites do serviço
+
+        Returns:
+            Dicionário com os resultados
+        """
+        template = self.template_manager.get_template(doc_type, template_name)
+        if not template:
+            raise ServiceError(404, f"Template não encontrado: {doc_type}/{template_name}")
+
+        try:
+            await asyncio.wait_for(self.admission.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.counters["rejected"] += 1
+            raise ServiceError(503, "Limite de concorrência atingido")
+
+        self.in_flight += 1
+        try:
+            job = ExtractionJob(image_bytes, template, (doc_type, template_name))
+            await self.queue.put(job)
+            return await job.future
+        finally:
+            self.in_flight -= 1
+            self.admission.release()
+
+    def metrics(self):
+        """Retorna as métricas atuais do serviço"""
+        batches = self.counters["batches"]
+        return {
+            **self.counters,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue.qsize() if self.queue else 0,
+            "mean_batch_size": (round(self.counters["batched_jobs"] / batches, 2)
+                                if batches else 0),
+            "latency": self.latency.summary(),
+            "queue_wait": self.queue_wait.summary(),
+        }
+
+    def prometheus_metrics(self):
+        """Retorna as métricas no formato texto do Prometheus"""
+        registry = self.registry
+        registry.gauge("bbox_service_in_flight",
+                       "Requisições admitidas em andamento").set(self.in_flight)
+        registry.gauge("bbox_service_queue_depth",
+                       "Requisições aguardando o agrupador de lotes").set(
+            self.queue.qsize() if self.queue else 0)
+        return registry.render()
+
+    def record_request(self, doc_type, template_name, status, elapsed):
+        """Registra uma requisição de extração nas métricas"""
+        labels = {"doc_type": doc_type, "template": template_name}
+        names = ("doc_type", "template")
+        self.registry.counter("bbox_service_requests_total",
+                              "Requisições de extração", names).inc(**labels)
+        if status == 503:
+            self.registry.counter("bbox_service_rejected_total",
+                                  "Requisições recusadas por sobrecarga",
+                                  names).inc(**labels)
+        elif status != 200:
+            self.registry.counter("bbox_service_errors_total",
+                                  "Requisições com erro", names).inc(**labels)
+        else:
+            self.registry.histogram("bbox_service_request_seconds",
+                                    "Latência das requisições atendidas (s)",
+                                    names).observe(elapsed, **labels)
+
+    async def handle_request(self, method, target, body):
+        """
+        Roteia uma requisição HTTP
+
+        Returns:
+            Tupla (status, objeto JSON ou texto das métricas do Prometheus)
+        """
+        url = urlsplit(target)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+        if url.path == "/health":
+            return 200, {"status": "ok"}
+
+        if url.path == "/metrics":
+            if params.get("format") == "prometheus":
+                return 200, self.prometheus_metrics()
+            return 200, self.metrics()
+
+        if url.path != "/extract":
+            return 404, {"error": "Endpoint não encontrado"}
+        if method != "POST":
+            return 405, {"error": "Use POST"}
+
+        doc_type = params.get("doc_type")
+        template_name = params.get("template")
+        if not doc_type or not template_name:
+            return 400, {"error": "Parâmetros doc_type e template são obrigatórios"}
+        if not body:
+            return 400, {"error": "Corpo da requisição vazio"}
+
+        start = time.perf_counter()
+        self.counters["requests"] += 1
+        try:
+            results = await self.extract(body, doc_type, template_name)
+        except ServiceError as e:
+            self.counters["errors"] += 1
+            # Templates inexistentes não viram séries nas métricas
+            if e.status != 404:
+                self.record_request(doc_type, template_name, e.status,
+                                    time.perf_counter() - start)
+            return e.status, {"error": str(e)}
+
+        elapsed = time.perf_counter() - start
+        self.latency.add(elapsed)
+        self.counters["ok"] += 1
+        self.record_request(doc_type, template_name, 200, elapsed)
+        return 200, {
+            "doc_type": doc_type,
+            "template": template_name,
+            "results": results,
+            "elapsed_ms": round(1000 * elapsed, 2),
+        }
+
+    async def handle_connection(self, reader, writer):
+        """Lê uma requisição HTTP/1.1 e responde em JSON (ou texto do Prometheus)"""
+        try:
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                writer.close()
+                return
+
+            lines = head.decode("latin-1").split("\r\n")
+            method, target, _ = lines[0].split(" ", 2)
+            headers = {}
+            for line in lines[1:]:
+                if ":" in line:
+                    name, value = line.split(":", 1)
+                    headers[name.strip().lower()] = value.strip()
+
+            length = int(headers.get("content-length", 0))
+            if length > self.max_body:
+                status, payload = 413, {"error": "Imagem muito grande"}
+            else:
+                body = await reader.readexactly(length) if length else b""
+                status, payload = await self.handle_request(method, target, body)
+
+        except Exception as e:
+            self.logger.error(f"Erro ao tratar requisição: {e}")
+            status, payload = 500, {"error": str(e)}
+
+        if isinstance(payload, str):
+            data = payload.encode("utf-8")
+            content_type = PROMETHEUS_CONTENT_TYPE
+        else:
+            data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            content_type = "application/json; charset=utf-8"
+        writer.write(
+            f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            "Connection: close\r\n\r\n".encode("latin-1") + data
+        )
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8080):
+        """Inicia o servidor e atende requisições até ser interrompido"""
+        configure_logging()
+        await self.start()
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        self.logger.info(f"Serviço de extração em http://{host}:{port}")
+        print(f"Serviço de extração em http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
@@ -0,0 +1,175 @@
+"""
+Rastreamento das etapas do processamento no formato Chrome trace.
+
+Com o rastreamento ativo cada documento recebe um identificador (trace id) e
+cada etapa — decodificação, padronização, filtro, espera por memória, recorte,
+pré-processamento e OCR de cada variante de cada campo, gravação — gera um
+intervalo com início, duração, processo e thread. Os eventos são gravados
+conforme acontecem em um arquivo JSON no formato de array do Chrome trace, que
+pode ser aberto no Perfetto (ui.perfetto.dev) ou em chrome://tracing para ver
+a linha do tempo de cada worker: etapas lentas, campos demorados e o tempo
+ocioso entre documentos.
+
+Sem rastreamento (tracer None) as funções span e document deste módulo
+retornam contextos vazios, sem custo relevante.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+
+class Tracer:
+    """
+    Grava intervalos de execução em um arquivo Chrome trace
+    """
+
+    def __init__(self, path, process_name="bbox"):
+        """
+        Args:
+            path: Arquivo de destino (.json)
+            process_name: Nome do processo exibido na linha do tempo
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.pid = os.getpid()
+        self.origin = time.perf_counter_ns()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.threads = set()
+        self.trace_ids = {}  # documento -> trace id
+        self.documents = 0
+        self.events = 0
+
+        # Formato de array: o "]" final é opcional, então o arquivo continua
+        # legível mesmo se o processo for interrompido
+        self.file = open(self.path, 'w', encoding='utf-8')
+        self.file.write("[\n")
+        self.emit({"name": "process_name", "ph": "M", "pid": self.pid, "tid": 0,
+                   "args": {"name": process_name}})
+
+    def now(self):
+        """Microssegundos desde a criação do tracer"""
+        return (time.perf_counter_ns() - self.origin) / 1000
+
+    def emit(self, event):
+        line = json.dumps(event, ensure_ascii=False)
+        with self.lock:
+            if self.file is None:
+                return
+            self.file.write((",\n" if self.events else "") + line)
+            self.events += 1
+
+    def thread_id(self):
+        """Id da thread atual, registrando o nome dela na primeira vez"""
+        tid = threading.get_native_id()
+        if tid not in self.threads:
+            self.threads.add(tid)
+            self.emit({"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid,
+                       "args": {"name": threading.current_thread().name}})
+        return tid
+
+    def complete(self, name, start, cat="pipeline", document=None, **args):
+        """
+        Registra um intervalo já concluído
+
+        Args:
+            name: Nome da etapa
+            start: Início retornado por now()
+            cat: Categoria do evento
+            document: Documento do intervalo (padrão: o documento em
+                      processamento na thread atual)
+            **args: Detalhes exibidos no evento (campo, variante...)
+        """
+        if document is None:
+            document = getattr(self.local, "document", None)
+        if document is not None:
+            args = dict(args, document=document,
+                        trace_id=self.trace_ids.get(document))
+        self.emit({"name": name, "cat": cat, "ph": "X", "ts": round(start, 1),
+                   "dur": round(self.now() - start, 1), "pid": self.pid,
+                   "tid": self.thread_id(), "args": args})
+
+    @contextmanager
+    def span(self, name, cat="pipeline", **args):
+        """Contexto que registra o intervalo da etapa ao sair"""
+        start = self.now()
+        try:
+            yield
+        finally:
+            self.complete(name, start, cat, **args)
+
+    @contextmanager
+    def document(self, name):
+        """
+        Contexto do processamento de um documento: atribui o trace id, que
+        passa a acompanhar todos os intervalos da thread até a saída
+
+        Args:
+            name: Identificação do documento (ex: caminho da imagem)
+        """
+        name = str(name)
+        with self.lock:
+            self.documents += 1
+            self.trace_ids[name] = f"{self.pid}-{self.documents:06d}"
+        previous = getattr(self.local, "document", None)
+        self.local.document = name
+        try:
+            with self.span("document", cat="document"):
+                yield self.trace_ids[name]
+        finally:
+            self.local.document = previous
+
+    def close(self):
+        """Fecha o array de eventos e o arquivo"""
+        with self.lock:
+            if self.file is None:
+                return
+            self.file.write("\n]\n")
+            self.file.close()
+            self.file = None
+
+
+def span(tracer, name, **args):
+    """Intervalo de uma etapa, ou contexto vazio se tracer é None"""
+    if tracer is None:
+        return nullcontext()
+    return tracer.span(name, **args)
+
+
+def document(tracer, name):
+    """Contexto de um documento, ou contexto vazio se tracer é None"""
+    if tracer is None:
+        return nullcontext()
+    return tracer.document(name)
+
+
+def traced_variants(tracer, variants, **args):
+    """
+    Registra a geração de cada variante de imagem como uma etapa
+    "preprocess", com o nome da variante
+
+    Args:
+        tracer: Tracer ou None
+        variants: Iterador de tuplas (nome da variante, imagem)
+
+    Returns:
+        Iterador equivalente a variants
+    """
+    if tracer is None:
+        return variants
+    return _traced_variants(tracer, iter(variants), args)
+
+
+def _traced_variants(tracer, variants, args):
+    while True:
+        start = tracer.now()
+        try:
+            variant, image = next(variants)
+        except StopIteration:
+            return
+        tracer.complete("preprocess", start, variant=variant, **args)
+        yield variant, image